@@ -35,10 +35,14 @@ from flask.logging import default_handler
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from app.config import ConfigIns
-from app.database import init_db
+# モデルと同じdatabaseモジュールのdbを初期化する（app.databaseでは別のインスタンスになる）
+from database import init_db
+from com.codec import init_json
 
 app = Flask(__name__)
 CORS(app)
+# JSONのシリアライズにorjsonを使う
+init_json(app)
 # セッション管理
 app.secret_key = "COLOGI_SECRET_KEY_XXXXXXX"
 app.config["SESSION_TYPE"] = "redis"
@@ -82,6 +86,11 @@ logger.addHandler(log_handler)
 
 init_db(app)
 
+# 事業者情報（コアと共有のDBから読み込み、変更の通知を受け取る）
+from com.company_info import registry
+
+registry.init_app(app)
+
 # 各API登録
 from app.private_api import private_api_blueprint
 from app.public_api import public_api_blueprint
@@ -89,6 +98,28 @@ from app.public_api import public_api_blueprint
 app.register_blueprint(private_api_blueprint, url_prefix="/private/api")
 app.register_blueprint(public_api_blueprint, url_prefix="/public/api")
 
+# 相手コネクタとの通信にHTTP/2を使う
+if ConfigIns.REMOTE_CONNECTOR_HTTP2:
+    from com.http_client import http_client
+    from com.http2_transport import get_http2_transport
+
+    http_client.mount_http2(get_http2_transport().send)
+
+# 運行依頼のローカルのテーブルへの同期(flask operation-sync ...)
+from com.operation_sync import operation_sync_cli
+
+app.cli.add_command(operation_sync_cli)
+
+# B/Lの索引付きのテーブル(flask ebl-store init|import)
+from com.ebl_store import ebl_store_cli
+
+app.cli.add_command(ebl_store_cli)
+
+# B/Lの変更の履歴(flask ebl-journal compact|snapshot|history)
+from com.ebl_journal import ebl_journal_cli
+
+app.cli.add_command(ebl_journal_cli)
+
 
 @app.after_request
 def after_request(response):
@@ -104,10 +135,71 @@ def shutdown_session(exception=None):
     pass
 
 
+def _via_socket():
+    # uwsgiのソケット(co_logiからnginxを経由しない呼出し)の場合はnginxの設定する変数が無い
+    # （HTTPのヘッダーはHTTP_で始まる変数になるため、呼出し元は設定できない）
+    return "uwsgi.version" in request.environ and "COLOGI_NGINX" not in request.environ
+
+
+@app.before_request
+def restrict_socket():
+    # ソケットはco_logiからのPrivate APIの呼出し専用
+    if _via_socket() and not request.path.startswith("/private/api/"):
+        abort(404)
+
+
+def _is_internal_caller():
+    # nginxを経由した場合も呼出し元のアドレスになる
+    return not _via_socket() and request.remote_addr in ConfigIns.STATS_ALLOWED_ADDRS
+
+
 @app.route("/healthcheck")
 def healthcheck():
     return "healthcheck OK"
 
 
+@app.route("/stats")
+def stats():
+    # 内部の状態を返すため、同一ホストからの呼出しに限る
+    if not _is_internal_caller():
+        abort(403)
+    # 外部API呼出しのコネクション再利用状況等
+    from com.http_client import http_client
+    from com import resilience
+    from com import single_flight
+    from com import conditions
+    from com.company_info import registry
+    from com import ebl_repository
+    from com import ebl_store
+    from com import ebl_journal
+
+    stats = {
+        "http_client": http_client.get_stats(),
+        "circuit_breakers": resilience.get_stats(),
+        "single_flight": single_flight.get_stats(),
+        # advanced_conditionsのコンパイル結果のキャッシュ
+        "advanced_conditions": conditions.get_stats(),
+        "company_registry": registry.get_stats(),
+        # B/Lファイルの読み込み結果のキャッシュ
+        "ebl_repository": ebl_repository.get_stats(),
+        "ebl_store": ebl_store.get_stats(),
+        "ebl_journal": ebl_journal.get_stats(),
+    }
+    if ConfigIns.REMOTE_CONNECTOR_HTTP2:
+        from com.http2_transport import get_http2_transport
+
+        stats["http2"] = get_http2_transport().get_stats()
+    if ConfigIns.RESPONSE_CACHE_ENABLED:
+        from com.response_cache import response_cache
+
+        stats["response_cache"] = response_cache.get_stats()
+    if ConfigIns.OPERATION_SYNC_ENABLED:
+        from com.operation_sync import operation_sync
+
+        # ローカルのテーブルの同期遅れ等
+        stats["operation_sync"] = operation_sync.get_stats()
+    return stats
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=81)
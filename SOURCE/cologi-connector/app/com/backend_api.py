@@ -16,10 +16,11 @@
 
 import os
 import logging
-import requests
 import json
 from urllib.parse import urljoin
 from config import ConfigIns
+from com.http_client import http_client
+from com.codec import decode_json
 
 logger = logging.getLogger("app.flask")
 logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
@@ -42,7 +43,7 @@ class BackendApi:
             headers = {"content-type": "application/json"}
             if ConfigIns.USE_BACKEND_TOKEN:
                 headers["Authorization"] = f"Bearer {ConfigIns.BACKEND_TOKEN}"
-            response = requests.request(
+            response = http_client.request(
                 method, url, params=param, json=data, headers=headers, verify=False
             )
             if response.status_code != 200:
@@ -55,14 +56,12 @@ class BackendApi:
                     f"Status={response.status_code}\n{response.text}"
                 )
                 try:
-                    response.encoding = response.apparent_encoding
-                    data = response.json()
+                    data = decode_json(response)
                     self.last_error = data["parameters"]["error"]["message"]
                 except Exception:
                     self.last_error = "Sorry, can not get Backend error."
                 return False
-            response.encoding = response.apparent_encoding
-            result = response.json()
+            result = decode_json(response)
             # logger.debug(f"Backend API {api}: {json.dumps(result, indent=4)}")
         except Exception as e:
             logging.error("%s", e, exc_info=True)
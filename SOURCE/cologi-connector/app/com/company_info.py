@@ -14,7 +14,25 @@
 # ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 
-COMPANY_INFOS = {
+import os
+import sys
+import time
+import logging
+import threading
+from collections.abc import Mapping
+import redis
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from database import db
+from model.cid_mapping_model import CidMapping
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# 事業者情報の初期値（DBのcid_mappingが空の場合や読み込めない場合に使う）
+# cid_mappingはコアと共有し、登録・変更はコアの flask company-registry で行う
+DEFAULT_COMPANY_INFOS = {
     "XXXXXXXXXXXXX": {
         "cid": "XXXXXXXXXXXXX",
         "name": "XXXXXXXXXXXXX",
@@ -44,37 +62,192 @@ COMPANY_INFOS = {
     },
 }
 
+# 事業者情報の変更を他のプロセスに通知するチャネル
+REGISTRY_CHANNEL = "cologi:company_registry"
+
+
+class Snapshot:
+    """ある時点の事業者情報と索引（変更せずに読み込み直す）"""
+
+    def __init__(self, companies: dict):
+        self.companies = companies
+        self.roles = {}
+        self.gs1 = {}
+        self.addresses = {}
+        for cid, company in companies.items():
+            self.roles.setdefault(company.get("role"), []).append(cid)
+            if company.get("gs1"):
+                self.gs1.setdefault(company["gs1"], cid)
+            if company.get("wallet_adress"):
+                self.addresses.setdefault(company["wallet_adress"], cid)
+
+
+class CompanyRegistry:
+    """DB(cid_mapping)の事業者情報をプロセス内に保持する
+
+    読み込んだ情報はCOMPANY_REGISTRY_TTL秒まで使い、Redisのpub/subで変更が
+    通知された場合はすぐに読み込み直す。読み込み中は他のスレッドは直前の情報を使う。
+    """
+
+    def __init__(self):
+        self._app = None
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._expires = 0
+        self._subscriber = None
+        self._stats = {"loads": 0, "load_errors": 0, "invalidations": 0}
+
+    def init_app(self, app):
+        self._app = app
+        if Config.COMPANY_REGISTRY_REDIS_URL and self._subscriber is None:
+            self._subscriber = threading.Thread(
+                target=self._subscribe, name="company_registry", daemon=True
+            )
+            self._subscriber.start()
+
+    def snapshot(self) -> Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._expires:
+            return snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self._snapshot is None or time.monotonic() >= self._expires:
+                self._snapshot = Snapshot(self._load())
+                self._expires = time.monotonic() + Config.COMPANY_REGISTRY_TTL
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """次に参照した時に読み込み直す"""
+        self._expires = 0
+        self._stats["invalidations"] += 1
+
+    def publish(self):
+        """事業者情報を変更したことを全プロセスに通知する"""
+        self.invalidate()
+        if not Config.COMPANY_REGISTRY_REDIS_URL:
+            return
+        try:
+            redis.from_url(Config.COMPANY_REGISTRY_REDIS_URL).publish(
+                REGISTRY_CHANNEL, "changed"
+            )
+        except redis.RedisError as e:
+            logger.warning(f"事業者情報の変更を通知できませんでした: {e}")
+
+    def _load(self) -> dict:
+        if not Config.COMPANY_REGISTRY_DB or self._app is None:
+            return dict(DEFAULT_COMPANY_INFOS)
+        try:
+            # リクエストのセッションとは別に読み込む
+            with self._app.app_context():
+                rows = db.session.execute(db.select(CidMapping)).scalars().all()
+                companies = {row.cid: row.to_info() for row in rows}
+            self._stats["loads"] += 1
+        except Exception as e:
+            self._stats["load_errors"] += 1
+            logger.warning(f"事業者情報を読み込めませんでした: {e}")
+            if self._snapshot is not None:
+                return self._snapshot.companies
+            return dict(DEFAULT_COMPANY_INFOS)
+        if len(companies) == 0:
+            return dict(DEFAULT_COMPANY_INFOS)
+        return companies
+
+    def _subscribe(self):
+        while True:
+            try:
+                pubsub = redis.from_url(Config.COMPANY_REGISTRY_REDIS_URL).pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(REGISTRY_CHANNEL)
+                # 接続し直すまでの間の変更を取りこぼさないように読み込み直す
+                self.invalidate()
+                for _ in pubsub.listen():
+                    self.invalidate()
+            except Exception as e:
+                logger.warning(f"事業者情報の変更の通知を受け取れません: {e}")
+                time.sleep(5)
+
+    def get_stats(self) -> dict:
+        snapshot = self._snapshot
+        stats = dict(self._stats)
+        stats["companies"] = 0 if snapshot is None else len(snapshot.companies)
+        stats["subscribed"] = self._subscriber is not None
+        return stats
+
+
+registry = CompanyRegistry()
+
+
+class _CompanyInfos(Mapping):
+    """COMPANY_INFOS（事業者IDをキーとする事業者情報）をレジストリから返す"""
+
+    def __getitem__(self, cid):
+        return registry.snapshot().companies[cid]
+
+    def __iter__(self):
+        return iter(registry.snapshot().companies)
+
+    def __len__(self):
+        return len(registry.snapshot().companies)
+
+    def __contains__(self, cid):
+        return cid in registry.snapshot().companies
+
+
+COMPANY_INFOS = _CompanyInfos()
+
 
 def get_endpoint_from_cid(cid: str) -> str:
-    if cid in COMPANY_INFOS:
-        return COMPANY_INFOS[cid]["endpoint"]
+    company = registry.snapshot().companies.get(cid)
+    if company is not None:
+        return company["endpoint"]
     else:
         return None
 
 
 def get_name_from_cid(cid: str) -> str:
-    if cid in COMPANY_INFOS:
-        return COMPANY_INFOS[cid]["name"]
+    company = registry.snapshot().companies.get(cid)
+    if company is not None:
+        return company["name"]
     else:
         return ""
 
 
 def get_address_from_cid(cid: str) -> str:
-    if cid in COMPANY_INFOS:
-        return COMPANY_INFOS[cid]["wallet_adress"]
+    company = registry.snapshot().companies.get(cid)
+    if company is not None:
+        return company["wallet_adress"]
     else:
         return None
 
 
 def get_shipper_tractor(cid: str) -> str:
-    if cid in COMPANY_INFOS:
-        return COMPANY_INFOS[cid]["tractor"]
+    company = registry.snapshot().companies.get(cid)
+    if company is not None:
+        return company["tractor"]
     else:
         return None
 
 
 def get_recipient_tractor(cid: str) -> str:
-    if cid in COMPANY_INFOS:
-        return COMPANY_INFOS[cid]["tractor"]
+    company = registry.snapshot().companies.get(cid)
+    if company is not None:
+        return company["tractor"]
     else:
         return None
+
+
+def get_cids_by_role(role: str) -> list:
+    """役割(carrier/shipper/recipient)の事業者IDのリスト（登録順）"""
+    return list(registry.snapshot().roles.get(role, []))
+
+
+def get_cid_from_gs1(gs1: str) -> str:
+    return registry.snapshot().gs1.get(gs1)
+
+
+def get_cid_from_address(address: str) -> str:
+    return registry.snapshot().addresses.get(address)
@@ -0,0 +1,326 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import re
+import logging
+import operator
+from functools import lru_cache
+from sqlalchemy import and_, false, not_, or_, String
+from config import ConfigIns
+from com.codec import dumps_json, loads_json
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# advanced_conditions(検索条件のJSON文字列)の形式はMongoDBのクエリに準じる
+# 項目は明細(trsp_plan_line_item等)からのパスで"."で区切る（途中の一覧は各要素をたどる）
+#   {"trsp_srvc.service_no": "S1"}
+#   {"trsp_srvc.service_strt_date": {"$gte": "20250301", "$lt": "20250401"}}
+#   {"$or": [{...}, {...}], "$not": {...}}  複数の項目・演算子はAND
+# 値の無い項目は{"$eq": null}だけに一致し、文字列と数値は一致しない
+# バックエンドの文法との違いが確認できていないため、ADVANCED_CONDITIONS_LOCALは既定で無効
+ADVANCED_CONDITIONS = "advanced_conditions"
+
+# 一覧検索の結果で明細のリストを持つ項目
+LINE_ITEM_KEYS = ("trsp_plan_line_item", "trsp_ability_line_item")
+
+ORDERINGS = {
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+}
+COMPARISONS = ("$eq", "$ne", "$in", "$nin", *ORDERINGS)
+
+FIELD_PATTERN = re.compile(r"[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*")
+
+
+class InvalidConditions(ValueError):
+    """advanced_conditionsの形式が不正、またはローカルで評価できない"""
+
+
+class Conditions:
+    """検証・正規化したadvanced_conditions
+
+    解析・検証した結果は正規化した文字列（キーの順番・書式を揃えたもの）毎にLRUで
+    保持し、同じ検索では解析しない。
+
+    textは正規化した文字列、fieldsは参照する項目のパス。
+    predicateは明細(dict)が条件に合うかを返す関数、to_sqlはSQLAlchemyの条件を作る。
+    """
+
+    def __init__(self, text, tree):
+        self.text = text
+        self.tree = tree
+        self.fields = frozenset(_fields(tree))
+        self.predicate = _predicate(tree)
+
+    def to_sql(self, resolve):
+        """resolve(パス)で求めた列の条件にする。列が無い(None)項目はInvalidConditions"""
+        return _sql(self.tree, resolve)
+
+
+def normalize(value) -> str:
+    return dumps_json(_sort_keys(value)).decode("utf-8")
+
+
+def normalize_params(params) -> str:
+    """キーの順番やadvanced_conditions(JSON文字列)の書式の違いを除いた検索条件
+
+    advanced_conditionsはJSONとして正規化し、JSONでない場合は元の文字列とする
+    （JSONの文字列"x"と文字列xを区別するため接頭辞を付ける）。
+    """
+    normalized = dict(params or {})
+    text = normalized.get(ADVANCED_CONDITIONS)
+    if text:
+        try:
+            normalized[ADVANCED_CONDITIONS] = "json:" + normalize(loads_json(text))
+        except ValueError:
+            normalized[ADVANCED_CONDITIONS] = f"text:{text}"
+    return normalize(normalized)
+
+
+def _sort_keys(value):
+    if isinstance(value, dict):
+        return {key: _sort_keys(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_sort_keys(item) for item in value]
+    return value
+
+
+def compile_conditions(text) -> Conditions:
+    """advanced_conditionsを解析・検証する。不正な場合はInvalidConditions"""
+    try:
+        value = loads_json(text)
+    except ValueError as e:
+        raise InvalidConditions(f"JSONではありません: {e}")
+    return _compile(normalize(value))
+
+
+@lru_cache(maxsize=ConfigIns.ADVANCED_CONDITIONS_CACHE_SIZE)
+def _compile(text):
+    return Conditions(text, _parse(loads_json(text)))
+
+
+@lru_cache(maxsize=ConfigIns.ADVANCED_CONDITIONS_CACHE_SIZE)
+def get_conditions(text):
+    """compile_conditionsの結果（不正な場合はNone）。同じ文字列では解析しない"""
+    try:
+        return compile_conditions(text)
+    except InvalidConditions as e:
+        logger.debug(f"advanced_conditions をローカルで評価しません: {e}")
+        return None
+
+
+def _parse(value):
+    # 木は("and"|"or", [木]), ("not", 木), ("cmp", パス, 演算子, 値)
+    if not isinstance(value, dict) or len(value) == 0:
+        raise InvalidConditions(f"条件はオブジェクトで指定してください: {value}")
+    nodes = []
+    for key, item in value.items():
+        if key in ("$and", "$or"):
+            if not isinstance(item, list) or len(item) == 0:
+                raise InvalidConditions(f"{key}は条件のリストで指定してください")
+            nodes.append((key[1:], [_parse(child) for child in item]))
+        elif key == "$not":
+            nodes.append(("not", _parse(item)))
+        elif key.startswith("$"):
+            raise InvalidConditions(f"不明な演算子です: {key}")
+        elif FIELD_PATTERN.fullmatch(key) is None:
+            raise InvalidConditions(f"項目が不正です: {key}")
+        else:
+            nodes.extend(_parse_field(key, item))
+    return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+
+def _parse_field(path, item):
+    if not isinstance(item, dict):
+        item = {"$eq": item}
+    if len(item) == 0:
+        raise InvalidConditions(f"{path}の条件がありません")
+    nodes = []
+    for op, operand in item.items():
+        if op not in COMPARISONS:
+            raise InvalidConditions(f"不明な演算子です: {path} {op}")
+        if op in ("$in", "$nin"):
+            if not isinstance(operand, list) or not all(
+                _is_value(value) for value in operand
+            ):
+                raise InvalidConditions(f"{path} {op}は値のリストで指定してください")
+        elif op in ORDERINGS:
+            if not _is_value(operand):
+                raise InvalidConditions(f"{path} {op}は文字列か数値で指定してください")
+        elif operand is not None and not _is_value(operand):
+            raise InvalidConditions(f"{path} {op}の値が不正です: {operand}")
+        nodes.append(("cmp", path, op, operand))
+    return nodes
+
+
+def _is_value(value):
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _fields(node):
+    if node[0] == "cmp":
+        yield node[1]
+    elif node[0] == "not":
+        yield from _fields(node[1])
+    else:
+        for child in node[1]:
+            yield from _fields(child)
+
+
+def _lookup(item, keys):
+    """パスの値のリスト（途中や末尾の一覧は各要素に展開する）"""
+    values = [item]
+    for key in keys:
+        found = []
+        for value in values:
+            for element in value if isinstance(value, list) else [value]:
+                if isinstance(element, dict) and key in element:
+                    found.append(element[key])
+        values = found
+    result = []
+    for value in values:
+        result.extend(value if isinstance(value, list) else [value])
+    return result
+
+
+def _matches(value, operand, compare=operator.eq):
+    # 値の無い項目や文字列と数値の比較は一致しない(SQLと合わせる)
+    if value is None or isinstance(value, str) != isinstance(operand, str):
+        return False
+    try:
+        return compare(value, operand)
+    except TypeError:
+        return False
+
+
+def _test(op, operand):
+    """演算子の判定(パスの値のリスト -> bool)"""
+    if operand is None:
+        # {"$eq": null}は値が無い、{"$ne": null}は値がある
+
+        def test(values):
+            return len(values) == 0 or None in values
+
+    elif op in ("$in", "$nin"):
+
+        def test(values):
+            return any(
+                _matches(value, candidate) for value in values for candidate in operand
+            )
+
+    else:
+        compare = ORDERINGS.get(op, operator.eq)
+
+        def test(values):
+            return any(_matches(value, operand, compare) for value in values)
+
+    if op in ("$ne", "$nin"):
+        return lambda values: not test(values)
+    return test
+
+
+def _predicate(node):
+    kind = node[0]
+    if kind == "and":
+        predicates = [_predicate(child) for child in node[1]]
+        return lambda item: all(predicate(item) for predicate in predicates)
+    if kind == "or":
+        predicates = [_predicate(child) for child in node[1]]
+        return lambda item: any(predicate(item) for predicate in predicates)
+    if kind == "not":
+        predicate = _predicate(node[1])
+        return lambda item: not predicate(item)
+    _, path, op, operand = node
+    keys = path.split(".")
+    test = _test(op, operand)
+    return lambda item: test(_lookup(item, keys))
+
+
+def _sql(node, resolve):
+    kind = node[0]
+    if kind == "and":
+        return and_(*[_sql(child, resolve) for child in node[1]])
+    if kind == "or":
+        return or_(*[_sql(child, resolve) for child in node[1]])
+    if kind == "not":
+        return not_(_sql(node[1], resolve))
+    _, path, op, operand = node
+    column = resolve(path)
+    if column is None:
+        raise InvalidConditions(f"{path}はローカルで検索できません")
+    if op == "$eq" and operand is None:
+        return column.is_(None)
+    if op == "$ne" and operand is None:
+        return column.is_not(None)
+    if op in ("$in", "$nin"):
+        candidates = [value for value in operand if _same_type(column, value)]
+        condition = (
+            and_(column.is_not(None), column.in_(candidates))
+            if len(candidates) > 0
+            else false()
+        )
+    elif not _same_type(column, operand):
+        condition = false()
+    else:
+        compare = ORDERINGS.get(op, operator.eq)
+        # 値の無い列はNOTの中でも不一致(FALSE)になるようにする
+        condition = and_(column.is_not(None), compare(column, operand))
+    if op in ("$ne", "$nin"):
+        return not_(condition)
+    return condition
+
+
+def _same_type(column, value):
+    return isinstance(column.type, String) == isinstance(value, str)
+
+
+def filter_line_items(data, predicate):
+    """一覧検索の結果のうち条件に合う明細だけの結果（元の結果は変更しない）
+
+    明細のリストが見つからない形式の場合はNone
+    """
+    groups = data if isinstance(data, list) else [data]
+    result = []
+    found = False
+    for group in groups:
+        if not isinstance(group, dict):
+            return None
+        group = dict(group)
+        for key in LINE_ITEM_KEYS:
+            if isinstance(group.get(key), list):
+                group[key] = [item for item in group[key] if predicate(item)]
+                found = True
+        result.append(group)
+    if not found:
+        return None
+    return result if isinstance(data, list) else result[0]
+
+
+def get_stats() -> dict:
+    stats = {}
+    for name, cache in (("text", get_conditions), ("normalized", _compile)):
+        info = cache.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+    return stats
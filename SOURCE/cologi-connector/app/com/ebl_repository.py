@@ -0,0 +1,259 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import json
+import fcntl
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import g, has_request_context
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com import ebl_journal
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+
+class EblConflict(Exception):
+    """保存しようとしたB/Lが読み込んだ後に他の処理で更新されていた"""
+
+
+def version_of(bl_file) -> int:
+    """B/Lファイルの版（保存する毎に増える。版の無い古いファイルは0）"""
+    if bl_file is None:
+        return 0
+    return int(bl_file.get("version", 0))
+
+
+class EblRepository:
+    """EBL_DIR/{trsp_instruction_id}.json のB/Lファイルの読み書き
+
+    読み込んだ内容はファイルの(mtime, inode, サイズ)と合わせてLRUで保持し、
+    変わっていなければファイルを読まずに返す。他のプロセスやコンテナが
+    書き換えた場合はstatが変わるため読み直す。
+    リクエスト中は最初に読み込んだ内容(スナップショット)を使い回し、
+    同じリクエストで保存した場合はスナップショットも更新する。
+    返す内容はキャッシュと共有されるため変更しないこと。
+
+    保存はtrsp_instruction_id毎のファイルロック(EBL_DIR/.{id}.lock)の中で
+    版を比べて行う(compare-and-swap)。コアとコネクタのコンテナは/eblを
+    共有するため、プロセス内のロックではなくファイルロックを使う。
+    同じスレッドで取得済みのロックは取り直さないため、判定から保存までを
+    lockの中で行うこともできる（他のtrsp_instruction_idは並行して処理できる）。
+    """
+
+    def __init__(self, max_entries=None):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._held = threading.local()
+        self._entries = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "snapshot_hits": 0,
+            "not_found": 0,
+            "errors": 0,
+            "writes": 0,
+            "conflicts": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    @staticmethod
+    def path(trsp_instruction_id) -> str:
+        return os.path.join(os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json")
+
+    def load(self, trsp_instruction_id, fresh=False):
+        """B/Lファイルの内容(signed_bl, bl_id, current_owner)。無い場合はNone
+
+        freshの場合はスナップショットを使わずに読み直す（lockの中で判定する場合）。
+        """
+        file_path = self.path(trsp_instruction_id)
+        snapshots = self._snapshots()
+        if not fresh and snapshots is not None and file_path in snapshots:
+            self._count("snapshot_hits")
+            return snapshots[file_path]
+        bl_file = self._load(file_path)
+        if snapshots is not None:
+            snapshots[file_path] = bl_file
+        return bl_file
+
+    def _load(self, file_path):
+        try:
+            f = open(file_path, "rb")
+        except FileNotFoundError:
+            self._forget(file_path)
+            self._count("not_found")
+            return None
+        try:
+            with f:
+                # 開いたファイルのstatなので、読み込む内容と必ず一致する
+                stat_key = _stat_key(os.fstat(f.fileno()))
+                with self._lock:
+                    entry = self._entries.get(file_path)
+                    if entry is not None and entry[0] == stat_key:
+                        self._entries.move_to_end(file_path)
+                        self._stats["hits"] += 1
+                        return entry[1]
+                bl_file = json.loads(f.read())
+        except ValueError as e:
+            logger.error(f"B/L {file_path}を読み込めません: {e}")
+            self._count("errors")
+            return None
+        self._put(file_path, stat_key, bl_file, "misses")
+        return bl_file
+
+    @contextmanager
+    def lock(self, trsp_instruction_id):
+        """trsp_instruction_id毎の排他ロック（他のプロセス・コンテナとも排他）
+
+        同じスレッドで取得済みの場合はそのまま使う（別に開くと自分の
+        ロックを待ち続けるため）。
+        """
+        held = getattr(self._held, "ids", None)
+        if held is None:
+            held = self._held.ids = set()
+        if trsp_instruction_id in held:
+            yield
+            return
+        lock_path = os.path.join(
+            os.environ.get("EBL_DIR"), f".{trsp_instruction_id}.lock"
+        )
+        # ロックファイルは削除しない（削除と取得が競合すると排他できないため）
+        with open(lock_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            held.add(trsp_instruction_id)
+            try:
+                yield
+            finally:
+                held.discard(trsp_instruction_id)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def save(
+        self, trsp_instruction_id, bl_file, expected_version=None, event="save", **extra
+    ) -> dict:
+        """B/Lファイルを次の版で置き換え、保存した内容を返す
+
+        expected_versionを指定した場合、現在の版と異なれば保存せずに
+        EblConflictを発生させる（読み込んだ後に他の処理が更新した）。
+        書き込み途中の内容を読まれないように一時ファイルから差し替える。
+        保存した内容はevent(bl/register等)とextraの項目と合わせて履歴に残す。
+        """
+        file_path = self.path(trsp_instruction_id)
+        with self.lock(trsp_instruction_id):
+            current_version = version_of(self._load(file_path))
+            if expected_version is not None and current_version != expected_version:
+                self._count("conflicts")
+                snapshots = self._snapshots()
+                if snapshots is not None:
+                    # 次の読み込みでは更新後の内容を使う
+                    snapshots.pop(file_path, None)
+                raise EblConflict(
+                    f"B/L {file_path}は更新されています"
+                    f" version={current_version} expected={expected_version}"
+                )
+            bl_file = {**bl_file, "version": current_version + 1}
+            self._write(file_path, bl_file)
+            # 版の順に残るようにロックの中で追記する
+            ebl_journal.record(trsp_instruction_id, event, bl_file, **extra)
+        snapshots = self._snapshots()
+        if snapshots is not None:
+            snapshots[file_path] = bl_file
+        if Config.EBL_DB_STORE:
+            # 事業者や日付で検索できるようにDBにも反映する
+            # （ebl_storeはこのモジュールを使うモデルを読み込むため、ここで読み込む）
+            from com.ebl_store import ebl_store
+
+            ebl_store.put(trsp_instruction_id, bl_file)
+        return bl_file
+
+    def _write(self, file_path, bl_file):
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(file_path), prefix=".ebl-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(bl_file, f, indent=4, ensure_ascii=False)
+                f.flush()
+                # 差し替えた後に電源断等で中身が失われないようにする
+                os.fsync(f.fileno())
+                stat_key = _stat_key(os.fstat(f.fileno()))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        # 置き換えでinodeは一時ファイルのものになり、mtimeも変わらない
+        self._put(file_path, stat_key, bl_file, "writes")
+
+    def _put(self, file_path, stat_key, bl_file, stat_name):
+        max_entries = self._max_entries or Config.EBL_CACHE_SIZE
+        with self._lock:
+            self._stats[stat_name] += 1
+            self._entries[file_path] = (stat_key, bl_file)
+            self._entries.move_to_end(file_path)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def _forget(self, file_path):
+        with self._lock:
+            self._entries.pop(file_path, None)
+
+    @staticmethod
+    def _snapshots():
+        if not has_request_context():
+            return None
+        if "ebl_snapshots" not in g:
+            g.ebl_snapshots = {}
+        return g.ebl_snapshots
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        reads = stats["hits"] + stats["misses"] + stats["snapshot_hits"]
+        stats["hit_rate"] = (
+            round((stats["hits"] + stats["snapshot_hits"]) / reads, 3)
+            if reads > 0
+            else 0.0
+        )
+        return stats
+
+
+def _stat_key(st):
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+ebl_repository = EblRepository()
+
+
+def get_stats() -> dict:
+    return ebl_repository.get_stats()
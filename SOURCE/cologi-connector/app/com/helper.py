@@ -167,6 +167,9 @@ def create_response_model(
         model_fields["total_num"] = fields.Integer(example=1, description="総ページ数")
         model_fields["offset"] = fields.Integer(example=0, description="オフセット")
         model_fields["num"] = fields.Integer(example=100, description="取得数")
+        model_fields["next_cursor"] = fields.String(
+            example=None, description="次のページのカーソル(最後のページはnull)"
+        )
     else:
         model_fields[data_field_name] = fields.Nested(data_restx_model)
     model_fields["result"] = fields.Boolean(example=True, description="API結果")
@@ -177,6 +180,16 @@ def create_response_model(
     return api.model(model_name, model_fields)
 
 
+def page_fields(data, items):
+    """コネクタの一覧検索の応答のページ情報（無い場合は全件を返したものとみなす）"""
+    return {
+        "total_num": data.get("total_num", len(items)),
+        "offset": data.get("offset", 0),
+        "num": data.get("num", len(items)),
+        "next_cursor": data.get("next_cursor"),
+    }
+
+
 def create_query_parser(api):
     query_parser = api.parser()
     query_parser.add_argument(
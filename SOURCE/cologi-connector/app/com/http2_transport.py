@@ -0,0 +1,198 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import logging
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import httpx
+except ImportError:  # HTTP/2を使わない場合は不要
+    httpx = None
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+
+class Http2Transport:
+    """相手コネクタ(X-ENDPOINT)とのHTTP/2通信
+
+    相手のEndpoint毎に1本のコネクションを保持し、同時に送るリクエストは
+    ストリームとして多重化する（ヘッダはHPACKで圧縮される）。
+    sendはrequestsのSession.requestと同じ引数・戻り値・例外で、
+    http_client.mount_http2に渡して使う。
+    """
+
+    def __init__(self, max_connections=None, keepalive_expiry=None):
+        if httpx is None:
+            raise RuntimeError("HTTP/2を使うには httpx[http2] が必要です")
+        self.max_connections = (
+            max_connections
+            if max_connections is not None
+            else Config.HTTP2_MAX_CONNECTIONS
+        )
+        self.keepalive_expiry = (
+            keepalive_expiry
+            if keepalive_expiry is not None
+            else Config.HTTP2_KEEPALIVE_EXPIRY
+        )
+        self._lock = threading.Lock()
+        # 証明書の検証有無でクライアントを分ける(httpxはクライアント単位の設定)
+        self._clients = {}
+        self._versions = {}
+
+    def _client(self, verify) -> "httpx.Client":
+        client = self._clients.get(verify)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(verify)
+                if client is None:
+                    client = httpx.Client(
+                        http2=True,
+                        verify=verify,
+                        limits=httpx.Limits(
+                            max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_connections,
+                            keepalive_expiry=self.keepalive_expiry,
+                        ),
+                    )
+                    self._clients[verify] = client
+        return client
+
+    def send(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        json=None,
+        headers=None,
+        timeout=None,
+        verify=True,
+        proxies=None,
+        stream=False,
+        **kwargs,
+    ) -> requests.Response:
+        # proxiesは相手コネクタへの直接接続のため使わない（環境変数の設定には従う）
+        # requestsのdataはdictならフォーム、それ以外は本文
+        body = {"data": data} if isinstance(data, dict) else {"content": data}
+        client = self._client(verify)
+        try:
+            request = client.build_request(
+                method,
+                url,
+                params=params,
+                json=json,
+                headers=headers,
+                timeout=_to_httpx_timeout(timeout),
+                **body,
+            )
+            # stream=Trueの場合は本文を読み込まずに返す（iter_content/iter_linesで読む）
+            response = client.send(request, stream=stream)
+        except httpx.HTTPError as e:
+            raise _to_requests_error(e) from e
+        with self._lock:
+            version = response.http_version
+            self._versions[version] = self._versions.get(version, 0) + 1
+        return _to_requests_response(response, stream)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "http_versions": dict(self._versions),
+                "max_connections": self.max_connections,
+            }
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients = {}
+        for client in clients:
+            client.close()
+
+
+def _to_httpx_timeout(timeout):
+    if timeout is None:
+        return None
+    if isinstance(timeout, tuple):
+        connect_timeout, read_timeout = timeout
+    else:
+        connect_timeout = read_timeout = timeout
+    return httpx.Timeout(
+        read_timeout, connect=connect_timeout, pool=connect_timeout
+    )
+
+
+def _to_requests_error(e) -> requests.exceptions.RequestException:
+    if isinstance(e, httpx.ConnectTimeout):
+        return requests.exceptions.ConnectTimeout(e)
+    if isinstance(e, httpx.TimeoutException):
+        return requests.exceptions.ReadTimeout(e)
+    if isinstance(e, httpx.TransportError):
+        return requests.exceptions.ConnectionError(e)
+    return requests.exceptions.RequestException(e)
+
+
+class _StreamRaw:
+    """httpxのレスポンスの本文をrequestsのResponse.rawとして読む"""
+
+    def __init__(self, response):
+        self._response = response
+
+    def stream(self, chunk_size, decode_content=True):
+        # chunk_sizeまで溜めずに受信した分を返す（NDJSONの行を逐次中継する）
+        try:
+            yield from self._response.iter_bytes()
+        except httpx.HTTPError as e:
+            raise _to_requests_error(e) from e
+
+    def close(self):
+        self._response.close()
+
+
+def _to_requests_response(response, stream=False) -> requests.Response:
+    # 呼出し側(decode_json等)はrequestsのResponseを前提にしている
+    result = requests.Response()
+    result.status_code = response.status_code
+    result.reason = response.reason_phrase
+    result.headers = CaseInsensitiveDict(response.headers.multi_items())
+    result.url = str(response.url)
+    result.encoding = response.charset_encoding
+    if stream:
+        result.raw = _StreamRaw(response)
+    else:
+        result._content = response.content
+        result._content_consumed = True
+    return result
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_http2_transport() -> Http2Transport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = Http2Transport()
+    return _transport
@@ -0,0 +1,304 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import logging
+import socket
+import threading
+import time
+from functools import partial
+from urllib.parse import urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com import resilience
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+
+class ConnectionStats:
+    """ホスト毎のリクエスト数と新規コネクション数を集計する"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        if host not in self._hosts:
+            self._hosts[host] = {"requests": 0, "new_connections": 0}
+        return self._hosts[host]
+
+    def request_sent(self, host):
+        with self._lock:
+            self._host(host)["requests"] += 1
+
+    def connection_created(self, host):
+        with self._lock:
+            self._host(host)["new_connections"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            hosts = {host: dict(value) for host, value in self._hosts.items()}
+        total_requests = 0
+        total_connections = 0
+        for value in hosts.values():
+            value["reused"] = max(value["requests"] - value["new_connections"], 0)
+            value["reuse_rate"] = (
+                round(value["reused"] / value["requests"], 3)
+                if value["requests"] > 0
+                else 0.0
+            )
+            total_requests += value["requests"]
+            total_connections += value["new_connections"]
+        reused = max(total_requests - total_connections, 0)
+        return {
+            "requests": total_requests,
+            "new_connections": total_connections,
+            "reused": reused,
+            "reuse_rate": (
+                round(reused / total_requests, 3) if total_requests > 0 else 0.0
+            ),
+            "hosts": hosts,
+        }
+
+
+_stats = ConnectionStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _stats.connection_created(f"{self.host}:{self.port}")
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _stats.connection_created(f"{self.host}:{self.port}")
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """新規コネクションを計測するHTTPAdapter（ホスト毎にプールを持つ）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+class _UnixSocketConnection(HTTPConnection):
+    def __init__(self, *args, socket_path=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            # 送信前の失敗として他の接続先に切り替えられるようにする
+            raise NewConnectionError(
+                self, f"{self.socket_path}に接続できません: {e}"
+            ) from e
+        return sock
+
+
+class _UnixSocketConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _UnixSocketConnection
+
+    def __init__(self, host, socket_path, **kwargs):
+        super().__init__(host, **kwargs)
+        self.socket_path = socket_path
+
+    def _new_conn(self):
+        _stats.connection_created(f"{self.host}:{self.port}")
+        return self.ConnectionCls(
+            host=self.host,
+            port=self.port,
+            timeout=self.timeout.connect_timeout,
+            socket_path=self.socket_path,
+        )
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """UNIXドメインソケットで接続するHTTPAdapter
+
+    同一ホストに配置したアプリ間の呼出しで、TCP/TLSを経由せずに接続する。
+    """
+
+    def __init__(self, host, socket_path, pool_maxsize):
+        self._pool = _UnixSocketConnectionPool(
+            host, socket_path, port=80, maxsize=pool_maxsize
+        )
+        super().__init__(pool_maxsize=pool_maxsize)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool
+
+    def get_connection(self, url, proxies=None):
+        return self._pool
+
+    def request_url(self, request, proxies):
+        # プロキシは経由しない
+        return request.path_url
+
+    def close(self):
+        self._pool.close()
+        super().close()
+
+
+class HttpClient:
+    """外部API呼出し用の共有HTTPクライアント
+
+    requestsのモジュール関数は呼出し毎にSessionを作るためTCP/TLSの接続が
+    再利用されない。プロセスで1つのSessionを共有し、ホスト毎のコネクション
+    プール（keep-alive）を使い回す。
+    """
+
+    def __init__(self, pool_connections=None, pool_maxsize=None, pool_block=None):
+        self.pool_connections = (
+            pool_connections
+            if pool_connections is not None
+            else Config.HTTP_POOL_CONNECTIONS
+        )
+        self.pool_maxsize = (
+            pool_maxsize if pool_maxsize is not None else Config.HTTP_POOL_MAXSIZE
+        )
+        self.pool_block = (
+            pool_block if pool_block is not None else Config.HTTP_POOL_BLOCK
+        )
+        self._lock = threading.Lock()
+        self._session = None
+        self._unix_sockets = {}
+        self._unix_fallbacks = {}
+        self._unix_down = {}
+        self._http2 = None
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = PooledHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        for host, socket_path in self._unix_sockets.items():
+            session.mount(
+                f"http://{host}/",
+                UnixSocketAdapter(host, socket_path, self.pool_maxsize),
+            )
+        return session
+
+    def mount_unix_socket(self, host, socket_path, fallback=None, retry_after=30):
+        """http://{host}/ への呼出しをUNIXドメインソケットで接続する
+
+        fallback(URL。スキームとホストを使う)を指定した場合、ソケットに接続できなければ
+        （古いソケットファイルが残っている場合等）fallbackで呼び出し、
+        retry_after秒はソケットを使わない。
+        """
+        self._unix_sockets[host] = socket_path
+        if fallback is not None:
+            self._unix_fallbacks[host] = (fallback, retry_after)
+        if self._session is not None:
+            self._session.mount(
+                f"http://{host}/",
+                UnixSocketAdapter(host, socket_path, self.pool_maxsize),
+            )
+
+    def mount_http2(self, send):
+        """相手コネクタ(設定に無いhttpsのホスト)への呼出しをsendで送る
+
+        sendはrequestsのSession.requestと同じ引数・戻り値・例外の関数。
+        """
+        self._http2 = send
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        parsed = urlsplit(url)
+        port = parsed.port
+        if port is None:
+            port = 443 if parsed.scheme == "https" else 80
+        _stats.request_sent(f"{parsed.hostname}:{port}")
+        send = self.session.request
+        if (
+            self._http2 is not None
+            and parsed.scheme == "https"
+            and resilience.dependency_of(url).startswith("remote:")
+        ):
+            send = self._http2
+        if parsed.hostname in self._unix_fallbacks:
+            send = partial(self._send_unix_socket, parsed.hostname)
+        # タイムアウト・サーキットブレーカー・GETのリトライを適用する
+        return resilience.call(method, url, send, **kwargs)
+
+    def _send_unix_socket(self, host, method, url, **kwargs) -> requests.Response:
+        fallback, retry_after = self._unix_fallbacks[host]
+        if time.monotonic() >= self._unix_down.get(host, 0):
+            try:
+                return self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                # 送信後のエラーは二重に処理される可能性があるため切り替えない
+                reason = getattr(e.args[0], "reason", None) if e.args else None
+                if not isinstance(reason, NewConnectionError):
+                    raise
+                logger.warning(f"{host}のソケットに接続できないため{fallback}で呼び出します")
+                self._unix_down[host] = time.monotonic() + retry_after
+        parsed = urlsplit(url)
+        fallback = urlsplit(fallback)
+        url = urlunsplit((fallback.scheme, fallback.netloc, *parsed[2:]))
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def get_stats(self) -> dict:
+        stats = _stats.get_stats()
+        stats["pool_connections"] = self.pool_connections
+        stats["pool_maxsize"] = self.pool_maxsize
+        stats["http2"] = self._http2 is not None
+        return stats
+
+
+http_client = HttpClient()
@@ -0,0 +1,605 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import time
+import operator
+import logging
+import threading
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import or_, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import MANYTOONE, aliased, selectinload
+from marshmallow import fields
+from config import ConfigIns
+from database import db
+from model.sync_cursor_model import SyncCursor
+from model.model_3012_operation.trsp_plan_line_item_model import (
+    TrspPlanLineItem,
+    TrspPlanLineItemSchema,
+)
+from model.model_3012_operation.trsp_isr_model import TrspIsr
+from model.model_3012_operation.trsp_srvc_model import TrspSrvc
+from com.backend_api import BackendApi
+from com.single_flight import get_single_flight
+from com.conditions import ADVANCED_CONDITIONS, get_conditions
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# 同期対象（API-030 キャリア向け運行依頼）
+CARRIER_OPERATION_PLANS = "carrier_operation_plans"
+
+# 検索前にバックエンドと同期させる指定（バックエンドには渡さない）
+REFRESH_PARAM = "refresh"
+
+# バックエンドに渡す変更カーソル（前回の同期の開始時刻）の書式
+CURSOR_FORMAT = "%Y%m%d%H%M%S"
+
+# ストリーミングで1回に読み込む明細の件数
+STREAM_BATCH_SIZE = 100
+
+# ローカル検索で扱える検索条件 {パラメータ: (列, 比較)}。文字列は完全一致
+# 運行計画の日時(min_/max_trsp_op_*)は明細のテーブルに同じ項目が無いため
+# バックエンドに問い合わせる（便の運行日時とは意味が異なる）
+LOCAL_FILTERS = {
+    "service_no": (TrspSrvc.service_no, operator.eq),
+    "service_name": (TrspSrvc.service_name, operator.eq),
+}
+
+
+def _relationships(model=TrspPlanLineItem):
+    # 明細を構成するテーブル(輸送指示、輸送サービス、荷送人等)への参照
+    return [
+        relationship
+        for relationship in model.__mapper__.relationships
+        if relationship.direction is MANYTOONE
+    ]
+
+
+def iter_line_items(response):
+    """バックエンドの応答から(事業者ID, 運行依頼の明細)を取り出す
+
+    応答は事業者毎の{"source_cid", "trsp_plan_line_item"}のリスト、
+    または明細のリストのどちらでもよい。
+    """
+    groups = response if isinstance(response, list) else [response]
+    for group in groups:
+        if not isinstance(group, dict):
+            continue
+        if "trsp_plan_line_item" in group:
+            for item in group.get("trsp_plan_line_item") or []:
+                yield group.get("source_cid"), item
+        else:
+            yield None, group
+
+
+def _to_row(model, data):
+    """dictの値のうちテーブルの列にあるものでモデルを作る（連番の主キー・外部キーは除く）
+
+    参照先のテーブルも同様に作る。輸送指示は輸送指示IDが主キーのため更新する。
+    """
+    values = {}
+    for column in model.__table__.columns:
+        if column.key not in data or column.foreign_keys:
+            continue
+        if column.primary_key and isinstance(column.type, db.Integer):
+            continue
+        value = data[column.key]
+        if isinstance(column.type, db.String) and value is not None:
+            value = str(value)
+        values[column.key] = value
+    for relationship in _relationships(model):
+        value = data.get(relationship.key)
+        if isinstance(value, list):
+            # スキーマ上は一覧でもテーブルには1件しか持てない
+            if len(value) > 1:
+                raise ValueError(f"{relationship.key} が複数あります")
+            value = value[0] if value else None
+        if value is None:
+            continue
+        row = _to_row(relationship.mapper.class_, value)
+        if relationship.mapper.class_ is TrspIsr:
+            row = db.session.merge(row)
+        values[relationship.key] = row
+    return model(**values)
+
+
+def _delete_row(row):
+    """行と参照先の行を削除する（輸送指示は残す）"""
+    children = [
+        getattr(row, relationship.key)
+        for relationship in _relationships(type(row))
+        if relationship.mapper.class_ is not TrspIsr
+    ]
+    db.session.delete(row)
+    db.session.flush()
+    for child in children:
+        if child is not None:
+            _delete_row(child)
+
+
+def _dump(schema, row):
+    """スキーマの項目に沿って行をdictにする（一覧の項目は1件のリストにする）"""
+    data = {}
+    for name, field in schema.fields.items():
+        if field.load_only:
+            continue
+        value = getattr(row, name, None)
+        if isinstance(field, fields.List) and isinstance(field.inner, fields.Nested):
+            data[name] = [] if value is None else [_dump(field.inner.schema, value)]
+        elif isinstance(field, fields.Nested):
+            data[name] = None if value is None else _dump(field.schema, value)
+        else:
+            data[name] = field.serialize(name, row)
+    return data
+
+
+def _load_options(model=TrspPlanLineItem, parent=None):
+    # 明細を構成するテーブルをまとめて読み込む
+    options = []
+    for relationship in _relationships(model):
+        attribute = getattr(model, relationship.key)
+        option = (
+            selectinload(attribute)
+            if parent is None
+            else parent.selectinload(attribute)
+        )
+        options.append(option)
+        options.extend(_load_options(relationship.mapper.class_, option))
+    return options
+
+
+class _ColumnResolver:
+    """advanced_conditionsの項目(明細からのパス)を列にする
+
+    パスはスキーマの項目(バックエンドの応答と同じ)でたどり、参照先のテーブルは
+    パス毎に別名で外部結合する(joins)。列が無い項目はNone
+    """
+
+    def __init__(self):
+        self.schema = TrspPlanLineItemSchema()
+        self.joins = {}
+
+    def __call__(self, path):
+        schema = self.schema
+        entity = TrspPlanLineItem
+        keys = path.split(".")
+        for index, key in enumerate(keys):
+            field = schema.fields.get(key)
+            if field is None or field.load_only:
+                return None
+            if isinstance(field, fields.List):
+                field = field.inner
+            attribute = getattr(entity, key, None)
+            if attribute is None:
+                return None
+            if index == len(keys) - 1:
+                return None if isinstance(field, fields.Nested) else attribute
+            if not isinstance(field, fields.Nested):
+                return None
+            prefix = ".".join(keys[: index + 1])
+            if prefix not in self.joins:
+                alias = aliased(attribute.property.mapper.class_)
+                self.joins[prefix] = (alias, attribute.of_type(alias))
+            entity = self.joins[prefix][0]
+            schema = field.schema
+        return None
+
+
+class OperationSync:
+    """バックエンドの運行依頼をmodel_3012_operationのテーブルに同期する
+
+    差分同期では前回の同期の開始時刻を変更カーソルとしてバックエンドに渡し、
+    返された運行依頼を輸送指示ID(trsp_instruction_id)毎に入れ替える。
+    バックエンドで削除されたものは全件同期(OPERATION_SYNC_FULL_INTERVAL毎)で消す。
+    同期遅れがOPERATION_SYNC_MAX_LAG秒以内で、コネクタ経由の更新も反映済みの場合に
+    限り、API-030の検索をローカルのテーブルで行う。
+    """
+
+    def __init__(self, name=CARRIER_OPERATION_PLANS):
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0,
+            "backend_fallbacks": 0,
+            "syncs": 0,
+            "sync_errors": 0,
+        }
+        self._last_error = ""
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_cursor(self):
+        cursor = db.session.get(SyncCursor, self.name)
+        if cursor is None:
+            try:
+                db.session.add(
+                    SyncCursor(name=self.name, item_count=0, skipped_count=0)
+                )
+                db.session.commit()
+            except IntegrityError:
+                # 他のプロセスが先に作成した
+                db.session.rollback()
+            cursor = db.session.get(SyncCursor, self.name)
+        return cursor
+
+    def sync(self, full=None):
+        """バックエンドと同期して同期した件数を返す
+
+        fullがNoneの場合は前回の全件同期からの経過時間で全件同期するかを決める。
+        """
+        started = datetime.now()
+        try:
+            cursor = self._get_cursor()
+            if full is None:
+                full = (
+                    cursor.cursor is None
+                    or cursor.full_synced_at is None
+                    or (started - cursor.full_synced_at).total_seconds()
+                    >= ConfigIns.OPERATION_SYNC_FULL_INTERVAL
+                )
+            param = {}
+            if not full:
+                param[ConfigIns.OPERATION_SYNC_CURSOR_PARAM] = cursor.cursor
+            # バックエンドの呼出し中は同期状態の行をロックしない
+            db.session.commit()
+            backend_api = BackendApi()
+            response = backend_api.call_api(
+                self.name, method="GET", data=None, param=param
+            )
+            if response is False:
+                raise ValueError(f"Backend error: {backend_api.last_error}")
+            # 同期の反映は同期状態の行のロックで1つずつ行う
+            cursor = db.session.get(SyncCursor, self.name, with_for_update=True)
+            if cursor.synced_at is not None and cursor.synced_at > started:
+                logger.info(f"{self.name} は後から開始した同期で反映済みです")
+                db.session.rollback()
+                return 0
+            synced, skipped = self._apply(response)
+            if full:
+                self._delete_missing(synced)
+                cursor.full_synced_at = started
+                cursor.skipped_count = skipped
+            else:
+                cursor.skipped_count += skipped
+            overlap = timedelta(seconds=ConfigIns.OPERATION_SYNC_CURSOR_OVERLAP)
+            cursor.cursor = (started - overlap).strftime(CURSOR_FORMAT)
+            cursor.synced_at = started
+            cursor.item_count = TrspPlanLineItem.query.count()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self._count("sync_errors")
+            self._last_error = str(e)
+            raise
+        self._count("syncs")
+        logger.info(
+            f"{self.name} {'全件' if full else '差分'}同期: "
+            f"{len(synced)}件 スキップ {skipped}件"
+        )
+        return len(synced)
+
+    def _apply(self, response):
+        synced = set()
+        skipped = 0
+        for cid, item in iter_line_items(response):
+            trsp_instruction_id = (item.get("trsp_isr") or {}).get(
+                "trsp_instruction_id"
+            )
+            if not trsp_instruction_id:
+                skipped += 1
+                continue
+            trsp_instruction_id = str(trsp_instruction_id)
+            try:
+                with db.session.begin_nested():
+                    # 同じ輸送指示IDの明細が複数ある場合は最初の1件の前に入れ替える
+                    self._replace(
+                        trsp_instruction_id,
+                        cid,
+                        item,
+                        trsp_instruction_id not in synced,
+                    )
+                synced.add(trsp_instruction_id)
+            except Exception as e:
+                skipped += 1
+                logger.warning(f"運行依頼 {trsp_instruction_id} を同期できません: {e}")
+        return synced, skipped
+
+    def _replace(self, trsp_instruction_id, cid, item, replace):
+        if replace:
+            for line_item in TrspPlanLineItem.query.filter_by(
+                trsp_isr_id=trsp_instruction_id
+            ).all():
+                _delete_row(line_item)
+        line_item = _to_row(TrspPlanLineItem, item)
+        line_item.cid = cid
+        db.session.add(line_item)
+        db.session.flush()
+
+    def _delete_missing(self, synced):
+        """全件同期で返されなかった運行依頼を削除する"""
+        query = TrspPlanLineItem.query
+        if synced:
+            query = query.filter(TrspPlanLineItem.trsp_isr_id.notin_(synced))
+        for line_item in query.all():
+            _delete_row(line_item)
+        query = TrspIsr.query
+        if synced:
+            query = query.filter(TrspIsr.trsp_instruction_id.notin_(synced))
+        query.delete(synchronize_session=False)
+
+    def is_fresh(self, cursor, now=None):
+        """ローカルのテーブルで検索してよいか"""
+        if cursor is None or cursor.synced_at is None or cursor.skipped_count:
+            return False
+        if cursor.changed_at is not None and cursor.changed_at >= cursor.synced_at:
+            return False
+        return cursor.lag_seconds(now) <= ConfigIns.OPERATION_SYNC_MAX_LAG
+
+    def can_search(self, params):
+        for key, value in (params or {}).items():
+            if key == ADVANCED_CONDITIONS:
+                if value in (None, ""):
+                    continue
+                if not ConfigIns.ADVANCED_CONDITIONS_LOCAL:
+                    return False
+                conditions = get_conditions(value)
+                resolve = _ColumnResolver()
+                if conditions is None or any(
+                    resolve(path) is None for path in conditions.fields
+                ):
+                    return False
+            elif key not in LOCAL_FILTERS and key != "cid":
+                return False
+        return True
+
+    def search(self, params, refresh=False, page=None, stream=False):
+        """ローカルのテーブルで運行依頼を検索する
+
+        ローカルで扱えない検索条件がある場合や同期が遅れている場合はNoneを返す
+        （バックエンドに問い合わせる）。refreshの場合は先に差分同期する。
+        pageを指定した場合は件数を数え、そのページの明細だけを読み込む。
+        streamの場合は明細1件毎の{"source_cid", "trsp_plan_line_item"}を
+        STREAM_BATCH_SIZE件ずつ読み込みながら返すジェネレータを返す。
+        """
+        if not self.can_search(params):
+            self._count("backend_fallbacks")
+            return None
+        try:
+            if refresh:
+                # 同時に来た強制同期は1回にまとめる
+                get_single_flight("operation_sync").do(self.name, self.sync)
+            cursor = db.session.get(SyncCursor, self.name)
+            if not self.is_fresh(cursor):
+                self._count("backend_fallbacks")
+                return None
+            result = self._query(params, page, stream)
+        except Exception as e:
+            logger.error(e, exc_info=True, stack_info=False)
+            db.session.rollback()
+            self._count("backend_fallbacks")
+            return None
+        self._count("local_hits")
+        return result
+
+    def _query(self, params, page=None, stream=False):
+        query = TrspPlanLineItem.query.join(TrspSrvc, TrspPlanLineItem.trsp_srvc)
+        cid = params.get("cid")
+        if cid:
+            # 事業者IDの無い明細は自社のバックエンドのものとみなす
+            query = query.filter(
+                or_(TrspPlanLineItem.cid == cid, TrspPlanLineItem.cid.is_(None))
+            )
+        for key, value in params.items():
+            if key in LOCAL_FILTERS and value not in (None, ""):
+                column, compare = LOCAL_FILTERS[key]
+                query = query.filter(compare(column, value))
+        text = params.get(ADVANCED_CONDITIONS)
+        if text:
+            resolve = _ColumnResolver()
+            condition = get_conditions(text).to_sql(resolve)
+            for _, attribute in resolve.joins.values():
+                query = query.outerjoin(attribute)
+            query = query.filter(condition)
+        key = TrspPlanLineItem.trsp_plan_line_item_id
+        query = query.order_by(key) if page is None else page.apply(query, key)
+        query = query.options(*_load_options())
+        if stream:
+            return self._iter_query(query, page)
+        line_items = query.all()
+        if page is not None:
+            page.done(
+                len(line_items),
+                line_items[-1].trsp_plan_line_item_id if line_items else None,
+            )
+        schema = TrspPlanLineItemSchema()
+        groups = {}
+        for line_item in line_items:
+            groups.setdefault(line_item.cid, []).append(_dump(schema, line_item))
+        return [
+            {"source_cid": cid, "trsp_plan_line_item": line_items}
+            for cid, line_items in groups.items()
+        ]
+
+    def _iter_query(self, query, page):
+        schema = TrspPlanLineItemSchema()
+        count = 0
+        last_key = None
+        for line_item in query.yield_per(STREAM_BATCH_SIZE):
+            yield {
+                "source_cid": line_item.cid,
+                "trsp_plan_line_item": [_dump(schema, line_item)],
+            }
+            count += 1
+            last_key = line_item.trsp_plan_line_item_id
+        if page is not None:
+            page.done(count, last_key)
+
+    def mark_changed(self):
+        """コネクタ経由で更新されたため、次の同期まではローカルで検索しない"""
+        try:
+            SyncCursor.query.filter_by(name=self.name).update(
+                {"changed_at": datetime.now()}
+            )
+            db.session.commit()
+        except Exception as e:
+            logger.error(e, exc_info=True, stack_info=False)
+            db.session.rollback()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["last_error"] = self._last_error
+        stats["max_lag"] = ConfigIns.OPERATION_SYNC_MAX_LAG
+        try:
+            cursor = db.session.get(SyncCursor, self.name)
+        except Exception as e:
+            db.session.rollback()
+            stats["db_error"] = str(e)
+            return stats
+        if cursor is not None:
+            now = datetime.now()
+            lag = cursor.lag_seconds(now)
+            stats.update(
+                {
+                    "cursor": cursor.cursor,
+                    "synced_at": _isoformat(cursor.synced_at),
+                    "full_synced_at": _isoformat(cursor.full_synced_at),
+                    "changed_at": _isoformat(cursor.changed_at),
+                    "lag_seconds": None if lag is None else round(lag, 1),
+                    "item_count": cursor.item_count,
+                    "skipped_count": cursor.skipped_count,
+                    "fresh": self.is_fresh(cursor, now),
+                }
+            )
+        return stats
+
+
+def _isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+operation_sync = OperationSync()
+
+
+def pop_refresh(params) -> bool:
+    """検索条件から強制同期の指定を取り除いて返す"""
+    value = params.pop(REFRESH_PARAM, None)
+    return value is not None and str(value).lower() in ("1", "true", "yes")
+
+
+def search_operation_plans(params, refresh=False, page=None, stream=False):
+    """API-030の検索をローカルのテーブルで行う。行えない場合はNone"""
+    if not ConfigIns.OPERATION_SYNC_ENABLED:
+        return None
+    return operation_sync.search(params, refresh, page, stream)
+
+
+def mark_operation_changed():
+    if ConfigIns.OPERATION_SYNC_ENABLED:
+        operation_sync.mark_changed()
+
+
+operation_sync_cli = AppGroup(
+    "operation-sync", help="運行依頼(API-030)のローカルのテーブルへの同期"
+)
+
+
+@operation_sync_cli.command("init")
+def init_command():
+    """同期先のテーブルを作成する（作成済みのテーブルはそのまま）
+
+    作成済みのテーブルの列がモデルと異なる場合は flask db upgrade が必要なためエラーにする。
+    """
+    tables = [TrspPlanLineItem.__table__, SyncCursor.__table__]
+    models = [TrspPlanLineItem]
+    while models:
+        for relationship in _relationships(models.pop()):
+            tables.append(relationship.mapper.local_table)
+            models.append(relationship.mapper.class_)
+    db.metadata.create_all(db.engine, tables=tables)
+    differences = schema_differences(tables)
+    if differences:
+        raise click.ClickException(
+            "テーブルがモデルと異なります。flask db upgrade を実行してください\n"
+            + "\n".join(differences)
+        )
+    click.echo(f"{len(tables)}テーブルを確認しました")
+
+
+def schema_differences(tables):
+    """作成済みのテーブルに無い列・索引と、桁数の足りない文字列の列"""
+    inspector = sa_inspect(db.engine)
+    differences = []
+    for table in tables:
+        columns = {
+            column["name"]: column["type"]
+            for column in inspector.get_columns(table.name)
+        }
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                differences.append(f"{table.name}.{column.name}: 列がありません")
+                continue
+            length = getattr(column.type, "length", None)
+            if length is None:
+                continue
+            existing_length = getattr(columns[column.name], "length", None)
+            if existing_length is None or existing_length < length:
+                differences.append(
+                    f"{table.name}.{column.name}: {columns[column.name]}"
+                    f" (モデルは{column.type})"
+                )
+        for index in table.indexes:
+            if index.name not in indexes:
+                differences.append(f"{table.name}: 索引{index.name}がありません")
+    return differences
+
+
+@operation_sync_cli.command("run")
+@click.option("--full", is_flag=True, help="全件同期する")
+@click.option(
+    "--loop", is_flag=True, help="OPERATION_SYNC_INTERVAL秒毎に差分同期を繰り返す"
+)
+def run_command(full, loop):
+    """バックエンドと同期する"""
+    if not ConfigIns.OPERATION_SYNC_ENABLED:
+        click.echo("OPERATION_SYNC_ENABLEDが無効のため同期しません")
+        return
+    while True:
+        try:
+            count = operation_sync.sync(full=True if full else None)
+            click.echo(f"{count}件を同期しました")
+        except Exception as e:
+            if not loop:
+                raise click.ClickException(str(e))
+            logger.error(e, exc_info=True, stack_info=False)
+        if not loop:
+            return
+        full = False
+        time.sleep(ConfigIns.OPERATION_SYNC_INTERVAL)
+
+
+@operation_sync_cli.command("status")
+def status_command():
+    """同期の状態（同期遅れ等）を表示する"""
+    for key, value in operation_sync.get_stats().items():
+        click.echo(f"{key}: {value}")
@@ -0,0 +1,168 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import base64
+import hashlib
+import logging
+from config import ConfigIns
+from com.codec import dumps_json, loads_json
+from com.conditions import normalize_params
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# ページ指定のパラメータ（バックエンドには渡さない）
+OFFSET_PARAM = "o"
+NUM_PARAM = "n"
+CURSOR_PARAM = "cursor"
+
+
+class InvalidPage(ValueError):
+    """ページ指定(o, n, cursor)が不正"""
+
+
+class Page:
+    """一覧検索のページ
+
+    o(オフセット)とn(取得数)、または前のページの応答のnext_cursorで指定する。
+    nもcursorも無い場合は従来通り全件とする。
+    カーソルは検索条件に紐づき、ローカルのテーブルでは主キー(keyset)で続きを取得する。
+    一覧を取得してから切り出す場合はオフセットで続きを取得する。
+    """
+
+    def __init__(self, offset=0, limit=None, after=None, scope=""):
+        self.offset = offset
+        self.limit = limit
+        self.after = after
+        self.scope = scope
+        self.total = None
+        self.num = None
+        self.next_cursor = None
+
+    @classmethod
+    def pop(cls, params):
+        """検索条件からページ指定を取り除いて返す。不正な場合はInvalidPage"""
+        offset = _to_int(params.pop(OFFSET_PARAM, None), OFFSET_PARAM, 0)
+        limit = _to_int(params.pop(NUM_PARAM, None), NUM_PARAM, None)
+        cursor = params.pop(CURSOR_PARAM, None)
+        if limit is not None:
+            limit = min(max(limit, 1), ConfigIns.PAGINATION_MAX_NUM)
+        scope = _scope(params)
+        after = None
+        if cursor:
+            position = _decode_cursor(cursor)
+            if position.get("s") != scope:
+                raise InvalidPage("cursorは別の検索条件のものです")
+            offset = _to_int(position.get("o"), CURSOR_PARAM, 0)
+            after = position.get("k")
+            if limit is None:
+                limit = _to_int(position.get("n"), CURSOR_PARAM, None)
+        return cls(offset, limit, after, scope)
+
+    def apply(self, query, key):
+        """問合せの件数を数え、このページの分だけ取得する問合せにする（keyで並べる）"""
+        self.total = query.order_by(None).count()
+        query = query.order_by(key)
+        if self.after is not None:
+            query = query.filter(key > self.after)
+        elif self.offset > 0:
+            query = query.offset(self.offset)
+        if self.limit is not None:
+            query = query.limit(self.limit)
+        return query
+
+    def done(self, num, last_key=None):
+        """取得した件数と最後の行のキーで次のページのカーソルを作る"""
+        self.num = num
+        next_offset = self.offset + num
+        if self.limit is None or num == 0 or next_offset >= self.total:
+            self.next_cursor = None
+            return
+        position = {"s": self.scope, "o": next_offset, "n": self.limit}
+        if last_key is not None:
+            position["k"] = last_key
+        self.next_cursor = _encode_cursor(position)
+
+    def slice(self, items):
+        """取得済みの一覧からこのページの分を切り出す"""
+        self.total = len(items)
+        end = None if self.limit is None else self.offset + self.limit
+        items = items[self.offset : end]
+        self.done(len(items))
+        return items
+
+    def slice_groups(self, groups, key):
+        """事業者毎の明細のリスト({key: [明細]}のリスト)を明細の件数で切り出す"""
+        if not any(isinstance(group, dict) and key in group for group in groups):
+            # 明細のリストの場合
+            return self.slice(groups)
+        positions = [
+            (index, item)
+            for index, group in enumerate(groups)
+            for item in group.get(key) or []
+        ]
+        page = self.slice(positions)
+        result = {}
+        for index, item in page:
+            if index not in result:
+                result[index] = dict(groups[index])
+                result[index][key] = []
+            result[index][key].append(item)
+        return list(result.values())
+
+    def fields(self) -> dict:
+        """応答のページ情報（total_num:総件数, offset, num:取得数, next_cursor）"""
+        return {
+            "total_num": self.total,
+            "offset": self.offset,
+            "num": self.num,
+            "next_cursor": self.next_cursor,
+        }
+
+
+def _scope(params) -> str:
+    # カーソルを発行した検索条件(ページ指定を除く)
+    digest = hashlib.sha256(normalize_params(params).encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+def _to_int(value, name, default):
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise InvalidPage(f"{name}は整数で指定してください: {value}")
+    if value < 0:
+        raise InvalidPage(f"{name}は0以上で指定してください: {value}")
+    return value
+
+
+def _encode_cursor(position) -> str:
+    return base64.urlsafe_b64encode(dumps_json(position)).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor) -> dict:
+    try:
+        position = loads_json(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+    except ValueError:
+        raise InvalidPage(f"cursorが不正です: {cursor}")
+    if not isinstance(position, dict):
+        raise InvalidPage(f"cursorが不正です: {cursor}")
+    return position
@@ -0,0 +1,310 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import redis
+from config import ConfigIns
+from com.codec import dumps_json, loads_json
+from com.single_flight import flight_key, get_single_flight
+from com.conditions import (
+    ADVANCED_CONDITIONS,
+    filter_line_items,
+    get_conditions,
+    normalize_params,
+)
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+KEY_PREFIX = "cologi:response_cache"
+
+# キャッシュ対象の一覧検索API
+CARRIER_OPERATION_PLANS = "carrier_operation_plans"
+SHIPPER_OPERATION_PLANS = "shipper_operation_plans"
+
+
+def find_operation_ids(*payloads) -> set:
+    """データに含まれる運行計画ID(operation_id)"""
+    operation_ids = set()
+    stack = list(payloads)
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            operation_id = value.get("operation_id")
+            if isinstance(operation_id, (str, int)) and operation_id != "":
+                operation_ids.add(str(operation_id))
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return operation_ids
+
+
+class ResponseCache:
+    """バックエンドの一覧検索結果のキャッシュ(Redis)
+
+    検索条件毎に結果を保持し、ttl秒の間はバックエンドを呼ばずに返す。
+    ttlを過ぎてもstale_ttl秒の間は古い結果を返しつつ、裏で1件だけ再取得する
+    (stale-while-revalidate)。
+    結果に含まれる運行計画ID毎に索引を持ち、提案・回答・通知で運行計画が
+    更新された場合はその運行計画を含む結果だけを削除する。
+    運行計画が追加された場合(提案・予約)は検索結果を全て無効にする。
+    Redisに接続できない場合はキャッシュを使わずにバックエンドを呼ぶ。
+    """
+
+    def __init__(self, redis_url=None, ttl=None, stale_ttl=None):
+        self.redis_url = (
+            redis_url if redis_url is not None else ConfigIns.RESPONSE_CACHE_URL
+        )
+        self.ttl = ttl if ttl is not None else ConfigIns.RESPONSE_CACHE_TTL
+        self.stale_ttl = (
+            stale_ttl if stale_ttl is not None else ConfigIns.RESPONSE_CACHE_STALE_TTL
+        )
+        self._redis = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=ConfigIns.RESPONSE_CACHE_REFRESH_WORKERS,
+            thread_name_prefix="response_cache",
+        )
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "filtered_hits": 0,
+            "refreshes": 0,
+            "invalidations": 0,
+            "errors": 0,
+        }
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            with self._lock:
+                if self._redis is None:
+                    # Redisの障害でAPIの応答を待たせない
+                    self._redis = redis.from_url(
+                        self.redis_url,
+                        socket_connect_timeout=ConfigIns.RESPONSE_CACHE_SOCKET_TIMEOUT,
+                        socket_timeout=ConfigIns.RESPONSE_CACHE_SOCKET_TIMEOUT,
+                    )
+        return self._redis
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _generation_key(self, api):
+        return f"{KEY_PREFIX}:generation:{api}"
+
+    def _index_key(self, operation_id):
+        return f"{KEY_PREFIX}:operation:{operation_id}"
+
+    def _entry_key(self, api, generation, params):
+        digest = hashlib.sha256(normalize_params(params).encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:entry:{api}:{generation}:{digest}"
+
+    def get(self, api, params, loader):
+        """検索結果をキャッシュから返す。無ければloader()で取得して保存する
+
+        loaderはBackendApi.call_apiと同様に失敗時はFalseを返す関数。
+        Falseはキャッシュしない。
+        """
+        try:
+            generation = int(self.redis.get(self._generation_key(api)) or 0)
+            key = self._entry_key(api, generation, params)
+            entry = self.redis.get(key)
+        except redis.RedisError as e:
+            self._count("errors")
+            logger.warning(f"レスポンスキャッシュ {api} 参照エラー: {e}")
+            return loader()
+        if entry is not None:
+            entry = loads_json(entry)
+            age = time.time() - entry["stored_at"]
+            if age < self.ttl:
+                self._count("hits")
+                return entry["data"]
+            self._count("stale_hits")
+            self._refresh(api, key, loader)
+            return entry["data"]
+        self._count("misses")
+        data = loader()
+        self._store(api, key, data)
+        return data
+
+    def peek(self, api, params):
+        """TTL内の検索結果があれば返す（無ければNone。バックエンドは呼ばない）"""
+        try:
+            generation = int(self.redis.get(self._generation_key(api)) or 0)
+            entry = self.redis.get(self._entry_key(api, generation, params))
+        except redis.RedisError as e:
+            self._count("errors")
+            logger.warning(f"レスポンスキャッシュ {api} 参照エラー: {e}")
+            return None
+        if entry is None:
+            return None
+        entry = loads_json(entry)
+        if time.time() - entry["stored_at"] >= self.ttl:
+            return None
+        return entry["data"]
+
+    def get_filtered(self, api, params):
+        """advanced_conditionsを除いた検索結果がキャッシュにあれば、それを絞り込んで返す
+
+        advanced_conditionsをコネクタで評価できない場合や結果が無い場合はNone
+        """
+        text = params.get(ADVANCED_CONDITIONS)
+        if not text or not ConfigIns.ADVANCED_CONDITIONS_LOCAL:
+            return None
+        conditions = get_conditions(text)
+        if conditions is None:
+            return None
+        base_params = {
+            key: value for key, value in params.items() if key != ADVANCED_CONDITIONS
+        }
+        data = self.peek(api, base_params)
+        if data is None:
+            return None
+        data = filter_line_items(data, conditions.predicate)
+        if data is not None:
+            self._count("filtered_hits")
+        return data
+
+    def _refresh(self, api, key, loader):
+        # 再取得は複数のプロセス・スレッドから同時に行わない
+        try:
+            locked = self.redis.set(
+                f"{key}:refresh", 1, nx=True, ex=max(int(self.ttl), 1)
+            )
+        except redis.RedisError as e:
+            self._count("errors")
+            logger.warning(f"レスポンスキャッシュ {api} 再取得エラー: {e}")
+            return
+        if locked:
+            self._count("refreshes")
+            self._executor.submit(self._reload, api, key, loader)
+
+    def _reload(self, api, key, loader):
+        try:
+            self._store(api, key, loader())
+        except Exception as e:
+            logger.error(f"レスポンスキャッシュ {api} 再取得エラー: {e}")
+        finally:
+            try:
+                self.redis.delete(f"{key}:refresh")
+            except redis.RedisError:
+                pass
+
+    def _store(self, api, key, data):
+        if data is False:
+            return
+        expire = int(self.ttl + self.stale_ttl)
+        try:
+            with self.redis.pipeline() as pipe:
+                pipe.set(
+                    key,
+                    dumps_json({"stored_at": time.time(), "data": data}),
+                    ex=expire,
+                )
+                for operation_id in find_operation_ids(data):
+                    index_key = self._index_key(operation_id)
+                    pipe.sadd(index_key, key)
+                    pipe.expire(index_key, expire)
+                pipe.execute()
+        except redis.RedisError as e:
+            self._count("errors")
+            logger.warning(f"レスポンスキャッシュ {api} 保存エラー: {e}")
+
+    def invalidate(self, apis, operation_id=None, payloads=(), created=False):
+        """運行計画の更新後に、その運行計画を含む検索結果を削除する
+
+        運行計画IDはoperation_idとpayloads(リクエスト・レスポンスのデータ)から求める。
+        運行計画IDが分からない場合や、運行計画を追加した場合(created)は
+        apisの検索結果を全て無効にする（追加した運行計画はまだどの結果にも無いため）。
+        """
+        operation_ids = find_operation_ids(*payloads)
+        if operation_id:
+            operation_ids.add(str(operation_id))
+        self._count("invalidations")
+        try:
+            if created or len(operation_ids) == 0:
+                with self.redis.pipeline() as pipe:
+                    for api in apis:
+                        pipe.incr(self._generation_key(api))
+                    pipe.execute()
+                return
+            for operation_id in operation_ids:
+                index_key = self._index_key(operation_id)
+                keys = self.redis.smembers(index_key)
+                self.redis.delete(index_key, *keys)
+        except redis.RedisError as e:
+            self._count("errors")
+            logger.warning(f"レスポンスキャッシュ 削除エラー: {e}")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["hits"] + stats["stale_hits"]) / lookups, 3)
+            if lookups > 0
+            else 0.0
+        )
+        stats["ttl"] = self.ttl
+        stats["stale_ttl"] = self.stale_ttl
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def cached_call_api(backend_api, api, param):
+    """一覧検索のバックエンド呼出し(GET)をキャッシュする"""
+
+    def call_api():
+        return backend_api.call_api(api, method="GET", data=None, param=param)
+
+    def load():
+        # 同じ検索が同時に来た場合はバックエンドの呼出しを1回にまとめる
+        return get_single_flight(api).do(
+            flight_key(api, param, ConfigIns.CARRIER_BACKEND_ENDPOINT),
+            call_api,
+            shared=True,
+        )
+
+    if not ConfigIns.RESPONSE_CACHE_ENABLED:
+        return load()
+    filtered = response_cache.get_filtered(api, param)
+    if filtered is not None:
+        return filtered
+    return response_cache.get(api, param, load)
+
+
+def invalidate_operation(apis, operation_id=None, payloads=(), created=False):
+    """運行計画の更新後に一覧検索のキャッシュを削除する
+
+    運行計画を追加した場合はcreated=Trueとする。
+    運行依頼のローカルのテーブルも次の同期までは検索に使わないようにする。
+    """
+    if ConfigIns.RESPONSE_CACHE_ENABLED:
+        response_cache.invalidate(apis, operation_id, payloads, created)
+    if CARRIER_OPERATION_PLANS in apis:
+        from com.operation_sync import mark_operation_changed
+
+        mark_operation_changed()
@@ -0,0 +1,197 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import time
+import uuid
+import logging
+import threading
+import redis
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com.codec import dumps_json, loads_json
+from com.conditions import normalize_params
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+KEY_PREFIX = "cologi:single_flight"
+
+
+def flight_key(route, params, endpoint="", vary="") -> str:
+    """同じ呼出しとみなすキー（API, 検索条件, 呼出し先, 結果が変わるヘッダ等）"""
+    return f"{route}|{endpoint or ''}|{vary or ''}|{normalize_params(params)}"
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """同じキーの呼出しが実行中なら、その結果を待って共有する
+
+    画面を同時に開いた利用者の同じ検索を1回の呼出しにまとめる。
+    結果は呼出し元で共有されるため変更しないこと。
+    sharedを指定し、SINGLE_FLIGHT_REDIS_URLを設定した場合はRedisのロックで
+    プロセス間でもまとめる（結果はJSONにできるものに限る）。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"calls": 0, "shared": 0, "shared_remote": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def do(self, key, func, shared=False):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+        if not leader:
+            flight.done.wait()
+            self._count("shared")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            if shared and _redis() is not None:
+                flight.result = self._do_shared(key, func)
+            else:
+                self._count("calls")
+                flight.result = func()
+            return flight.result
+        except Exception as e:
+            self._count("errors")
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _do_shared(self, key, func):
+        redis_client = _redis()
+        lock_key = f"{KEY_PREFIX}:{self.name}:{key}"
+        token = uuid.uuid4().hex
+        timeout = Config.SINGLE_FLIGHT_LOCK_TIMEOUT
+        try:
+            locked = redis_client.set(lock_key, token, nx=True, px=int(timeout * 1000))
+            owner = None if locked else redis_client.get(lock_key)
+        except Exception as e:
+            logger.warning(f"single flight {self.name} ロックエラー: {e}")
+            locked, owner = False, None
+        if locked:
+            self._count("calls")
+            try:
+                result = func()
+                try:
+                    redis_client.set(
+                        f"{lock_key}:{token}",
+                        dumps_json(result),
+                        px=int(Config.SINGLE_FLIGHT_RESULT_TTL * 1000),
+                    )
+                except Exception as e:
+                    logger.warning(f"single flight {self.name} 保存エラー: {e}")
+                return result
+            finally:
+                try:
+                    redis_client.delete(lock_key)
+                except Exception:
+                    pass
+        if owner is not None:
+            result = self._wait_remote(redis_client, lock_key, owner.decode(), timeout)
+            if result is not None:
+                self._count("shared_remote")
+                return loads_json(result)
+        # 他のプロセスの結果が得られない場合（失敗・タイムアウト）は自分で呼び出す
+        self._count("calls")
+        return func()
+
+    def _wait_remote(self, redis_client, lock_key, token, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                result = redis_client.get(f"{lock_key}:{token}")
+                if result is not None:
+                    return result
+                if redis_client.get(lock_key) != token.encode():
+                    # 結果を保存する前にロックが解放された（失敗）
+                    return redis_client.get(f"{lock_key}:{token}")
+            except Exception as e:
+                logger.warning(f"single flight {self.name} 待機エラー: {e}")
+                return None
+            time.sleep(Config.SINGLE_FLIGHT_POLL_INTERVAL)
+        return None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        requests = stats["calls"] + stats["shared"] + stats["shared_remote"]
+        stats["hit_rate"] = (
+            round((stats["shared"] + stats["shared_remote"]) / requests, 3)
+            if requests > 0
+            else 0.0
+        )
+        return stats
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+_redis_client = None
+
+
+def _redis():
+    global _redis_client
+    url = getattr(Config, "SINGLE_FLIGHT_REDIS_URL", None)
+    if url is None:
+        return None
+    if _redis_client is None:
+        with _flights_lock:
+            if _redis_client is None:
+                # Redisの障害で呼出しを待たせない
+                _redis_client = redis.from_url(
+                    url, socket_connect_timeout=1, socket_timeout=1
+                )
+    return _redis_client
+
+
+def get_single_flight(name) -> SingleFlight:
+    single_flight = _flights.get(name)
+    if single_flight is None:
+        with _flights_lock:
+            single_flight = _flights.get(name)
+            if single_flight is None:
+                single_flight = SingleFlight(name)
+                _flights[name] = single_flight
+    return single_flight
+
+
+def get_stats() -> dict:
+    with _flights_lock:
+        flights = dict(_flights)
+    return {name: flight.get_stats() for name, flight in flights.items()}
@@ -14,13 +14,15 @@
 # ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # OTHER DEALINGS IN THE SOFTWARE.
 
+import os
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_marshmallow import Marshmallow
 
 db = SQLAlchemy()
 ma = Marshmallow()
-migrate = Migrate()
+# マイグレーションはコネクタのapp/migrationsで管理する
+migrate = Migrate(directory=os.path.join(os.path.dirname(__file__), "migrations"))
 
 
 def init_db(app):
@@ -40,5 +40,83 @@ class Config:
     LOGFILE_NAME = "/log/debug.log"
     TRUST_MNG_ENDPOINT = "http://XXXXXXXXXXXX/api/"
 
+    # 外部API呼出し用のコネクションプール
+    HTTP_POOL_CONNECTIONS = 10  # プールを保持するホスト数
+    HTTP_POOL_MAXSIZE = 100  # ホスト毎の最大コネクション数(uwsgiのthreadsに合わせる)
+    HTTP_POOL_BLOCK = False  # プールが枯渇した場合に空きを待つか
+    # /statsを参照できる呼出し元のアドレス
+    STATS_ALLOWED_ADDRS = ["127.0.0.1", "::1"]
+
+    # 外部API呼出しのタイムアウト(接続, 読込み)と1回の呼出しの期限(リトライ含む)(秒)
+    HTTP_POLICIES = {
+        "default": {"timeout": (3.05, 30), "deadline": 40},
+        "remote": {"timeout": (3.05, 50), "deadline": 55},  # 他社のコネクタ
+        "shipper_backend": {"timeout": (3.05, 40), "deadline": 45},
+        "carrier_backend": {"timeout": (3.05, 40), "deadline": 45},
+        "trust": {"timeout": (3.05, 30), "deadline": 40},
+    }
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # 連続で失敗したら呼出しを止める回数
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT = 30  # 止めてから呼出しを試行するまでの秒数
+    HTTP_GET_RETRIES = 2  # GETのリトライ回数
+    HTTP_RETRY_BACKOFF = 0.2  # リトライ間隔(秒、リトライ毎に倍にする)
+
+    # 相手コネクタ(X-ENDPOINT)との通信にHTTP/2を使うか（httpx[http2]が必要）
+    REMOTE_CONNECTOR_HTTP2 = False
+    HTTP2_MAX_CONNECTIONS = 10  # 全ての相手の合計の最大コネクション数(相手毎に通常は1本で多重化されるため相手の数以上にする)
+    HTTP2_KEEPALIVE_EXPIRY = 60  # 使われていないコネクションを閉じるまでの秒数
+
+    # 一覧検索(運行依頼・運行案件)の結果のキャッシュ
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_URL = "redis://redis:6379/1"  # セッションとはDBを分ける
+    RESPONSE_CACHE_TTL = 30  # バックエンドを呼ばずに返す秒数
+    RESPONSE_CACHE_STALE_TTL = 300  # TTL経過後に古い結果を返しつつ再取得する秒数
+    RESPONSE_CACHE_REFRESH_WORKERS = 4  # 再取得のスレッド数
+    RESPONSE_CACHE_SOCKET_TIMEOUT = 1  # Redisの接続・応答のタイムアウト(秒)
+
+    # 同じ検索の同時呼出しを1回にまとめる(single flight)
+    SINGLE_FLIGHT_REDIS_URL = None  # 設定するとプロセス間でもまとめる 例:"redis://redis:6379/2"
+    SINGLE_FLIGHT_LOCK_TIMEOUT = 60  # 他のプロセスの結果を待つ最大秒数
+    SINGLE_FLIGHT_RESULT_TTL = 5  # 他のプロセスに渡す結果の保持秒数
+    SINGLE_FLIGHT_POLL_INTERVAL = 0.05  # 他のプロセスの結果を確認する間隔(秒)
+
+    # 運行依頼(API-030)をmodel_3012_operationのテーブルに同期してローカルで検索する
+    # テーブルは flask operation-sync init で作成し、同期は flask operation-sync run で行う
+    OPERATION_SYNC_ENABLED = False
+    OPERATION_SYNC_INTERVAL = 30  # 差分同期の間隔(秒)
+    OPERATION_SYNC_FULL_INTERVAL = 3600  # 全件同期(削除の反映)の間隔(秒)
+    OPERATION_SYNC_MAX_LAG = 120  # ローカルで検索する同期遅れの上限(秒)。超えたらバックエンドに問い合わせる
+    OPERATION_SYNC_CURSOR_PARAM = "updated_since"  # 変更カーソルを渡すバックエンドのパラメータ
+    OPERATION_SYNC_CURSOR_OVERLAP = 60  # 取りこぼし防止に変更カーソルを戻す秒数
+
+    # advanced_conditions(検索条件のJSON文字列)をコンパイルしてコネクタで評価する
+    # ローカルのテーブルの検索と、キャッシュ済みの一覧の絞込みに使う
+    # 文法がバックエンドと同じことを確認するまでは無効にし、バックエンドに渡す
+    ADVANCED_CONDITIONS_LOCAL = False
+    ADVANCED_CONDITIONS_CACHE_SIZE = 256  # コンパイル結果を保持する件数(LRU)
+
+    # 一覧検索のページ指定(n)の上限
+    PAGINATION_MAX_NUM = 1000
+
+    # 事業者情報(COMPANY_INFOS)をDBのcid_mapping（コアと共有）から読み込む
+    COMPANY_REGISTRY_DB = True  # Falseの場合はcom/company_info.pyの初期値を使う
+    COMPANY_REGISTRY_TTL = 300  # 読み込んだ事業者情報を使う最大秒数
+    # 変更を全プロセスにすぐ反映するためのRedis(pub/sub)。Noneの場合はTTLまで反映されない
+    COMPANY_REGISTRY_REDIS_URL = "redis://redis:6379"
+
+    # B/Lファイル(EBL_DIR)の読み込み結果を保持する件数(LRU)。ファイルが変わったら読み直す
+    EBL_CACHE_SIZE = 1024
+
+    # 保存したB/Lを索引付きのeblテーブルにも反映し、事業者や作成日時で検索できるようにする
+    # テーブルは flask ebl-store init で作成し、既存のB/Lファイルは flask ebl-store import で反映する
+    EBL_DB_STORE = True
+
+    # B/Lの変更(bl/register, bl/approve, bl/transfer, bl/used)を追記専用の履歴(ジャーナル)に残す
+    EBL_JOURNAL_ENABLED = True
+    EBL_JOURNAL_DIR = None  # Noneの場合はEBL_DIR/journal（コアとコネクタで共有する）
+    EBL_JOURNAL_SEGMENT_SIZE = 64 * 1024 * 1024  # セグメントファイルの最大サイズ(バイト)
+    EBL_JOURNAL_FSYNC_DELAY = 0.002  # 同時の追記をまとめてfsyncするために待つ秒数
+    EBL_JOURNAL_COMPACT_SEGMENTS = 16  # セグメント数が超えたら圧縮する。Noneの場合は flask ebl-journal compact のみ
+    EBL_JOURNAL_RETENTION_DAYS = 365  # 使用済みのB/Lの履歴を圧縮で削除するまでの日数
+
 
 ConfigIns = Config()
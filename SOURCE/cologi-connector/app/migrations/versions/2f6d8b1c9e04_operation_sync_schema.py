@@ -0,0 +1,127 @@
+"""運行依頼の同期(operation-sync)で変更した明細・輸送サービスの列と索引、sync_cursorを追加
+
+Revision ID: 2f6d8b1c9e04
+Revises:
+Create Date: 2026-10-18 13:15:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "2f6d8b1c9e04"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+LINE_ITEM = "trsp_plan_line_item_3012_op"
+TRSP_SRVC = "trsp_srvc_3012_op"
+# (索引, 列)
+TRSP_SRVC_INDEXES = [
+    ("ix_trsp_srvc_3012_op_strt", ["service_strt_date", "service_strt_time"]),
+    ("ix_trsp_srvc_3012_op_service_no", ["service_no"]),
+]
+
+
+def existing_schema():
+    """作成済みのテーブルの列と索引 {テーブル: {列と索引の名前}}
+
+    未作成のテーブルは flask operation-sync init でモデルから作成する際に
+    列・索引も作成されるため対象外とする。
+    """
+    inspector = sa.inspect(op.get_bind())
+    return {
+        table: {column["name"] for column in inspector.get_columns(table)}
+        | {index["name"] for index in inspector.get_indexes(table)}
+        for table in inspector.get_table_names()
+    }
+
+
+def trsp_isr_foreign_keys():
+    # 列の型を変えるため外部キーを作り直す（名前の無いSQLiteの外部キーはbatchで引き継がれる）
+    inspector = sa.inspect(op.get_bind())
+    return [
+        foreign_key["name"]
+        for foreign_key in inspector.get_foreign_keys(LINE_ITEM)
+        if foreign_key["constrained_columns"] == ["trsp_isr_id"] and foreign_key["name"]
+    ]
+
+
+def alter_trsp_isr_id(existing_type, type_):
+    foreign_keys = trsp_isr_foreign_keys()
+    with op.batch_alter_table(LINE_ITEM) as batch_op:
+        for name in foreign_keys:
+            batch_op.drop_constraint(name, type_="foreignkey")
+        batch_op.alter_column(
+            "trsp_isr_id",
+            existing_type=existing_type,
+            type_=type_,
+            existing_nullable=False,
+        )
+        for name in foreign_keys:
+            batch_op.create_foreign_key(
+                name, "trsp_isr_3012_op", ["trsp_isr_id"], ["trsp_instruction_id"]
+            )
+
+
+def upgrade():
+    tables = existing_schema()
+    if LINE_ITEM in tables:
+        # 輸送指示IDは文字列のため参照先の列(String(20))に合わせる
+        alter_trsp_isr_id(sa.Integer(), sa.String(length=20))
+        with op.batch_alter_table(LINE_ITEM) as batch_op:
+            if "cid" not in tables[LINE_ITEM]:
+                batch_op.add_column(
+                    sa.Column("cid", sa.String(length=256), nullable=True)
+                )
+            if "ix_trsp_plan_line_item_3012_op_cid" not in tables[LINE_ITEM]:
+                batch_op.create_index("ix_trsp_plan_line_item_3012_op_cid", ["cid"])
+    if TRSP_SRVC in tables:
+        with op.batch_alter_table(TRSP_SRVC) as batch_op:
+            # 便の運行終了日が4桁になっていたため日付(8桁)が入るようにする
+            batch_op.alter_column(
+                "service_end_date",
+                existing_type=sa.String(length=4),
+                type_=sa.String(length=8),
+                existing_nullable=False,
+            )
+            for name, keys in TRSP_SRVC_INDEXES:
+                if name not in tables[TRSP_SRVC]:
+                    batch_op.create_index(name, keys)
+    if "sync_cursor" not in tables:
+        op.create_table(
+            "sync_cursor",
+            sa.Column("name", sa.String(length=64), nullable=False),
+            sa.Column("cursor", sa.String(length=64), nullable=True),
+            sa.Column("synced_at", sa.DateTime(), nullable=True),
+            sa.Column("full_synced_at", sa.DateTime(), nullable=True),
+            sa.Column("changed_at", sa.DateTime(), nullable=True),
+            sa.Column("item_count", sa.Integer(), nullable=False),
+            sa.Column("skipped_count", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("name"),
+        )
+
+
+def downgrade():
+    tables = existing_schema()
+    if "sync_cursor" in tables:
+        op.drop_table("sync_cursor")
+    if TRSP_SRVC in tables:
+        with op.batch_alter_table(TRSP_SRVC) as batch_op:
+            for name, _ in TRSP_SRVC_INDEXES:
+                if name in tables[TRSP_SRVC]:
+                    batch_op.drop_index(name)
+            batch_op.alter_column(
+                "service_end_date",
+                existing_type=sa.String(length=8),
+                type_=sa.String(length=4),
+                existing_nullable=False,
+            )
+    if LINE_ITEM in tables:
+        with op.batch_alter_table(LINE_ITEM) as batch_op:
+            if "ix_trsp_plan_line_item_3012_op_cid" in tables[LINE_ITEM]:
+                batch_op.drop_index("ix_trsp_plan_line_item_3012_op_cid")
+            if "cid" in tables[LINE_ITEM]:
+                batch_op.drop_column("cid")
+        alter_trsp_isr_id(sa.String(length=20), sa.Integer())
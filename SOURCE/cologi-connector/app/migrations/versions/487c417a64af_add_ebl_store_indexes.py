@@ -0,0 +1,82 @@
+"""B/Lの索引付きの保存先としてeblテーブルに列と索引を追加
+
+Revision ID: 487c417a64af
+Revises: 2f6d8b1c9e04
+Create Date: 2026-10-18 13:50:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "487c417a64af"
+down_revision = "2f6d8b1c9e04"
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    ("current_owner", sa.String(length=256), {"nullable": True}),
+    ("version", sa.Integer(), {"nullable": False, "server_default": "0"}),
+]
+# (索引, 列, 一意)
+INDEXES = [
+    ("ix_ebl_trsp_instruction_id", ["trsp_instruction_id"], True),
+    ("ix_ebl_bl_cid", ["bl_cid"], False),
+    ("ix_ebl_recipient_cid", ["recipient_cid"], False),
+    ("ix_ebl_current_owner", ["current_owner"], False),
+    ("ix_ebl_created_at", ["created_at"], False),
+]
+
+
+def existing_schema():
+    """作成済みのeblテーブルの列と索引の名前（未作成の場合はNone）
+
+    未作成の場合は flask ebl-store init でモデルから列・索引も作成されるため対象外とする。
+    """
+    inspector = sa.inspect(op.get_bind())
+    if "ebl" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("ebl")} | {
+        index["name"] for index in inspector.get_indexes("ebl")
+    }
+
+
+def upgrade():
+    names = existing_schema()
+    if names is None:
+        return
+    with op.batch_alter_table("ebl") as batch_op:
+        # 署名済みのB/Lは4000文字を超えるためTEXTとする
+        batch_op.alter_column(
+            "bl_data",
+            existing_type=sa.String(length=4000),
+            type_=sa.Text(),
+            existing_nullable=False,
+        )
+        for name, type_, options in COLUMNS:
+            if name not in names:
+                batch_op.add_column(sa.Column(name, type_, **options))
+        for name, keys, unique in INDEXES:
+            if name not in names:
+                batch_op.create_index(name, keys, unique=unique)
+    # 既存のB/Lファイルは flask ebl-store import で反映する
+
+
+def downgrade():
+    names = existing_schema()
+    if names is None:
+        return
+    with op.batch_alter_table("ebl") as batch_op:
+        for name, _, _ in INDEXES:
+            if name in names:
+                batch_op.drop_index(name)
+        for name, _, _ in COLUMNS:
+            if name in names:
+                batch_op.drop_column(name)
+        batch_op.alter_column(
+            "bl_data",
+            existing_type=sa.Text(),
+            type_=sa.String(length=4000),
+            existing_nullable=False,
+        )
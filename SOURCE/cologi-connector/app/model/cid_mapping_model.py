@@ -0,0 +1,121 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from database import db, ma
+
+
+class CidMapping(db.Model):
+    """事業者情報（com.company_infoの事業者レジストリが読み込む）"""
+
+    __tablename__ = "cid_mapping"
+    id = db.Column(
+        db.Integer, primary_key=True, doc="The unique id", autoincrement=True
+    )  # created to have a primary key
+    cid = db.Column(
+        db.String(256),
+        nullable=False,
+        unique=True,
+        doc="事業者ID",
+    )
+    endpoint = db.Column(
+        db.String(256),
+        doc="エンドポイント",
+    )
+    name = db.Column(db.String(256), doc="事業者名")
+    role = db.Column(
+        db.String(32), index=True, doc="役割(carrier/shipper/recipient)"
+    )
+    gs1 = db.Column(db.String(256), index=True, doc="GS1事業者コード")
+    wallet_adress = db.Column(db.String(256), index=True, doc="ウォレットアドレス")
+    tractor = db.Column(db.String(256), doc="トラクターのGIAI")
+    deadline = db.Column(db.Float, doc="全キャリアの一覧検索での期限(秒)")
+
+    def to_info(self) -> dict:
+        """COMPANY_INFOSの1社分の形式"""
+        info = {
+            "cid": self.cid,
+            "name": self.name or "",
+            "role": self.role or "",
+            "gs1": self.gs1 or "",
+            "endpoint": self.endpoint,
+            "wallet_adress": self.wallet_adress,
+            "tractor": self.tractor,
+        }
+        if self.deadline is not None:
+            info["deadline"] = self.deadline
+        return info
+
+
+class CidMappingSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        ordered = True
+        model = CidMapping
+        load_instance = True
+        exclude = ("id",)
+
+    id = ma.auto_field(
+        metadata={"description": CidMapping.__table__.c.id.doc, "max_length": 5}
+    )
+    cid = ma.auto_field(
+        metadata={
+            "description": CidMapping.__table__.c.cid.doc,
+            "max_length": 256,
+            "example": "490000001",
+        },
+    )
+    endpoint = ma.auto_field(
+        metadata={
+            "description": CidMapping.__table__.c.endpoint.doc,
+            "max_length": 256,
+            "example": "https://localhost:8020",
+        },
+    )
+    name = ma.auto_field(
+        metadata={
+            "description": CidMapping.__table__.c.name.doc,
+            "max_length": 256,
+            "example": "荷主1",
+        },
+    )
+    role = ma.auto_field(
+        metadata={
+            "description": CidMapping.__table__.c.role.doc,
+            "max_length": 32,
+            "example": "carrier",
+        },
+    )
+    gs1 = ma.auto_field(
+        metadata={"description": CidMapping.__table__.c.gs1.doc, "max_length": 256}
+    )
+    wallet_adress = ma.auto_field(
+        metadata={
+            "description": CidMapping.__table__.c.wallet_adress.doc,
+            "max_length": 256,
+        }
+    )
+    tractor = ma.auto_field(
+        metadata={
+            "description": CidMapping.__table__.c.tractor.doc,
+            "max_length": 256,
+        }
+    )
+    deadline = ma.auto_field(
+        metadata={"description": CidMapping.__table__.c.deadline.doc}
+    )
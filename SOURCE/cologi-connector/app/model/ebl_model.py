@@ -26,6 +26,7 @@ from sqlalchemy.ext.hybrid import hybrid_property
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from database import db, ma
+from com.ebl_repository import ebl_repository
 
 
 class EBL(db.Model):
@@ -34,17 +35,23 @@ class EBL(db.Model):
         db.Integer, primary_key=True, doc="The unique id", autoincrement=True
     )  # created to have a primary key
     bl_no = db.Column(db.String(100), nullable=False, doc="B/L管理番号")
-    bl_data = db.Column(
-        db.String(4000), nullable=False, doc="B/Lデータ eFBL JSON String"
-    )
+    # 署名済みのB/Lは4000文字を超えるためTEXTとする
+    bl_data = db.Column(db.Text, nullable=False, doc="B/Lデータ eFBL JSON String")
     bl_cid = db.Column(
         db.String(256),
+        index=True,
         doc="B/L発行者の事業者ID",
     )
     recipient_cid = db.Column(
         db.String(256),
+        index=True,
         doc="荷受け人の事業者ID",
     )
+    current_owner = db.Column(
+        db.String(256),
+        index=True,
+        doc="B/Lの現在の所有者の事業者ID",
+    )
     trailer_giai_list_str = db.Column(
         db.String(140),
         nullable=True,
@@ -52,12 +59,21 @@ class EBL(db.Model):
     )
     trsp_instruction_id = db.Column(
         db.String(20),
+        unique=True,
+        index=True,
         doc="trsp_instruction_id",
     )
+    version = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        doc="B/Lファイル(EBL_DIR)の版",
+    )
     created_at = db.Column(
         db.DateTime(timezone=True),
         nullable=False,
         server_default=func.now(),
+        index=True,
         doc="作成日時",
     )
     updated_at = db.Column(
@@ -106,7 +122,6 @@ class EBLSchema(ma.SQLAlchemyAutoSchema):
     bl_data = ma.auto_field(
         metadata={
             "description": EBL.__table__.c.bl_data.doc,
-            "max_length": 4000,
             "example": "{'exchanged_document':{...}}",
         },
     )
@@ -135,6 +150,13 @@ class EBLSchema(ma.SQLAlchemyAutoSchema):
             ],
         },
     )
+    current_owner = ma.auto_field(
+        metadata={
+            "description": EBL.__table__.c.current_owner.doc,
+            "max_length": 256,
+            "example": "993000001",
+        },
+    )
     trsp_instruction_id = ma.auto_field(
         metadata={
             "description": EBL.__table__.c.trsp_instruction_id.doc,
@@ -142,6 +164,12 @@ class EBLSchema(ma.SQLAlchemyAutoSchema):
             "example": "12345678901",
         },
     )
+    version = ma.auto_field(
+        metadata={
+            "description": EBL.__table__.c.version.doc,
+            "example": 2,
+        },
+    )
     created_at = ma.auto_field(
         metadata={
             "description": EBL.__table__.c.created_at.doc,
@@ -240,12 +268,13 @@ class EblJson:
             },
         }
 
-    def load_file(self, file_path) -> int:
+    def load(self, trsp_instruction_id) -> int:
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
+            data = ebl_repository.load(trsp_instruction_id)
+            if data is None:
+                return -1
             self.ebl = data["signed_bl"]
+            self.current_owner = data.get("current_owner", None)
             return int(data["bl_id"])
         except Exception:
             return -1
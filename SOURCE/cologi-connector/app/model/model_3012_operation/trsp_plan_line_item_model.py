@@ -42,9 +42,14 @@ class TrspPlanLineItem(db.Model):
     trsp_plan_line_item_id = db.Column(
         db.Integer, primary_key=True, doc="The primary key"
     )
+    cid = db.Column(
+        db.String(256),
+        index=True,
+        doc="事業者ID",
+    )
     # foreign key referencing other models
     trsp_isr_id = db.Column(
-        db.Integer,
+        db.String(20),
         db.ForeignKey("trsp_isr_3012_op.trsp_instruction_id"),
         nullable=False,
         doc="The unique id．",
@@ -159,6 +164,7 @@ class TrspPlanLineItemSchema(ma.SQLAlchemyAutoSchema):
         include_fk = True
         exclude = (
             "trsp_plan_line_item_id",
+            "cid",
             "trsp_isr_id",
             "trsp_srvc_id",
             "trsp_vehicle_trms_id",
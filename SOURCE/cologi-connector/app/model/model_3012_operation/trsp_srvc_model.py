@@ -22,6 +22,11 @@ from sqlalchemy.sql.sqltypes import CHAR
 
 class TrspSrvc(db.Model):
     __tablename__ = "trsp_srvc_3012_op"
+    # ローカルの運行依頼検索(API-030)で使う
+    __table_args__ = (
+        db.Index("ix_trsp_srvc_3012_op_strt", "service_strt_date", "service_strt_time"),
+        db.Index("ix_trsp_srvc_3012_op_service_no", "service_no"),
+    )
     trsp_srvc_id = db.Column(
         db.Integer, primary_key=True, nullable=False, doc="The Primary Key"
     )
@@ -35,7 +40,7 @@ class TrspSrvc(db.Model):
     )
     service_strt_date = db.Column(db.String(8), nullable=False, doc="便の運行日")
     service_strt_time = db.Column(db.String(4), nullable=False, doc="便の運行時刻")
-    service_end_date = db.Column(db.String(4), nullable=False, doc="便の運行終了日")
+    service_end_date = db.Column(db.String(8), nullable=False, doc="便の運行終了日")
     service_end_time = db.Column(db.String(4), nullable=False, doc="便の運行終了時刻")
     freight_rate = db.Column(db.String(10), nullable=False, doc="希望運賃")
     trsp_means_typ_cd = db.Column(
@@ -170,9 +175,9 @@ class TrspSrvcSchema(ma.SQLAlchemyAutoSchema):
     service_end_date = ma.auto_field(
         metadata={
             "description": TrspSrvc.__table__.c.service_end_date.doc,
-            "max_length": 4,
+            "max_length": 8,
         },
-        validate=[validate.Length(max=4)],
+        validate=[validate.Length(max=8)],
     )
     service_end_time = ma.auto_field(
         metadata={
@@ -0,0 +1,56 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+from datetime import datetime
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from database import db
+
+
+class SyncCursor(db.Model):
+    """バックエンドからローカルのテーブルへの同期の状態（同期対象毎に1行）"""
+
+    __tablename__ = "sync_cursor"
+    name = db.Column(db.String(64), primary_key=True, doc="同期対象")
+    cursor = db.Column(
+        db.String(64),
+        nullable=True,
+        doc="次回の差分同期でバックエンドに渡す変更カーソル",
+    )
+    synced_at = db.Column(
+        db.DateTime, nullable=True, doc="最後に完了した同期の開始時刻"
+    )
+    full_synced_at = db.Column(
+        db.DateTime, nullable=True, doc="最後に完了した全件同期の開始時刻"
+    )
+    changed_at = db.Column(
+        db.DateTime, nullable=True, doc="コネクタ経由で最後に更新された時刻"
+    )
+    item_count = db.Column(db.Integer, nullable=False, default=0, doc="同期済みの件数")
+    skipped_count = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0,
+        doc="前回の全件同期以降に取り込めなかった件数",
+    )
+
+    def lag_seconds(self, now=None):
+        """同期遅れ(秒)。未同期の場合はNone"""
+        if self.synced_at is None:
+            return None
+        return ((now or datetime.now()) - self.synced_at).total_seconds()
@@ -19,6 +19,7 @@ from flask_restx import Api
 import os
 import logging
 from app.config import ConfigIns
+from com.codec import output_json
 
 
 private_api_blueprint = Blueprint("private_api", __name__)
@@ -29,6 +30,7 @@ private_api = Api(
     description="Private APIs",
     doc="/swagger/",
 )
+private_api.representation("application/json")(output_json)
 
 from .shipper_operations_api import shipper_operations_api_ns
 from .reserve_api import reserve_api_ns
@@ -15,13 +15,17 @@
 # OTHER DEALINGS IN THE SOFTWARE.
 
 from flask_restx import Namespace, Resource
+import sys
 import os
 from flask import request
-import requests
 from urllib.parse import urljoin
 import json
 import logging
 
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from com.http_client import http_client
+from com.codec import decode_json
+
 logger = logging.getLogger("app.flask")
 logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
 
@@ -49,14 +53,13 @@ class EblApi(Resource):
         )
         try:
             logger.debug(f"CONNECT:{url}")
-            response = requests.get(
+            response = http_client.get(
                 url,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             if response.status_code != 200:
                 if response.status_code == 403:
@@ -39,6 +39,8 @@ from model.model_3012_operation.trsp_plan_model import TrspPlanSchema
 from model.model_3012_operation.msg_info_model import MsgInfoSchema
 from app.config import Config
 from com.company_info import COMPANY_INFOS
+from com.http_client import http_client
+from com.codec import decode_json
 
 
 operation_plans_api_ns = Namespace(
@@ -95,15 +97,14 @@ class OperationPlansApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.put(
+            response = http_client.put(
                 url,
                 json=data,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "operation_notify": data.get("shipper_operations_list", []),
@@ -154,7 +155,7 @@ class OperationPlansListApi(Resource):
             logger.debug(f"API-040 運行計画登録（車両割付）(Private)  CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -163,8 +164,7 @@ class OperationPlansListApi(Resource):
             )
             if response.status_code != 200:
                 raise ValueError(f"Backend Error response.status_code = {response.status_code}")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"API-040 運行計画登録（車両割付）(Private)  CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "result": True,
@@ -313,7 +313,7 @@ class OperationPlanNotifyApi(Resource):
             logger.debug(f"API-043 運行実施確認通知(Private) CONNECT:{url}")
             data = request.get_json()
             logger.debug(f"API-043 運行実施確認通知(Private) data={data}")
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -322,8 +322,7 @@ class OperationPlanNotifyApi(Resource):
             )
             if response.status_code != 200:
                 raise ValueError("Backend Error")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "operation_plan": data.get("operation_plan", []),
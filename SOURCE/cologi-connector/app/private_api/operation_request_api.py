@@ -31,11 +31,22 @@ from com.helper import (
     create_restx_model_usingSchema,
     create_response_model,
     create_query_parser,
+    page_fields,
 )
 from model.operation_request_model import OperationRequestSchema
 from model.model_3012_operation.trsp_plan_line_item_model import TrspPlanLineItemSchema
 from app.config import Config
 from com.company_info import COMPANY_INFOS
+from com.http_client import http_client
+from com.codec import decode_json
+from com.single_flight import flight_key, get_single_flight
+from com.ndjson import stream_list, wants_ndjson
+from com.etag import (
+    conditional_headers,
+    etag_headers,
+    not_modified,
+    request_if_none_match,
+)
 
 operation_request_api_ns = Namespace(
     "/private/api/operation_request", description="キャリア向け運行依頼"
@@ -52,6 +63,13 @@ parser.add_argument(
 parser.add_argument(
     "n", type=int, help="取得数", default=100, required=False, location="args"
 )
+parser.add_argument(
+    "cursor",
+    type=str,
+    help="次のページのカーソル(応答のnext_cursor)",
+    required=False,
+    location="args",
+)
 id_parser = operation_request_api_ns.parser()
 id_parser.add_argument(
     "cid", type=str, help="事業者ID", required=False, location="args"
@@ -99,22 +117,47 @@ class OperationRequestListApi(Resource):
         )
         endpoint = request.headers.get("X-ENDPOINT")
         url = urljoin(endpoint, "operation_request")
+        if wants_ndjson():
+            # 相手コネクタの応答を行毎に中継する
+            return stream_list(
+                url,
+                query_params,
+                {},
+                "operation_request_list",
+                verify=False,
+                proxies={"no_proxy": "localhost"},
+            )
+        headers = {}
         try:
             logger.debug(
                 f"API-030 キャリア向け運行依頼検索・取得(Private) CONNECT:{url}"
             )
-            response = requests.get(
-                url,
-                params=query_params,
-                verify=False,
-                proxies={"no_proxy": "localhost"},
+            # 同じ検索が同時に来た場合は相手コネクタの呼出しを1回にまとめる
+            response = get_single_flight("operation_request").do(
+                flight_key(
+                    "operation_request",
+                    query_params,
+                    endpoint,
+                    request_if_none_match(),
+                ),
+                lambda: http_client.get(
+                    url,
+                    params=query_params,
+                    verify=False,
+                    proxies={"no_proxy": "localhost"},
+                    headers=conditional_headers(),
+                ),
             )
+            if response.status_code == 304:
+                return not_modified(response.headers.get("ETag"))
             if response.status_code != 200:
                 raise ValueError("Backend Error")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            headers = etag_headers(response)
+            data = decode_json(response)
+            operation_request_list = data.get("operation_request_list", [])
             ret = {
-                "operation_request_list": data.get("operation_request_list", []),
+                "operation_request_list": operation_request_list,
+                **page_fields(data, operation_request_list),
                 "result": True,
                 "error_msg": "",
             }
@@ -138,7 +181,7 @@ class OperationRequestListApi(Resource):
         logger.debug(
             f"API-030 キャリア向け運行依頼検索・取得(Private) End status= {status}"
         )
-        return ret, status
+        return ret, status, headers
 
 
 @operation_request_api_ns.route("/propose")
@@ -232,7 +275,7 @@ class OperationRequestProposeListApi(Resource):
             logger.debug(f"API-031 キャリア向け運行申し込み登録(Private) CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -241,8 +284,7 @@ class OperationRequestProposeListApi(Resource):
             )
             if response.status_code != 200:
                 raise ValueError("Backend Error")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "operation_request": data.get("operation_request", []),
@@ -365,15 +407,14 @@ class OperationRequestProposeApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.put(
+            response = http_client.put(
                 url,
                 json=data,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "operation_request": data.get("operation_request", []),
@@ -466,7 +507,7 @@ class OperationRequestReplyApi(Resource):
             )
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -474,8 +515,7 @@ class OperationRequestReplyApi(Resource):
                 proxies={"no_proxy": "localhost"},
             )
             try:
-                response.encoding = response.apparent_encoding
-                data = response.json()
+                data = decode_json(response)
             except Exception:
                 data = {"error_msg": "Backend Error"}
             if response.status_code != 200:
@@ -582,7 +622,7 @@ class OperationRequestHandoverInfoApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -591,8 +631,7 @@ class OperationRequestHandoverInfoApi(Resource):
             )
             if response.status_code != 200:
                 raise ValueError("Backend Error")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "operation_request": data.get("operation_request", []),
@@ -685,15 +724,14 @@ class OperationRequestNotifyApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "operation_request": data.get("operation_request", []),
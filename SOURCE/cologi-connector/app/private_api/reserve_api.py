@@ -30,6 +30,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from com.helper import create_restx_model_usingSchema, create_response_model
 from model.reserve_model import ReserveSchema
 from app.config import Config
+from com.http_client import http_client
+from com.codec import decode_json
 
 
 reserve_api_ns = Namespace(
@@ -127,15 +129,14 @@ class ReserveListApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "reserve": data.get("reserve", []),
@@ -215,15 +216,14 @@ class ReserveNotifyApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "reserve": data.get("reserve", []),
@@ -437,15 +437,14 @@ class ReserveRequestNotifyApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
             ret = {
                 "reserve": data.get("reserve", []),
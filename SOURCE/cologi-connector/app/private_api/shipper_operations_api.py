@@ -31,11 +31,16 @@ from com.helper import (
     create_restx_model_usingSchema,
     create_response_model,
     create_query_parser,
+    page_fields,
 )
 from model.model_5001.trsp_ability_line_item_model import TrspAbilityLineItemSchema
 from model.model_5001.msg_info_model import MsgInfoSchema
 from app.config import Config
 from com.company_info import COMPANY_INFOS
+from com.http_client import http_client
+from com.codec import decode_json
+from com.etag import conditional_headers, etag_headers, not_modified
+from com.ndjson import stream_list, wants_ndjson
 
 shipper_operations_api_ns = Namespace(
     "/private/api/shipper_operations", description="ダイヤ（荷主向け運行案内）"
@@ -52,6 +57,13 @@ parser.add_argument(
 parser.add_argument(
     "n", type=int, help="取得数", default=1, required=False, location="args"
 )
+parser.add_argument(
+    "cursor",
+    type=str,
+    help="次のページのカーソル(応答のnext_cursor)",
+    required=False,
+    location="args",
+)
 query_parser = create_query_parser(shipper_operations_api_ns)
 
 
@@ -95,19 +107,35 @@ class ShipperOperationsApi(Resource):
         logger.debug(query_params)
         endpoint = request.headers.get("X-ENDPOINT")
         url = urljoin(endpoint, "shipper_operations")
+        if wants_ndjson():
+            # 相手コネクタの応答を行毎に中継する
+            return stream_list(
+                url,
+                query_params,
+                {},
+                "shipper_operations_list",
+                verify=False,
+                proxies={"no_proxy": "localhost"},
+            )
+        headers = {}
         try:
             logger.debug(f"CONNECT:{url}")
-            response = requests.get(
+            response = http_client.get(
                 url,
                 params=query_params,
                 verify=False,
                 proxies={"no_proxy": "localhost"},
+                headers=conditional_headers(),
             )
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            if response.status_code == 304:
+                return not_modified(response.headers.get("ETag"))
+            headers = etag_headers(response)
+            data = decode_json(response)
             logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
+            shipper_operations_list = data.get("shipper_operations_list", [])
             ret = {
-                "shipper_operations_list": data.get("shipper_operations_list", []),
+                "shipper_operations_list": shipper_operations_list,
+                **page_fields(data, shipper_operations_list),
                 "result": True,
                 "error_msg": "",
             }
@@ -118,4 +146,4 @@ class ShipperOperationsApi(Resource):
                 "result": False,
                 "error_msg": "error",
             }
-        return ret, 200
+        return ret, 200, headers
@@ -37,6 +37,8 @@ from model.model_3012_transport.trsp_plan_line_item_model import TrspPlanLineIte
 from model.model_3012_transport.msg_info_model import MsgInfoSchema
 from app.config import Config
 from com.company_info import COMPANY_INFOS
+from com.http_client import http_client
+from com.codec import decode_json
 
 
 transport_plans_api_ns = Namespace(
@@ -172,7 +174,7 @@ class TransportPlanNotifyApi(Resource):
             logger.debug(f"CONNECT:{url}")
             data = request.get_json()
             logger.debug(data)
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -180,8 +182,7 @@ class TransportPlanNotifyApi(Resource):
                 proxies={"no_proxy": "localhost"},
             )
             if response.status_code != 200:
-                response.encoding = response.apparent_encoding
-                data = response.json()
+                data = decode_json(response)
                 ret = {
                     "transport_plans": {},
                     "result": False,
@@ -189,8 +190,7 @@ class TransportPlanNotifyApi(Resource):
                 }
                 status = response.status_code
             else:
-                response.encoding = response.apparent_encoding
-                data = response.json()
+                data = decode_json(response)
                 logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
                 ret = {
                     "transport_plans": data.get("transport_plans", []),
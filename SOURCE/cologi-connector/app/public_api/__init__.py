@@ -19,6 +19,7 @@ from flask_restx import Api
 import os
 import logging
 from app.config import ConfigIns
+from com.codec import output_json
 
 
 public_api_blueprint = Blueprint("public_api", __name__)
@@ -29,6 +30,7 @@ public_api = Api(
     description="Public APIs",
     doc="/swagger/",
 )
+public_api.representation("application/json")(output_json)
 
 from .operation_plans_api import operation_plans_api_ns
 from .operation_request_api import operation_request_api_ns
@@ -18,7 +18,6 @@ from flask_restx import Namespace, Resource
 import sys
 import os
 from flask import request
-import requests
 from urllib.parse import urljoin
 import logging
 
@@ -31,6 +30,9 @@ from app.config import Config
 from com.company_info import (
     get_address_from_cid,
 )
+from com.http_client import http_client
+from com.codec import decode_json
+from com import ebl_journal
 
 ebl_api_ns = Namespace("/public/api/ebl", description="eBL関係API")
 
@@ -51,11 +53,8 @@ class EblApi(Resource):
             logger.debug(f"API-080 B/L取得API query_params = {query_params}")
             recipient_cid = query_params.get("recipient_cid", None)
             shipper_cid = query_params.get("shipper_cid", None)
-            file_path = os.path.join(
-                os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-            )
             ebl = EblJson()
-            bl_id = int(ebl.load_file(file_path))
+            bl_id = int(ebl.load(trsp_instruction_id))
             if bl_id == -1:
                 raise LookupError(
                     f"trsp_instruction_id:{trsp_instruction_id}のB/Lは発行されてません"
@@ -80,7 +79,7 @@ class EblApi(Resource):
             }
             logger.debug(f"API-080 B/L取得API B/L 移転申請： {url}")
             logger.debug(f"        ： {data}")
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 verify=False,
@@ -89,10 +88,17 @@ class EblApi(Resource):
             if response.status_code != 200:
                 logger.debug(response)
                 raise ValueError("トラスト基盤 BL移転申請 ERROR")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             if data["result"] is False:
                 raise ValueError(f"トラスト基盤 BL移転申請 result {data}")
+            # 荷主の受領(bl/approve)まではB/Lファイルは変わらないため履歴にのみ残す
+            ebl_journal.record(
+                trsp_instruction_id,
+                "bl/transfer",
+                cid=ebl_carrier_cid,
+                to_cid=shipper_cid,
+                bl_id=bl_id,
+            )
             ret = {
                 "result": True,
                 "carrier_cid": ebl_carrier_cid,
@@ -38,6 +38,11 @@ from model.model_3012_operation.trsp_plan_line_item_model import TrspPlanLineIte
 from model.model_3012_operation.trsp_plan_model import TrspPlanSchema
 from model.model_3012_operation.msg_info_model import MsgInfoSchema
 from com.backend_api import BackendApi
+from com.response_cache import (
+    CARRIER_OPERATION_PLANS,
+    SHIPPER_OPERATION_PLANS,
+    invalidate_operation,
+)
 
 operation_plans_api_ns = Namespace(
     "/public/api/operation_plans", description="運行計画"
@@ -238,6 +243,11 @@ class OperationPlanNotifyApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS, SHIPPER_OPERATION_PLANS],
+                operation_id,
+                (data, response),
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_plans": response,
@@ -307,6 +317,11 @@ class OperationPlanNotifyApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS, SHIPPER_OPERATION_PLANS],
+                operation_id,
+                (data, response),
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_plans": response,
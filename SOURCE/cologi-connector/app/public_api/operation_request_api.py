@@ -35,6 +35,15 @@ from com.helper import (
 from model.operation_request_model import OperationRequestSchema
 from model.model_3012_operation.trsp_plan_line_item_model import TrspPlanLineItemSchema
 from com.backend_api import BackendApi
+from com.etag import make_etag, etag_matches, not_modified, request_if_none_match
+from com.response_cache import (
+    CARRIER_OPERATION_PLANS,
+    cached_call_api,
+    invalidate_operation,
+)
+from com.operation_sync import pop_refresh, search_operation_plans
+from com.pagination import InvalidPage, Page
+from com.ndjson import iter_ndjson, ndjson_response, split_groups, wants_ndjson
 
 operation_request_api_ns = Namespace(
     "/public/api/operation_request", description="キャリア向け運行依頼"
@@ -55,6 +64,13 @@ parser.add_argument(
 parser.add_argument(
     "n", type=int, help="取得数", default=100, required=False, location="args"
 )
+parser.add_argument(
+    "cursor",
+    type=str,
+    help="次のページのカーソル(応答のnext_cursor)",
+    required=False,
+    location="args",
+)
 id_parser = operation_request_api_ns.parser()
 id_parser.add_argument(
     "source_cid", type=str, help="事業者ID", required=False, location="args"
@@ -89,7 +105,11 @@ class OperationRequestListApi(Resource):
         description=(
             "API-030 キャリア向け運行依頼検索・取得<br/>"
             "- サプライ・サイドからのみ利用可<br/>"
-            "- cid（事業者）を指定しない場合には全事業者の検索を実施する"
+            "- cid（事業者）を指定しない場合には全事業者の検索を実施する<br/>"
+            "- refresh=true の場合はバックエンドと同期してから検索する<br/>"
+            "- n（取得数）またはcursorを指定した場合は明細をページ単位で返す<br/>"
+            "- Accept: application/x-ndjson の場合は明細を1行ずつ返し、"
+            "最後の行にページ情報を返す"
         )
     )
     @operation_request_api_ns.response(200, "Success", get_list_response_model)
@@ -98,21 +118,48 @@ class OperationRequestListApi(Resource):
     def get(self):
         query_params = request.args.to_dict()
         logger.debug(f"OperationRequestListApi get :{query_params}")
+        refresh = pop_refresh(query_params)
+        try:
+            page = Page.pop(query_params)
+        except InvalidPage as e:
+            return {
+                "operation_request_list": [],
+                "result": False,
+                "error_msg": str(e),
+            }, 400
         api = "carrier_operation_plans"
-        logger.debug(f"CONNECT BACKEND:{api}")
+        headers = {}
+        stream = wants_ndjson()
         try:
-            backend_api = BackendApi()
-            response = backend_api.call_api(
-                api,
-                method="GET",
-                data=None,
-                param=query_params,
-            )
+            # 同期済みのローカルのテーブルで検索できない場合はバックエンドに問い合わせる
+            response = search_operation_plans(query_params, refresh, page, stream)
+            if response is None:
+                logger.debug(f"CONNECT BACKEND:{api}")
+                backend_api = BackendApi()
+                response = cached_call_api(backend_api, api, query_params)
+                if response is not False:
+                    response = page.slice_groups(response, "trsp_plan_line_item")
+                    if stream:
+                        response = split_groups(response, "trsp_plan_line_item")
             if response is False:
                 raise ValueError("Backend error")
+            if stream:
+                # 明細を読み込みながら1件ずつ返す（ページ情報は最後の行）
+                return ndjson_response(
+                    iter_ndjson(
+                        response,
+                        lambda: {**page.fields(), "result": True, "error_msg": ""},
+                    )
+                )
+            # 呼出し元の前回の結果から変わっていなければ本文を返さない
+            etag = make_etag([response, page.fields()])
+            if etag_matches(request_if_none_match(), etag):
+                return not_modified(etag)
+            headers["ETag"] = etag
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_request_list": response,
+                **page.fields(),
                 "result": True,
                 "error_msg": "",
             }
@@ -123,7 +170,7 @@ class OperationRequestListApi(Resource):
                 "result": False,
                 "error_msg": "error",
             }
-        return ret, 200
+        return ret, 200, headers
 
 
 @operation_request_api_ns.route("/propose")
@@ -181,6 +228,9 @@ class OperationRequestProposeListApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS], None, (data, response), created=True
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_request": response,
@@ -251,6 +301,9 @@ class OperationRequestProposeApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS], operation_id, (data, response)
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_request": response,
@@ -339,6 +392,9 @@ class OperationRequestReplyApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS], operation_id, (data, response)
+            )
             ret = {
                 "operation_request_reply": response,
                 "result": True,
@@ -444,6 +500,9 @@ class OperationRequestHandoverInfoApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS], operation_id, (data, response)
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_request_reply": response,
@@ -540,6 +599,9 @@ class OperationRequestNotifyApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [CARRIER_OPERATION_PLANS], operation_id, (data, response)
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "operation_request_reply": response,
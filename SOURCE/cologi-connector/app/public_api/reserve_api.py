@@ -28,6 +28,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from com.helper import create_restx_model_usingSchema, create_response_model
 from model.reserve_model import ReserveSchema
 from com.backend_api import BackendApi
+from com.response_cache import SHIPPER_OPERATION_PLANS, invalidate_operation
 
 reserve_api_ns = Namespace(
     "/public/api/reserve", description="予約（荷主向け運行申し込み）"
@@ -131,6 +132,9 @@ class ReserveListApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [SHIPPER_OPERATION_PLANS], None, (data, response), created=True
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "reserve": response,
@@ -216,6 +220,9 @@ class ReserveNotifyApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [SHIPPER_OPERATION_PLANS], operation_id, (data, response)
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "reserve": response,
@@ -317,6 +324,9 @@ class ReserveUpdateNotifyApi(Resource):
             )
             if response is False:
                 raise ValueError("Backend error")
+            invalidate_operation(
+                [SHIPPER_OPERATION_PLANS], operation_id, (data, response)
+            )
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
                 "reserve": response,
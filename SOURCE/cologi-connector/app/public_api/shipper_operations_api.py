@@ -32,6 +32,10 @@ from com.helper import (
 from model.model_5001.trsp_ability_line_item_model import TrspAbilityLineItemSchema
 from model.model_5001.msg_info_model import MsgInfoSchema
 from com.backend_api import BackendApi
+from com.etag import make_etag, etag_matches, not_modified, request_if_none_match
+from com.response_cache import cached_call_api
+from com.pagination import InvalidPage, Page
+from com.ndjson import iter_ndjson, ndjson_response, wants_ndjson
 
 shipper_operations_api_ns = Namespace(
     "/public/api/shipper_operations", description="ダイヤ（荷主向け運行案内）"
@@ -48,6 +52,13 @@ parser.add_argument(
 parser.add_argument(
     "n", type=int, help="取得数", default=1, required=False, location="args"
 )
+parser.add_argument(
+    "cursor",
+    type=str,
+    help="次のページのカーソル(応答のnext_cursor)",
+    required=False,
+    location="args",
+)
 query_parser = create_query_parser(shipper_operations_api_ns)
 
 
@@ -81,7 +92,10 @@ class ShipperOperationsApi(Resource):
         description=(
             "API-020 荷主向け運行案件検索・取得<br/>"
             "- デマンド・サイドからのみ利用可<br/>"
-            "- cid（事業者）を指定しない場合には全事業者の検索を実施する"
+            "- cid（事業者）を指定しない場合には全事業者の検索を実施する<br/>"
+            "- n（取得数）またはcursorを指定した場合はページ単位で返す<br/>"
+            "- Accept: application/x-ndjson の場合は1件ずつ1行で返し、"
+            "最後の行にページ情報を返す"
         )
     )
     @shipper_operations_api_ns.response(400, "HTTP400エラー")
@@ -89,21 +103,39 @@ class ShipperOperationsApi(Resource):
     def get(self):
         query_params = request.args.to_dict()
         logger.debug(query_params)
+        try:
+            page = Page.pop(query_params)
+        except InvalidPage as e:
+            return {
+                "shipper_operations_list": [],
+                "result": False,
+                "error_msg": str(e),
+            }, 400
         api = "shipper_operation_plans"
         logger.debug(f"CONNECT BACKEND:{api}")
+        headers = {}
         try:
             backend_api = BackendApi()
-            response = backend_api.call_api(
-                api,
-                method="GET",
-                data=None,
-                param=query_params,
-            )
+            response = cached_call_api(backend_api, api, query_params)
             if response is False:
                 raise ValueError("Backend error")
+            shipper_operations_list = page.slice(response["trsp_ability_line_item"])
+            if wants_ndjson():
+                return ndjson_response(
+                    iter_ndjson(
+                        shipper_operations_list,
+                        lambda: {**page.fields(), "result": True, "error_msg": ""},
+                    )
+                )
+            # 呼出し元の前回の結果から変わっていなければ本文を返さない
+            etag = make_etag([shipper_operations_list, page.fields()])
+            if etag_matches(request_if_none_match(), etag):
+                return not_modified(etag)
+            headers["ETag"] = etag
             logger.debug(f"BACKEND RESPONSE: {response}")
             ret = {
-                "shipper_operations_list": response["trsp_ability_line_item"],
+                "shipper_operations_list": shipper_operations_list,
+                **page.fields(),
                 "result": True,
                 "error_msg": "",
             }
@@ -114,4 +146,4 @@ class ShipperOperationsApi(Resource):
                 "result": False,
                 "error_msg": "error",
             }
-        return ret, 200
+        return ret, 200, headers
@@ -17,7 +17,6 @@
 from flask_restx import Namespace, Resource, fields
 import sys
 import os
-import json
 from flask import request
 import requests
 from urllib.parse import urljoin
@@ -37,6 +36,7 @@ from model.model_3012_transport.trsp_plan_line_item_model import TrspPlanLineIte
 from model.model_3012_transport.msg_info_model import MsgInfoSchema
 from com.backend_api import BackendApi
 from model.ebl_model import EblJson
+from com.ebl_repository import ebl_repository
 from app.config import Config
 from com.company_info import (
     get_address_from_cid,
@@ -45,6 +45,8 @@ from com.company_info import (
     get_shipper_tractor,
 )
 from com.mobility_hub import get_name_by_gln
+from com.http_client import http_client
+from com.codec import decode_json
 
 transport_plans_api_ns = Namespace(
     "/public/api/transport_plans", description="輸送計画"
@@ -231,12 +233,8 @@ class TransportPlanNotifyApi(Resource):
         carrier_cid,
         shipper_cid,
     ):
-        file_path = os.path.join(
-            os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-        )
-        # もし同じファイルがあったら ファイルを削除
-        if os.path.isfile(file_path):
-            os.remove(file_path)
+        # もし同じファイルがあったら 新しいB/Lで置き換える（版は引き継ぐ）
+        file_path = ebl_repository.path(trsp_instruction_id)
         ebl = EblJson()
         recipient_cid = None
         if "cnee_prty" in data:
@@ -275,7 +273,7 @@ class TransportPlanNotifyApi(Resource):
         }
         logger.debug(f"B/L 登録： {url}")
         logger.debug(f"        ： {data}")
-        response = requests.post(
+        response = http_client.post(
             url,
             json=data,
             verify=False,
@@ -284,8 +282,7 @@ class TransportPlanNotifyApi(Resource):
         if response.status_code != 200:
             logger.debug(response)
             raise ValueError("トラスト基盤 BL登録 ERROR")
-        response.encoding = response.apparent_encoding
-        bl_reg = response.json()
+        bl_reg = decode_json(response)
         bl_id = int(bl_reg.get("bl_id"))
         signed_bl = bl_reg.get("signed_bl")
         logger.debug(f"署名済みB/L： {signed_bl}")
@@ -295,7 +292,8 @@ class TransportPlanNotifyApi(Resource):
             "bl_id": bl_id,
             "current_owner": carrier_cid,
         }
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(bl_file, f, indent=4, ensure_ascii=False)
+        ebl_repository.save(
+            trsp_instruction_id, bl_file, event="bl/register", cid=carrier_cid
+        )
         logger.debug(f"save EBL {file_path}")
         return True
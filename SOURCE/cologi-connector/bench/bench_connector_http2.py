@@ -0,0 +1,240 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""コネクタ間通信のHTTP/1.1(requests)とHTTP/2(httpx)の比較
+
+相手コネクタのPublic APIの代替サーバ(HTTP/1.1とHTTP/2、TLS)を起動し、
+--threads本のスレッド(uwsgiのスレッドを模擬)から--calls件を呼び出して
+スループットとコネクション数を計測する。
+
+    python bench_connector_http2.py --calls 1000 --threads 50 --latency 20
+
+--endpointを指定すると代替サーバの代わりに起動済みのコネクタを呼び出す
+（docker-composeでdemand/supplyの2つのコネクタを起動して計測する場合）。
+
+    python bench_connector_http2.py --endpoint https://localhost:8443/public/api/
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+import urllib3
+import h2.config
+import h2.connection
+import h2.events
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+sys.path.append(os.path.join(BENCH_DIR, ".."))
+sys.path.append(APP_DIR)
+
+if importlib.util.find_spec("config") is None:
+    # ローカル実行時は配置前の設定ファイルを読み込む
+    spec = importlib.util.spec_from_file_location(
+        "config", os.path.join(APP_DIR, "supply.config.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules["config"] = module
+    sys.modules["app.config"] = module
+
+from com.http_client import HttpClient
+from com.http2_transport import Http2Transport
+
+LATENCY = 0.02
+BODY = json.dumps(
+    {"result": True, "operation_request_list": [{"id": i} for i in range(20)]}
+).encode("utf-8")
+
+
+class Http1Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length > 0:
+            self.rfile.read(length)
+        time.sleep(LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    do_GET = _send
+    do_POST = _send
+
+
+class Http1Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+
+class Http2Protocol(asyncio.Protocol):
+    """1コネクションで複数のストリームを並行に処理するHTTP/2サーバ"""
+
+    def __init__(self):
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False)
+        )
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.DataReceived):
+                self.conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, h2.events.StreamEnded):
+                asyncio.get_running_loop().call_later(
+                    LATENCY, self.respond, event.stream_id
+                )
+        self.transport.write(self.conn.data_to_send())
+
+    def respond(self, stream_id):
+        if self.transport.is_closing():
+            return
+        self.conn.send_headers(
+            stream_id,
+            [
+                (":status", "200"),
+                ("content-type", "application/json"),
+                ("content-length", str(len(BODY))),
+            ],
+        )
+        self.conn.send_data(stream_id, BODY, end_stream=True)
+        self.transport.write(self.conn.data_to_send())
+
+
+def create_cert(directory):
+    cert = os.path.join(directory, "server.crt")
+    key = os.path.join(directory, "server.key")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def start_http1(cert, key):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = Http1Server(("127.0.0.1", 0), Http1Handler)
+    # TLSのハンドシェイクは各スレッドで行う
+    server.socket = context.wrap_socket(
+        server.socket, server_side=True, do_handshake_on_connect=False
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"https://127.0.0.1:{server.server_address[1]}/public/api/"
+
+
+def start_http2(cert, key):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    context.set_alpn_protocols(["h2"])
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(
+        loop.create_server(Http2Protocol, "127.0.0.1", 0, ssl=context)
+    )
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"https://127.0.0.1:{server.sockets[0].getsockname()[1]}/public/api/"
+
+
+def measure(name, client, url, args):
+    def call(_):
+        try:
+            response = client.get(
+                url, params={"cid": "1"}, headers={"X-ENDPOINT": url}, verify=False
+            )
+        except Exception:
+            return False
+        return response.status_code == 200
+
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        # 接続確立を計測から除く
+        list(executor.map(call, range(args.threads)))
+        start = time.perf_counter()
+        results = list(executor.map(call, range(args.calls)))
+        elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} {elapsed * 1000:10.1f} ms  "
+        f"{args.calls / elapsed:8.1f} 件/秒  失敗 {results.count(False)}"
+    )
+
+
+def main():
+    global LATENCY
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--calls", type=int, default=1000, help="呼出し件数")
+    arg_parser.add_argument("--threads", type=int, default=50, help="スレッド数")
+    arg_parser.add_argument("--latency", type=float, default=20, help="応答遅延(ms)")
+    arg_parser.add_argument("--endpoint", help="起動済みのコネクタのPublic API")
+    arg_parser.add_argument("--path", default="operation_request", help="呼び出すAPI")
+    args = arg_parser.parse_args()
+
+    LATENCY = args.latency / 1000
+    # 代替サーバは自己署名の証明書のため検証しない
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    if args.endpoint:
+        http1_endpoint = http2_endpoint = args.endpoint
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            cert, key = create_cert(directory)
+            http1_endpoint = start_http1(cert, key)
+            http2_endpoint = start_http2(cert, key)
+    print(
+        f"呼出し {args.calls}件 / スレッド {args.threads} / "
+        f"{args.endpoint or f'応答遅延 {args.latency}ms'}"
+    )
+
+    http1_client = HttpClient()
+    measure("HTTP/1.1", http1_client, urljoin(http1_endpoint, args.path), args)
+    print(f"HTTP/1.1 新規コネクション {http1_client.get_stats()['new_connections']}")
+
+    transport = Http2Transport()
+    http2_client = HttpClient()
+    http2_client.mount_http2(transport.send)
+    measure("HTTP/2", http2_client, urljoin(http2_endpoint, args.path), args)
+    print(f"HTTP/2 {transport.get_stats()}")
+    transport.close()
+
+
+if __name__ == "__main__":
+    main()
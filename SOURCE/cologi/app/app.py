@@ -35,10 +35,13 @@ from flask.logging import default_handler
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from app.config import ConfigIns
-from app.database import init_db
+from database import init_db
+from com.codec import init_json
 
 app = Flask(__name__)
 CORS(app)
+# JSONのシリアライズにorjsonを使う
+init_json(app)
 # セッション管理
 app.secret_key = "COLOGI_SECRET_KEY_XXXXXXX"
 app.config["SESSION_TYPE"] = "redis"
@@ -82,6 +85,22 @@ logger.addHandler(log_handler)
 
 init_db(app)
 
+# 事業者情報（DBから読み込み、変更の通知を受け取る）
+from com.company_info import company_registry_cli, registry
+
+registry.init_app(app)
+app.cli.add_command(company_registry_cli)
+
+# B/Lの索引付きのテーブル(flask ebl-store init|import)
+from com.ebl_store import ebl_store_cli
+
+app.cli.add_command(ebl_store_cli)
+
+# B/Lの変更の履歴(flask ebl-journal compact|snapshot|history)
+from com.ebl_journal import ebl_journal_cli
+
+app.cli.add_command(ebl_journal_cli)
+
 # 各API登録
 from app.web_api import web_api_blueprint
 from app.ebl_api import ebl_api_blueprint
@@ -110,10 +129,48 @@ def shutdown_session(exception=None):
     pass
 
 
+def _is_internal_caller():
+    # nginxを経由した場合も呼出し元のアドレスになる
+    return request.remote_addr in ConfigIns.STATS_ALLOWED_ADDRS
+
+
 @app.route("/healthcheck")
 def healthcheck():
     return "healthcheck OK"
 
 
+@app.route("/stats")
+def stats():
+    # 内部の状態を返すため、同一ホストからの呼出しに限る
+    if not _is_internal_caller():
+        abort(403)
+    # 外部API呼出しのコネクション再利用状況等
+    from com.http_client import http_client
+    from com import resilience
+    from com import single_flight
+    from com import passthrough
+    from com import scatter_gather
+    from com.company_info import registry
+    from com import ebl_repository
+    from com import ebl_store
+    from com import ebl_journal
+    from com import ebl_trust
+
+    return {
+        "http_client": http_client.get_stats(),
+        "circuit_breakers": resilience.get_stats(),
+        "single_flight": single_flight.get_stats(),
+        "passthrough": passthrough.get_stats(),
+        "scatter_gather": scatter_gather.get_stats(),
+        "company_registry": registry.get_stats(),
+        # B/Lファイルの読み込み結果のキャッシュ
+        "ebl_repository": ebl_repository.get_stats(),
+        "ebl_store": ebl_store.get_stats(),
+        "ebl_journal": ebl_journal.get_stats(),
+        # B/Lゲートチェックの検証結果のキャッシュ
+        "ebl_trust": ebl_trust.get_stats(),
+    }
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=80)
@@ -19,6 +19,7 @@ from flask_restx import Api
 import os
 import logging
 from app.config import ConfigIns
+from com.codec import output_json
 
 
 cb_api_blueprint = Blueprint("cb_api", __name__)
@@ -30,6 +31,7 @@ cb_api = Api(
     description="CB API for vanning/devanning",
     doc="/swagger/",
 )
+cb_api.representation("application/json")(output_json)
 
 from .cb_vanning_api import vanning_api_ns
 
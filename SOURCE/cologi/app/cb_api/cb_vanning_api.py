@@ -18,7 +18,6 @@ from flask_restx import Namespace, Resource, fields
 import sys
 import os
 import logging
-import requests
 import json
 from dateutil import parser
 from urllib.parse import urljoin
@@ -29,6 +28,12 @@ from com.helper import create_restx_model_usingSchema, create_response_model
 from model.ebl_model import EblJson
 from app.config import Config
 from com.company_info import get_address_from_cid, get_endpoint_from_cid
+from com.http_client import http_client
+from com.connector import get_connector_endpoint
+from com.codec import decode_json
+from com.ebl_repository import ebl_repository, version_of, EblConflict
+from com import ebl_journal
+from com.ebl_trust import ebl_trust
 
 logger = logging.getLogger("app.flask")
 logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
@@ -107,15 +112,14 @@ def get_mh_data(mh, trsp_instruction_id, is_vanning):
             url = urljoin(
                 Config.MH_MNG_ENDPOINT, f"devanning_plan/{mh}/{trsp_instruction_id}"
             )
-        response = requests.get(
+        response = http_client.get(
             url,
             verify=False,
         )
         if response.status_code != 200:
             logger.debug(response.json())
             raise ValueError(f"Status Code = {response.status_code}")
-        response.encoding = response.apparent_encoding
-        data = response.json()
+        data = decode_json(response)
         if data["result"] is False:
             raise ValueError(data["error_msg"])
         return data
@@ -153,7 +157,7 @@ def update_plan(result, plan, is_vanning=True):
             url = urljoin(
                 Config.MH_MNG_ENDPOINT, f"devanning_plan/{mh}/{trsp_instruction_id}"
             )
-        response = requests.put(
+        response = http_client.put(
             url,
             json=plan,
             verify=False,
@@ -197,13 +201,12 @@ class CBVanningResultApi(Resource):
                 )
                 if int(plan["is_bl_need"]) == 1 and plan["status"] == 1:
                     #  着MHのバンニングの場合にはE/Lを使用済みにする
-                    file_path = os.path.join(
-                        os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-                    )
-                    if os.path.isfile(file_path) is False:
-                        raise ValueError(f"B/L {file_path}が見つかりません")
                     ebl = EblJson()
-                    bl_id = ebl.load_file(file_path)
+                    bl_id = ebl.load(trsp_instruction_id)
+                    if bl_id == -1:
+                        raise ValueError(
+                            f"B/L {ebl_repository.path(trsp_instruction_id)}が見つかりません"
+                        )
                     recipient_cid = ebl.get_recipient_cid()
                     url = urljoin(
                         Config.TRUST_MNG_ENDPOINT,
@@ -215,7 +218,7 @@ class CBVanningResultApi(Resource):
                     }
                     logger.debug(f"バンニング結果通知用CB B/L 情報使用済み： {url}")
                     logger.debug(f"                                    ： {data}")
-                    response = requests.post(
+                    response = http_client.post(
                         url,
                         json=data,
                         verify=False,
@@ -224,9 +227,17 @@ class CBVanningResultApi(Resource):
                         logger.debug(response)
                         # 今年度は2回呼ばれることがあるので
                         # エラーは無視 raise ValueError("B/L 情報使用済み失敗")
-                    response.encoding = response.apparent_encoding
-                    data = response.json()
+                    data = decode_json(response)
                     logger.debug(f"バンニング結果通知用CB B/L 情報使用済結果： {data}")
+                    ebl_journal.record(
+                        trsp_instruction_id,
+                        "bl/used",
+                        cid=recipient_cid,
+                        bl_id=bl_id,
+                        status=response.status_code,
+                    )
+                    # ゲートチェックで保持したbl/detailの結果を使わない
+                    ebl_trust.invalidate(bl_id)
                 plan = update_plan(r, plan, is_vanning=is_vanning)
             ret = {"result": True, "err_msg": "", "updated_plan": plan}
             status = 200
@@ -268,35 +279,36 @@ class CBDevanningResultApi(Resource):
                     int(devanning_plan["is_departure_mh"]) == 1
                     and int(devanning_plan["status"]) == 1
                 ):
-                    file_path = os.path.join(
-                        os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-                    )
-                    if os.path.isfile(file_path) is False:
-                        raise ValueError(f"B/L {file_path}が見つかりません")
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        bl_file = json.load(f)
-                    current_owner = bl_file.get("current_owner", "")
-                    if current_owner == devanning_plan["carrier_cid"]:
-                        # 荷主からB/Lを取得(発行)
-                        logger.debug("デバンニング結果通知用CB BL発行")
-                        self.get_bl(
-                            trsp_instruction_id,
-                            devanning_plan["shipper_cid"],
-                            devanning_plan["recipient_cid"],
-                            devanning_plan["carrier_cid"],
-                        )
-                        logger.debug("デバンニング結果通知用CB BL 荷主→荷受移動申請")
-                        # まず荷主として受領し、荷受け人に移動
-                        self.save_bl(
-                            trsp_instruction_id,
-                            devanning_plan["shipper_cid"],
-                            devanning_plan["recipient_cid"],
-                        )
-                        # 荷受け人として受領
-                        self.save_bl(trsp_instruction_id, devanning_plan["recipient_cid"])
-                        logger.debug(f"デバンニング結果通知用CB BL 荷受人受領成功 current_owner = {devanning_plan['recipient_cid']}")
-                    else:
-                        logger.debug(f"デバンニング結果通知用CB BL 移転済み current_owner = {current_owner}")
+                    # 重複した通知で二重に移転しないように、所有者の確認から保存まで
+                    # B/L毎のロックの中で行う（save_blは同じロックを使う）
+                    with ebl_repository.lock(trsp_instruction_id):
+                        bl_file = ebl_repository.load(trsp_instruction_id, fresh=True)
+                        if bl_file is None:
+                            raise ValueError(
+                                f"B/L {ebl_repository.path(trsp_instruction_id)}が見つかりません"
+                            )
+                        current_owner = bl_file.get("current_owner", "")
+                        if current_owner == devanning_plan["carrier_cid"]:
+                            # 荷主からB/Lを取得(発行)
+                            logger.debug("デバンニング結果通知用CB BL発行")
+                            self.get_bl(
+                                trsp_instruction_id,
+                                devanning_plan["shipper_cid"],
+                                devanning_plan["recipient_cid"],
+                                devanning_plan["carrier_cid"],
+                            )
+                            logger.debug("デバンニング結果通知用CB BL 荷主→荷受移動申請")
+                            # まず荷主として受領し、荷受け人に移動
+                            self.save_bl(
+                                trsp_instruction_id,
+                                devanning_plan["shipper_cid"],
+                                devanning_plan["recipient_cid"],
+                            )
+                            # 荷受け人として受領
+                            self.save_bl(trsp_instruction_id, devanning_plan["recipient_cid"])
+                            logger.debug(f"デバンニング結果通知用CB BL 荷受人受領成功 current_owner = {devanning_plan['recipient_cid']}")
+                        else:
+                            logger.debug(f"デバンニング結果通知用CB BL 移転済み current_owner = {current_owner}")
                 else:
                     logger.debug("デバンニング結果通知用CB BL処理不要")
                 updated_plan = update_plan(r, devanning_plan, is_vanning=False)
@@ -316,7 +328,7 @@ class CBDevanningResultApi(Resource):
 
     def get_bl(self, trsp_instruction_id, shipper_cid, recipient_cid, carrier_cid):
         url = urljoin(
-            Config.CONNECTOR_PRIVATE_ENDPOINT,
+            get_connector_endpoint(),
             f"ebl/{trsp_instruction_id}",
         )
         query_params = {
@@ -326,7 +338,7 @@ class CBDevanningResultApi(Resource):
         endpoint = get_endpoint_from_cid(carrier_cid)
         logger.debug(f"CONNECT cid:{url} / {endpoint}/ {query_params}")
         headers = {"X-ENDPOINT": endpoint}
-        response = requests.get(
+        response = http_client.get(
             url,
             params=query_params,
             verify=False,
@@ -339,21 +351,29 @@ class CBDevanningResultApi(Resource):
             )
         if response.status_code != 200:
             raise ValueError(f"EBL エラー trsp_instruction_id={trsp_instruction_id}")
-        response.encoding = response.apparent_encoding
-        data = response.json()
+        data = decode_json(response)
         logger.debug(f"CONNECTOR RESOPNSE:{json.dumps(data, indent=4)}")
         if data["result"] is False:
             raise ValueError(f"EBL 失敗 trsp_instruction_id={trsp_instruction_id}")
         return data
 
     def save_bl(self, trsp_instruction_id, cid, to_cid=None):
-        file_path = os.path.join(
-            os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-        )
-        if os.path.isfile(file_path) is False:
+        # 重複したコールバックが同じ受領・移転を二重に申請しないように、判定から
+        # トラスト基盤の呼出し・保存までB/L毎のロックの中で行う
+        with ebl_repository.lock(trsp_instruction_id):
+            try:
+                return self._save_bl(trsp_instruction_id, cid, to_cid)
+            except EblConflict as e:
+                # ロックを取らずに更新された場合
+                raise ValueError(
+                    f"B/L {trsp_instruction_id}の更新が競合しました"
+                ) from e
+
+    def _save_bl(self, trsp_instruction_id, cid, to_cid=None):
+        file_path = ebl_repository.path(trsp_instruction_id)
+        bl_file = ebl_repository.load(trsp_instruction_id, fresh=True)
+        if bl_file is None:
             raise ValueError(f"B/L {file_path}が見つかりません")
-        with open(file_path, "r", encoding="utf-8") as f:
-            bl_file = json.load(f)
         if "signed_bl" not in bl_file:
             raise ValueError("B/Lにsigned_blがありません")
         if "bl_id" not in bl_file:
@@ -361,7 +381,8 @@ class CBDevanningResultApi(Resource):
         signed_bl = bl_file["signed_bl"]
         bl_id = int(bl_file["bl_id"])
         current_owner = bl_file.get("current_owner", "")
-        logger.debug(f"B/L current_owner = {current_owner}")
+        version = version_of(bl_file)
+        logger.debug(f"B/L current_owner = {current_owner} / version = {version}")
         if current_owner != cid and current_owner != to_cid:
             url = urljoin(
                 Config.TRUST_MNG_ENDPOINT,
@@ -374,7 +395,7 @@ class CBDevanningResultApi(Resource):
             }
             logger.debug(f"B/L 受領承認： {url}")
             logger.debug(f"           ： {data}")
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 verify=False,
@@ -382,17 +403,23 @@ class CBDevanningResultApi(Resource):
             if response.status_code != 200:
                 logger.debug(response)
                 raise ValueError("B/L 受領失敗")
+            ebl_trust.invalidate(bl_id)
             # 新しい署名のB/Lを保存
-            response.encoding = response.apparent_encoding
-            bl_reg = response.json()
+            bl_reg = decode_json(response)
             signed_bl = bl_reg.get("signed_signed_bl")
             bl_file = {
                 "signed_bl": signed_bl,
                 "bl_id": bl_id,
                 "current_owner": cid,
             }
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(bl_file, f, indent=4, ensure_ascii=False)
+            bl_file = ebl_repository.save(
+                trsp_instruction_id,
+                bl_file,
+                expected_version=version,
+                event="bl/approve",
+                cid=cid,
+            )
+            version = version_of(bl_file)
             logger.debug(f"save New EBL for shipper {file_path}")
             logger.debug(signed_bl)
             if to_cid is None:
@@ -415,7 +442,7 @@ class CBDevanningResultApi(Resource):
             }
             logger.debug(f"B/L 移転申請： {url}")
             logger.debug(f"        ： {data}")
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 verify=False,
@@ -424,17 +451,23 @@ class CBDevanningResultApi(Resource):
             if response.status_code != 200:
                 logger.debug(response)
                 raise ValueError("トラスト基盤 BL移転申請 ERROR")
-            response.encoding = response.apparent_encoding
-            data = response.json()
+            data = decode_json(response)
             if data["result"] is False:
                 raise ValueError(f"トラスト基盤 BL移転申請 result {data}")
+            ebl_trust.invalidate(bl_id)
             bl_file = {
                 "signed_bl": signed_bl,
                 "bl_id": bl_id,
                 "current_owner": cid,
             }
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(bl_file, f, indent=4, ensure_ascii=False)
+            ebl_repository.save(
+                trsp_instruction_id,
+                bl_file,
+                expected_version=version,
+                event="bl/transfer",
+                cid=cid,
+                to_cid=to_cid,
+            )
             logger.debug(f"save EBL {file_path}")
         else:
             logger.debug(f"荷主→荷受け人 B/Lの所有権はすでに {to_cid} に移ってます")
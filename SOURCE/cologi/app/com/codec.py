@@ -0,0 +1,101 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import json
+import logging
+import os
+import requests
+from flask import current_app, make_response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+
+def decode_json(response):
+    """外部APIのJSONレスポンスをデコードする
+
+    JSONはUTF-8で返されるため、response.apparent_encodingによる
+    文字コード判定（本文全体を走査するため大きなレスポンスでは遅い）は行わない。
+    UTF-8でデコードできない場合のみ従来通り文字コードを判定する。
+    JSONでない場合はresponse.json()と同じく
+    requests.exceptions.JSONDecodeError(RequestExceptionの一種)を発生させる。
+    """
+    content = response.content
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        logger.warning(f"JSONレスポンスがUTF-8ではありません: {response.url}")
+        response.encoding = response.apparent_encoding
+        return response.json()
+    try:
+        return loads_json(text)
+    except json.JSONDecodeError as e:
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos) from e
+
+
+def loads_json(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_json(data, indent=False) -> bytes:
+    """JSONにシリアライズする（UTF-8のbytes）"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+    return json.dumps(
+        data, default=_default, ensure_ascii=False, indent=4 if indent else None
+    ).encode("utf-8")
+
+
+def _default(obj):
+    # orjsonが扱えない型はFlaskの既定の変換に合わせる
+    return DefaultJSONProvider.default(obj)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask(jsonify等)のJSONシリアライズにorjsonを使う"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or len(kwargs) > 0:
+            return super().dumps(obj, **kwargs)
+        return dumps_json(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or len(kwargs) > 0:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def output_json(data, code, headers=None):
+    """flask-restxのapplication/jsonのレスポンスをorjsonで生成する"""
+    response = make_response(dumps_json(data, indent=current_app.debug), code)
+    response.headers.extend(headers or {})
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def init_json(app):
+    app.json = OrjsonProvider(app)
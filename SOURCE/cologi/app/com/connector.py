@@ -0,0 +1,45 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com.http_client import http_client
+
+# 同一ホストに配置した場合はコネクタをUNIXドメインソケットで呼び出す
+if Config.CONNECTOR_PRIVATE_SOCKET:
+    http_client.mount_unix_socket(
+        urlsplit(Config.CONNECTOR_PRIVATE_SOCKET_ENDPOINT).hostname,
+        Config.CONNECTOR_PRIVATE_SOCKET,
+        fallback=Config.CONNECTOR_PRIVATE_ENDPOINT,
+        retry_after=Config.CONNECTOR_PRIVATE_SOCKET_RETRY,
+    )
+
+
+def get_connector_endpoint() -> str:
+    """コネクタのPrivate APIのエンドポイント
+
+    コネクタのソケットがあればnginx/TLSを経由せずにuwsgiへ直接接続し、
+    無ければ(別ホストに配置した場合)HTTPSで接続する。ソケットのファイルが
+    あっても接続できない場合はhttp_clientがHTTPSで呼び出す。
+    """
+    socket_path = Config.CONNECTOR_PRIVATE_SOCKET
+    if socket_path and os.path.exists(socket_path):
+        return Config.CONNECTOR_PRIVATE_SOCKET_ENDPOINT
+    return Config.CONNECTOR_PRIVATE_ENDPOINT
@@ -0,0 +1,641 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import json
+import time
+import zlib
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import click
+from flask.cli import AppGroup
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+SEGMENT_SUFFIX = ".log"
+SNAPSHOT_FILE = "index.snapshot"
+LOCK_FILE = ".lock"
+COMPACT_LOCK_FILE = ".compact.lock"
+# 圧縮中のセグメントの一時ファイル（置き換えるまではセグメントとして読まない）
+COMPACT_SUFFIX = ".compact"
+# 圧縮後のセグメントの番号は圧縮を始めた時の最後のセグメントからこの数だけ空ける
+# （圧縮中に追記で切り替わるセグメントと重ならないようにする）
+COMPACT_SEQ_GAP = 1000
+
+
+def journal_dir() -> str:
+    return Config.EBL_JOURNAL_DIR or os.path.join(os.environ.get("EBL_DIR"), "journal")
+
+
+def encode_record(record: dict) -> bytes:
+    """1行のレコード（CRC32 + JSON）。書き込み途中で途切れた行はCRCで検出する"""
+    body = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def decode_record(line: bytes):
+    """レコードの行を読む。壊れている場合はNone"""
+    if len(line) < 10 or line[8:9] != b" " or not line.endswith(b"\n"):
+        return None
+    body = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+def _segment_name(seq) -> str:
+    return f"{seq:010d}{SEGMENT_SUFFIX}"
+
+
+class EblJournal:
+    """B/Lの状態の変更(bl/register, bl/approve, bl/transfer, bl/used)の追記専用の履歴
+
+    変更は固定サイズ(EBL_JOURNAL_SEGMENT_SIZE)のセグメントファイルに1行ずつ追記し、
+    各レコードには同じB/Lの1つ前のレコードの位置(prev)を持たせる。
+    メモリ上の索引(trsp_instruction_id → 最新のレコードの位置)から辿ることで、
+    ディレクトリを走査せずに所有者の履歴を読める。
+
+    - 追記はジャーナルのファイルロック(.lock)の中で行い、コアとコネクタの
+      コンテナの間でも行が混ざらないようにする。他のプロセスが追記した分は
+      読み込み・追記の前にセグメントの末尾から読み足す。
+    - fsyncは同時に追記したレコードでまとめて1回行う(group commit)。
+    - 起動時は索引のスナップショット(index.snapshot)を読み、その後に追記された
+      分だけを読み直す。スナップショットはセグメントの切替えと圧縮の際に保存する。
+    - 圧縮(compact)は最新でないレコードのsigned_blを除き、使用済み(bl/used)で
+      保持期間(EBL_JOURNAL_RETENTION_DAYS)を過ぎたB/Lの履歴を削除する。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._directory = None
+        self._index = None
+        self._position = None
+        self._written = (0, 0)
+        self._synced = (0, 0)
+        self._fds = {}
+        self._compacting = False
+        self._stats = {
+            "appends": 0,
+            "syncs": 0,
+            "replayed": 0,
+            "reloads": 0,
+            "snapshots": 0,
+            "compactions": 0,
+            "errors": 0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    # セグメント
+
+    def _segments(self) -> list:
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in names
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+    def _segment_path(self, seq) -> str:
+        return os.path.join(self._directory, _segment_name(seq))
+
+    @contextmanager
+    def _file_lock(self, name=LOCK_FILE, blocking=True):
+        with open(os.path.join(self._directory, name), "a") as f:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(f.fileno(), flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # 索引
+
+    def _ensure_loaded(self):
+        directory = journal_dir()
+        if self._index is not None and self._directory == directory:
+            return
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._reload()
+
+    def _reload(self):
+        """スナップショットを読み、その後に追記された分を読み足す"""
+        self._count("reloads")
+        self._close_fds()
+        self._index = {}
+        self._position = None
+        segments = self._segments()
+        try:
+            with open(os.path.join(self._directory, SNAPSHOT_FILE), "rb") as f:
+                snapshot = json.loads(f.read())
+            if snapshot["segment"] in segments:
+                self._index = {
+                    key: tuple(location) for key, location in snapshot["index"].items()
+                }
+                self._position = (snapshot["segment"], snapshot["offset"])
+        except (FileNotFoundError, ValueError, KeyError) as e:
+            logger.debug(f"B/Lジャーナル スナップショットなし: {e}")
+        if self._position is None:
+            self._position = (segments[0] if segments else 1, 0)
+        self._catch_up()
+
+    def _catch_up(self):
+        """他のプロセスを含め、前回読んだ位置の後に追記されたレコードを索引に反映する"""
+        segments = self._segments()
+        seq, offset = self._position
+        if segments and seq not in segments and seq < segments[-1]:
+            # 圧縮でセグメントが置き換えられた
+            self._reload()
+            return
+        for current in [s for s in segments if s >= seq]:
+            start = offset if current == seq else 0
+            try:
+                with open(self._segment_path(current), "rb") as f:
+                    f.seek(start)
+                    data = f.read()
+            except FileNotFoundError:
+                self._reload()
+                return
+            end = data.rfind(b"\n") + 1
+            position = start
+            replayed = 0
+            for line in data[:end].splitlines(keepends=True):
+                record = decode_record(line)
+                if record is not None:
+                    self._index[record["id"]] = (current, position)
+                    replayed += 1
+                position += len(line)
+            self._count("replayed", replayed)
+            # 書き込み途中の行は次回読み直す
+            self._position = (current, start + end)
+
+    # 追記
+
+    def append(self, trsp_instruction_id, event, bl_file=None, **extra) -> tuple:
+        """B/Lの変更を追記し、レコードの位置(セグメント, オフセット)を返す
+
+        bl_fileを指定した場合は保存した内容(signed_bl, bl_id, current_owner, version)も残す。
+        fsyncが済んでから戻る。
+        """
+        record = {
+            "id": trsp_instruction_id,
+            "event": event,
+            "at": datetime.now(timezone.utc).isoformat(),
+        }
+        if bl_file is not None:
+            record.update(
+                {
+                    "bl_id": bl_file.get("bl_id"),
+                    "current_owner": bl_file.get("current_owner"),
+                    "version": bl_file.get("version", 0),
+                    "signed_bl": bl_file.get("signed_bl"),
+                }
+            )
+        record.update(extra)
+        with self._lock:
+            self._ensure_loaded()
+            with self._file_lock():
+                self._catch_up()
+                record["prev"] = self._index.get(trsp_instruction_id)
+                line = encode_record(record)
+                seq, rolled = self._active_segment(len(line))
+                fd = self._fd(seq)
+                if self._needs_newline(fd):
+                    os.write(fd, b"\n")
+                offset = os.fstat(fd).st_size
+                os.write(fd, line)
+                location = (seq, offset)
+                self._index[trsp_instruction_id] = location
+                self._position = (seq, offset + len(line))
+                self._written = self._position
+                self._stats["appends"] += 1
+            if rolled:
+                self._save_snapshot()
+        self._sync(location)
+        if rolled:
+            self._maybe_compact()
+        return location
+
+    def _active_segment(self, size):
+        """追記先のセグメント。サイズを超える場合は次のセグメントに切り替える"""
+        segments = self._segments()
+        if not segments:
+            return 1, False
+        seq = segments[-1]
+        try:
+            current_size = os.path.getsize(self._segment_path(seq))
+        except FileNotFoundError:
+            current_size = 0
+        if current_size > 0 and current_size + size > Config.EBL_JOURNAL_SEGMENT_SIZE:
+            # 切り替える前のセグメントの書き込みを確定する
+            self._fsync(seq)
+            return seq + 1, True
+        return seq, False
+
+    def _fd(self, seq):
+        fd = self._fds.get(seq)
+        if fd is None:
+            self._close_fds()
+            fd = os.open(
+                self._segment_path(seq), os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644
+            )
+            self._fds[seq] = fd
+        return fd
+
+    @staticmethod
+    def _needs_newline(fd) -> bool:
+        # 他のプロセスが書き込み途中で停止した行の後ろに続けて書かない
+        size = os.fstat(fd).st_size
+        return size > 0 and os.pread(fd, 1, size - 1) != b"\n"
+
+    def _close_fds(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+    def _fsync(self, seq):
+        fd = self._fds.get(seq)
+        if fd is not None:
+            os.fsync(fd)
+            self._stats["syncs"] += 1
+
+    def _sync(self, location):
+        """locationまでの書き込みをfsyncする。待っている間に他のスレッドが
+        fsyncした場合はまとめて済んだものとして戻る(group commit)"""
+        with self._sync_lock:
+            if self._synced >= location:
+                return
+            delay = Config.EBL_JOURNAL_FSYNC_DELAY
+            if delay:
+                # 同時に追記するレコードを待ってからまとめてfsyncする
+                time.sleep(delay)
+            with self._lock:
+                written = self._written
+                fd = self._fds.get(written[0])
+                # 追記を止めないようにロックの外でfsyncする
+                fd = os.dup(fd) if fd is not None else None
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+                self._count("syncs")
+            self._synced = written
+
+    # 読み込み
+
+    def _read(self, location):
+        seq, offset = location
+        with open(self._segment_path(seq), "rb") as f:
+            f.seek(offset)
+            return decode_record(f.readline())
+
+    def latest(self, trsp_instruction_id):
+        """最新のレコード。無い場合はNone"""
+        history = self.history(trsp_instruction_id, limit=1)
+        return history[0] if history else None
+
+    def history(self, trsp_instruction_id, limit=None) -> list:
+        """B/Lの変更の履歴（新しい順）"""
+        for _ in range(2):
+            with self._lock:
+                self._ensure_loaded()
+                self._catch_up()
+                location = self._index.get(trsp_instruction_id)
+            records = []
+            try:
+                while location is not None and (limit is None or len(records) < limit):
+                    record = self._read(tuple(location))
+                    if record is None:
+                        self._count("errors")
+                        break
+                    records.append(record)
+                    location = record.get("prev")
+                return records
+            except FileNotFoundError:
+                # 読んでいる間に圧縮された
+                with self._lock:
+                    self._reload()
+        return []
+
+    # スナップショット・圧縮
+
+    def _save_snapshot(self):
+        with self._lock:
+            snapshot = {
+                "segment": self._position[0],
+                "offset": self._position[1],
+                "index": self._index,
+            }
+            _write_atomic(
+                os.path.join(self._directory, SNAPSHOT_FILE),
+                json.dumps(snapshot, separators=(",", ":")).encode(),
+            )
+            self._stats["snapshots"] += 1
+
+    def snapshot(self):
+        """索引のスナップショットを保存する"""
+        with self._lock:
+            self._ensure_loaded()
+            with self._file_lock():
+                self._catch_up()
+                self._save_snapshot()
+
+    def _maybe_compact(self):
+        limit = Config.EBL_JOURNAL_COMPACT_SEGMENTS
+        if not limit or len(self._segments()) <= limit:
+            return
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"B/Lジャーナル 圧縮エラー: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._compacting = False
+
+        threading.Thread(target=run, name="ebl-journal-compact", daemon=True).start()
+
+    def compact(self) -> dict:
+        """セグメントを書き直して不要なレコードを除く
+
+        最新でないレコードのsigned_blを除き、使用済みで保持期間を過ぎた
+        B/Lは履歴ごと削除する。追記を止めないよう、書き込みの済んだセグメントは
+        ロックの外で書き直し、ロックの中では追記中のセグメントだけを写して置き換える。
+        他のプロセスはセグメントが無くなったことを検出してスナップショットから読み直す。
+        """
+        with self._lock:
+            self._ensure_loaded()
+        with self._file_lock(COMPACT_LOCK_FILE, blocking=False) as locked:
+            if not locked:
+                return {"skipped": True}
+            result = self._compact()
+        if not result.get("skipped"):
+            self._count("compactions")
+        logger.info(f"B/Lジャーナル 圧縮: {result}")
+        return result
+
+    def _compact(self) -> dict:
+        # 中断した圧縮の一時ファイルを削除する
+        for name in os.listdir(self._directory):
+            if name.endswith(COMPACT_SUFFIX):
+                os.remove(os.path.join(self._directory, name))
+        with self._lock, self._file_lock():
+            self._catch_up()
+            segments = self._segments()
+            latest = dict(self._index)
+        if not segments:
+            return {"records": 0, "dropped": 0, "stripped": 0, "segments": 0}
+        # 最後のセグメント以外は追記されないため、ロックの外で書き直す
+        tail = segments[-1]
+        writer = _SegmentWriter(self._directory, tail + COMPACT_SEQ_GAP)
+        dropped = self._expired(latest)
+        moved = {}
+        count = {"records": 0, "dropped": 0, "stripped": 0}
+        try:
+            self._copy(segments[:-1], latest, dropped, moved, writer, count)
+            with self._lock, self._file_lock():
+                self._catch_up()
+                segments = self._segments()
+                if segments[-1] >= writer.first_seq:
+                    logger.warning(
+                        "B/Lジャーナル 圧縮中にセグメントが増えたため中止します"
+                    )
+                    return {"skipped": True}
+                current = dict(self._index)
+                # 圧縮中に追記されたB/Lは削除しない（それまでの履歴は削除済み）
+                dropped = {
+                    key for key in dropped if current.get(key) == latest.get(key)
+                }
+                self._copy(
+                    [seq for seq in segments if seq >= tail],
+                    current,
+                    dropped,
+                    moved,
+                    writer,
+                    count,
+                )
+                writer.commit()
+                self._close_fds()
+                self._index = {
+                    key: moved[location]
+                    for key, location in current.items()
+                    if location in moved
+                }
+                self._position = (writer.seq, writer.size)
+                self._written = self._synced = self._position
+                # 新しいセグメントの索引を保存してから古いセグメントを削除する
+                self._save_snapshot()
+                for old_seq in segments:
+                    os.remove(self._segment_path(old_seq))
+                count["segments"] = len(self._segments())
+        finally:
+            writer.discard()
+        return count
+
+    def _expired(self, latest) -> set:
+        """最新のレコードが使用済み(bl/used)で保持期間を過ぎたB/L"""
+        expire = datetime.now(timezone.utc) - timedelta(
+            days=Config.EBL_JOURNAL_RETENTION_DAYS
+        )
+        dropped = set()
+        for key, location in latest.items():
+            record = self._read(location)
+            if (
+                record is not None
+                and record["event"] == "bl/used"
+                and datetime.fromisoformat(record["at"]) < expire
+            ):
+                dropped.add(key)
+        return dropped
+
+    def _copy(self, segments, latest, dropped, moved, writer, count):
+        """セグメントのレコードをwriterに写し、元の位置と新しい位置をmovedに残す"""
+        for old_seq in segments:
+            with open(self._segment_path(old_seq), "rb") as f:
+                position = 0
+                for line in f:
+                    location = (old_seq, position)
+                    position += len(line)
+                    record = decode_record(line)
+                    if record is None:
+                        continue
+                    if record["id"] in dropped:
+                        count["dropped"] += 1
+                        continue
+                    if latest.get(record["id"]) != location and record.pop(
+                        "signed_bl", None
+                    ):
+                        count["stripped"] += 1
+                    prev = record.get("prev")
+                    record["prev"] = moved.get(tuple(prev)) if prev else None
+                    moved[location] = writer.write(encode_record(record))
+                    count["records"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["index_size"] = len(self._index) if self._index is not None else 0
+        stats["appends_per_sync"] = (
+            round(stats["appends"] / stats["syncs"], 2) if stats["syncs"] > 0 else 0.0
+        )
+        return stats
+
+
+class _SegmentWriter:
+    """圧縮したレコードを一時ファイルのセグメントに書き、commitでセグメントにする"""
+
+    def __init__(self, directory, seq):
+        self.directory = directory
+        self.first_seq = seq
+        self.seq = seq
+        self.size = 0
+        self._seqs = []
+        self._out = None
+
+    def _path(self, seq) -> str:
+        return os.path.join(self.directory, _segment_name(seq) + COMPACT_SUFFIX)
+
+    def _open(self):
+        self._out = open(self._path(self.seq), "wb")
+        self._seqs.append(self.seq)
+
+    def write(self, line) -> tuple:
+        """レコードを書き、新しい位置(セグメント, オフセット)を返す"""
+        if self._out is None:
+            self._open()
+        elif self.size > 0 and self.size + len(line) > Config.EBL_JOURNAL_SEGMENT_SIZE:
+            self._close()
+            self.seq += 1
+            self.size = 0
+            self._open()
+        location = (self.seq, self.size)
+        self._out.write(line)
+        self.size += len(line)
+        return location
+
+    def _close(self):
+        self._out.flush()
+        os.fsync(self._out.fileno())
+        self._out.close()
+        self._out = None
+
+    def commit(self):
+        # レコードが無い場合も追記先のセグメントを作る
+        if self._out is None and not self._seqs:
+            self._open()
+        if self._out is not None:
+            self._close()
+        for seq in self._seqs:
+            os.replace(
+                self._path(seq), os.path.join(self.directory, _segment_name(seq))
+            )
+        self._seqs = []
+
+    def discard(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        for seq in self._seqs:
+            try:
+                os.remove(self._path(seq))
+            except FileNotFoundError:
+                pass
+        self._seqs = []
+
+
+def _write_atomic(path, data: bytes):
+    tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+ebl_journal = EblJournal()
+
+
+def record(trsp_instruction_id, event, bl_file=None, **extra):
+    """EBL_JOURNAL_ENABLEDの場合にB/Lの変更を履歴に残す
+
+    B/Lはファイル(EBL_DIR)を正とするため、履歴に残せなくても処理は続ける。
+    """
+    if not Config.EBL_JOURNAL_ENABLED:
+        return None
+    try:
+        return ebl_journal.append(trsp_instruction_id, event, bl_file, **extra)
+    except Exception as e:
+        logger.error(f"B/Lジャーナル {trsp_instruction_id} {event} 追記エラー: {e}")
+        ebl_journal._count("errors")
+        return None
+
+
+def get_stats() -> dict:
+    return ebl_journal.get_stats()
+
+
+ebl_journal_cli = AppGroup("ebl-journal", help="B/Lの変更の履歴(ジャーナル)")
+
+
+@ebl_journal_cli.command("compact")
+def compact_command():
+    """ジャーナルを圧縮する（定期的に実行する）"""
+    click.echo(ebl_journal.compact())
+
+
+@ebl_journal_cli.command("snapshot")
+def snapshot_command():
+    """索引のスナップショットを保存する"""
+    ebl_journal.snapshot()
+
+
+@ebl_journal_cli.command("history")
+@click.argument("trsp_instruction_id")
+def history_command(trsp_instruction_id):
+    """B/Lの変更の履歴を表示する（新しい順）"""
+    for record in ebl_journal.history(trsp_instruction_id):
+        click.echo(
+            f"{record['at']} {record['event']} version={record.get('version')}"
+            f" owner={record.get('current_owner')} {record.get('cid', '')}"
+        )
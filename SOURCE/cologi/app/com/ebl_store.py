@@ -0,0 +1,233 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+import click
+import sqlalchemy as sa
+from flask import has_app_context
+from flask.cli import AppGroup
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from database import db
+from model.ebl_model import EBL, EblJson
+from com.ebl_repository import ebl_repository, version_of
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+
+def to_values(trsp_instruction_id, bl_file) -> dict:
+    """B/Lファイルの内容をeblテーブルの列の値にする"""
+    ebl = EblJson()
+    ebl.load_json(bl_file["signed_bl"])
+    trailers = _party(ebl.get_trailers_giai) or []
+    return {
+        "trsp_instruction_id": trsp_instruction_id,
+        "bl_no": str(bl_file["bl_id"]),
+        "bl_data": json.dumps(bl_file["signed_bl"], ensure_ascii=False),
+        "bl_cid": _party(ebl.get_issue_user_id),
+        "recipient_cid": _party(ebl.get_recipient_cid),
+        "current_owner": bl_file.get("current_owner"),
+        "trailer_giai_list_str": ",".join(
+            trailer["id"]["value"] for trailer in trailers
+        )
+        or None,
+        "version": version_of(bl_file),
+    }
+
+
+def _party(getter):
+    # 署名済みのB/Lに項目が無い場合は検索の対象外とする
+    try:
+        return getter()
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class EblStore:
+    """B/LをDBのeblテーブルに保存し、事業者や作成日時で検索する
+
+    B/Lファイル(EBL_DIR)を正とし、保存したB/Lをテーブルにも反映する。
+    反映は版(version)が新しい場合のみ行うため、保存が前後して届いても
+    古い内容で上書きしない。DBの障害でB/Lの保存を失敗させないように、
+    反映の失敗はログに残して flask ebl-store import で反映し直す。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "skipped": 0, "errors": 0, "searches": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def put(self, trsp_instruction_id, bl_file, created_at=None) -> bool:
+        if not has_app_context():
+            logger.warning(
+                f"B/L {trsp_instruction_id}: DBに反映できません(app context)"
+            )
+            return False
+        try:
+            values = to_values(trsp_instruction_id, bl_file)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"B/L {trsp_instruction_id}: 内容が不正です {e}")
+            self._count("errors")
+            return False
+        for _ in range(2):
+            try:
+                return self._put(values, created_at)
+            except sa.exc.IntegrityError:
+                # 他の処理が同時に登録したので、版を比べて更新し直す
+                continue
+            except Exception as e:
+                logger.error(f"B/L {trsp_instruction_id}: DBに反映できません {e}")
+                break
+        self._count("errors")
+        return False
+
+    def _put(self, values, created_at):
+        table = EBL.__table__
+        trsp_instruction_id = values["trsp_instruction_id"]
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                table.update()
+                .where(table.c.trsp_instruction_id == trsp_instruction_id)
+                .where(table.c.version < values["version"])
+                .values({**values, "updated_at": sa.func.now()})
+            ).rowcount
+            if updated == 0:
+                exists = conn.execute(
+                    sa.select(table.c.id).where(
+                        table.c.trsp_instruction_id == trsp_instruction_id
+                    )
+                ).first()
+                if exists is not None:
+                    # 同じか新しい版が反映済み
+                    self._count("skipped")
+                    return True
+                if created_at is not None:
+                    values = {**values, "created_at": created_at}
+                conn.execute(table.insert().values(values))
+        self._count("puts")
+        return True
+
+    def search(
+        self,
+        cid=None,
+        bl_cid=None,
+        recipient_cid=None,
+        current_owner=None,
+        created_from=None,
+        created_to=None,
+        offset=0,
+        num=None,
+    ):
+        """条件に合うB/L（作成日時の新しい順）と件数 (total_num, [EBL])
+
+        cidは発行者・荷受け人・現在の所有者のいずれかに一致するもの。
+        created_from, created_toはその日を含む日付(date)。
+        """
+        self._count("searches")
+        conditions = []
+        if cid:
+            conditions.append(
+                sa.or_(
+                    EBL.bl_cid == cid,
+                    EBL.recipient_cid == cid,
+                    EBL.current_owner == cid,
+                )
+            )
+        if bl_cid:
+            conditions.append(EBL.bl_cid == bl_cid)
+        if recipient_cid:
+            conditions.append(EBL.recipient_cid == recipient_cid)
+        if current_owner:
+            conditions.append(EBL.current_owner == current_owner)
+        if created_from is not None:
+            conditions.append(
+                EBL.created_at >= datetime.combine(created_from, datetime.min.time())
+            )
+        if created_to is not None:
+            conditions.append(
+                EBL.created_at
+                < datetime.combine(created_to + timedelta(days=1), datetime.min.time())
+            )
+        total_num = db.session.execute(
+            sa.select(sa.func.count(EBL.id)).where(*conditions)
+        ).scalar_one()
+        statement = (
+            sa.select(EBL)
+            .where(*conditions)
+            .order_by(EBL.created_at.desc(), EBL.id.desc())
+            .offset(offset)
+        )
+        if num is not None:
+            statement = statement.limit(num)
+        return total_num, db.session.execute(statement).scalars().all()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+ebl_store = EblStore()
+
+
+def get_stats() -> dict:
+    return ebl_store.get_stats()
+
+
+ebl_store_cli = AppGroup("ebl-store", help="B/LのDB(eblテーブル)")
+
+
+@ebl_store_cli.command("init")
+def init_command():
+    """eblテーブルを作成する（作成済みの場合は flask db upgrade で索引等を追加する）"""
+    EBL.__table__.create(db.engine, checkfirst=True)
+
+
+@ebl_store_cli.command("import")
+@click.option("--ebl-dir", help="B/Lファイルのディレクトリ（省略時はEBL_DIR）")
+def import_command(ebl_dir):
+    """B/Lファイル(EBL_DIR)をeblテーブルに反映する（反映済みの版は飛ばす）"""
+    if ebl_dir is not None:
+        os.environ["EBL_DIR"] = ebl_dir
+    count = {"imported": 0, "errors": 0}
+    with os.scandir(os.environ.get("EBL_DIR")) as entries:
+        for entry in entries:
+            # ロックファイル(.{id}.lock)や書き込み中の一時ファイルは対象外
+            if entry.name.startswith(".") or not entry.name.endswith(".json"):
+                continue
+            trsp_instruction_id = entry.name[: -len(".json")]
+            bl_file = ebl_repository.load(trsp_instruction_id)
+            # 作成日時はファイルの更新日時とする（発行後に移転したものは移転日時）
+            created_at = datetime.fromtimestamp(entry.stat().st_mtime)
+            if bl_file is not None and ebl_store.put(
+                trsp_instruction_id, bl_file, created_at=created_at
+            ):
+                count["imported"] += 1
+            else:
+                count["errors"] += 1
+                click.echo(f"{entry.name}: 反映できません")
+    stats = ebl_store.get_stats()
+    click.echo(
+        f"{count['imported']}件 (反映済み{stats['skipped']}件を含む) / エラー{count['errors']}件"
+    )
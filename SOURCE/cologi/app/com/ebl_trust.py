@@ -0,0 +1,294 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com.http_client import http_client
+from com.codec import decode_json
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# トラスト基盤の並列呼出し用（プロセスで共有し同時実行数を制限する）
+_executor = ThreadPoolExecutor(
+    max_workers=Config.EBL_TRUST_MAX_WORKERS, thread_name_prefix="ebl_trust"
+)
+
+
+def bl_digest(bl) -> str:
+    """署名済みのB/Lのハッシュ（キーの順番の違いは同じB/Lとみなす）"""
+    data = json.dumps(bl, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class EblTrust:
+    """B/Lゲートチェック用のトラスト基盤の検証
+
+    電子署名(sign/verify)とB/Lの改ざん(bl/verify)の検証は並列に呼び出す。
+    どちらも署名済みのB/Lが同じなら結果が変わらないため、B/Lのハッシュを
+    キーにLRU(EBL_TRUST_CACHE_SIZE)で保持し、2回目以降は呼び出さない。
+    所有者・使用済み(bl/detail)は変わるため、B/Lファイルの版毎に
+    EBL_TRUST_DETAIL_TTL秒だけ保持する。このプロセスでbl/used等を呼び出した
+    場合はinvalidateで破棄し、移転(B/Lファイルの保存)は版が変わるため
+    他のプロセスで保存した場合も保持した内容を使わない。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._verified = OrderedDict()
+        self._details = {}
+        self._pending = {}
+        self._generation = 0
+        self._stats = {
+            "verify_hits": 0,
+            "verify_shared": 0,
+            "verify_calls": 0,
+            "detail_hits": 0,
+            "detail_calls": 0,
+            "invalidations": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def verify(self, recipient_cid, bl_cid, bl_no, bl):
+        """電子署名とB/Lを検証し、エラー内容を返す（問題が無い場合はNone）
+
+        "SIGN_ERROR" : 署名が不正
+        "INVALID_BL" : B/Lの改ざんを検出
+        """
+        digest = bl_digest(bl)
+        sign = self._submit(
+            ("sign/verify", recipient_cid, digest),
+            self._verify_sign,
+            recipient_cid,
+            bl,
+        )
+        integrity = self._submit(
+            ("bl/verify", bl_cid, int(bl_no), digest),
+            self._verify_bl,
+            bl_cid,
+            bl_no,
+            bl,
+        )
+        # 署名が不正な場合はB/Lの検証結果を待たない（順番に呼んでいた時と同じ結果）
+        if not self._result(sign):
+            return "SIGN_ERROR"
+        if not self._result(integrity):
+            return "INVALID_BL"
+        return None
+
+    def _submit(self, key, func, *args):
+        with self._lock:
+            valid = self._verified.get(key)
+            if valid is not None:
+                self._verified.move_to_end(key)
+                self._stats["verify_hits"] += 1
+                return key, valid
+            # 同じB/Lの検証を呼出し中なら、その結果を待つ（一括チェック等）
+            future = self._pending.get(key)
+            if future is not None:
+                self._stats["verify_shared"] += 1
+                return key, future
+            self._stats["verify_calls"] += 1
+            future = _executor.submit(func, *args)
+            self._pending[key] = future
+        # 終わっていればすぐに呼ばれるため、ロックの外で登録する
+        future.add_done_callback(lambda done: self._done(key, done))
+        return key, future
+
+    def _done(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if future.cancelled() or future.exception() is not None:
+                return
+            valid, cacheable = future.result()
+            if cacheable:
+                self._verified[key] = valid
+                self._verified.move_to_end(key)
+                while len(self._verified) > Config.EBL_TRUST_CACHE_SIZE:
+                    self._verified.popitem(last=False)
+
+    def _result(self, submitted):
+        _, value = submitted
+        if isinstance(value, bool):
+            return value
+        valid, _ = value.result()
+        return valid
+
+    def _verify_sign(self, recipient_cid, bl):
+        url = urljoin(
+            Config.TRUST_MNG_ENDPOINT,
+            "sign/verify",
+        )
+        data = {
+            "cid": recipient_cid,
+            "signature": bl,
+        }
+        logger.debug(f"電子署名検証： {url}")
+        logger.debug(f"           ： {data}")
+        response = http_client.post(
+            url,
+            json=data,
+            verify=False,
+        )
+        if response.status_code != 200:
+            logger.debug(response)
+            raise ValueError("電子署名検証失敗")
+        data = decode_json(response)
+        logger.debug(f"電子署名 response:{data}")
+        if data["status"] != "success" or data["isValid"] is False:
+            logger.debug(f"電子署名検証エラー:{data}")
+        # 検証できなかった(status)場合は保持しない
+        return (
+            data["status"] == "success" and data["isValid"] is not False,
+            data["status"] == "success",
+        )
+
+    def _verify_bl(self, bl_cid, bl_no, bl):
+        url = urljoin(
+            Config.TRUST_MNG_ENDPOINT,
+            "bl/verify",
+        )
+        data = {
+            "cid": bl_cid,
+            "bl_id": int(bl_no),
+            "signed_bl": bl,
+        }
+        logger.debug(f"B/L 情報検証： {url}")
+        logger.debug(f"           ： {data}")
+        response = http_client.post(
+            url,
+            json=data,
+            verify=False,
+        )
+        if response.status_code != 200:
+            logger.debug(response)
+            raise ValueError("B/L 情報検証失敗")
+        data = decode_json(response)
+        logger.debug(f"B/L 情報検証 response:{data}")
+        if data["status"] != "success" or data["result"] is False:
+            logger.debug(f"B/L 情報検証エラー:{data}")
+        return (
+            data["status"] == "success" and data["result"] is not False,
+            data["status"] == "success",
+        )
+
+    def detail(self, bl_no, version=None):
+        """bl/detailの結果（所有者・使用済み等）
+
+        versionはB/Lファイルの版。同じ版でEBL_TRUST_DETAIL_TTL秒以内に
+        取得した結果があればそれを返す。
+        """
+        bl_id = int(bl_no)
+        with self._lock:
+            generation = self._generation
+            entry = self._details.get(bl_id)
+            if (
+                entry is not None
+                and entry[0] == version
+                and time.monotonic() < entry[1]
+            ):
+                self._stats["detail_hits"] += 1
+                return entry[2]
+        self._count("detail_calls")
+        url = urljoin(
+            Config.TRUST_MNG_ENDPOINT,
+            "bl/detail",
+        )
+        logger.debug(f"B/L 情報詳細： {url}")
+        logger.debug(f"           ： bl_id = {bl_id}")
+        response = http_client.get(
+            url,
+            params={"bl_id": bl_id},
+            verify=False,
+        )
+        if response.status_code != 200:
+            logger.debug(response)
+            raise ValueError("B/L 情報詳細失敗")
+        data = decode_json(response)
+        logger.debug(f"B/L 情報詳細： {data}")
+        if data.get("status") == "success" and Config.EBL_TRUST_DETAIL_TTL:
+            with self._lock:
+                if generation != self._generation:
+                    # 呼出し中に状態が変わった可能性があるため保持しない
+                    return data
+                self._details[bl_id] = (
+                    version,
+                    time.monotonic() + Config.EBL_TRUST_DETAIL_TTL,
+                    data,
+                )
+                self._expire()
+        return data
+
+    def _expire(self):
+        # 期限切れの結果を捨てる（ロックの中で呼ぶ）
+        if len(self._details) <= Config.EBL_TRUST_CACHE_SIZE:
+            return
+        now = time.monotonic()
+        for bl_id in [k for k, v in self._details.items() if v[1] <= now]:
+            del self._details[bl_id]
+        while len(self._details) > Config.EBL_TRUST_CACHE_SIZE:
+            del self._details[next(iter(self._details))]
+
+    def invalidate(self, bl_id):
+        """bl/used, bl/transfer等で状態を変えたB/Lのbl/detailの結果を破棄する"""
+        with self._lock:
+            self._generation += 1
+            if self._details.pop(int(bl_id), None) is not None:
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._verified.clear()
+            self._details.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["verified_entries"] = len(self._verified)
+            stats["detail_entries"] = len(self._details)
+        verifies = stats["verify_hits"] + stats["verify_shared"] + stats["verify_calls"]
+        stats["verify_hit_rate"] = (
+            round((stats["verify_hits"] + stats["verify_shared"]) / verifies, 3)
+            if verifies > 0
+            else 0.0
+        )
+        details = stats["detail_hits"] + stats["detail_calls"]
+        stats["detail_hit_rate"] = (
+            round(stats["detail_hits"] / details, 3) if details > 0 else 0.0
+        )
+        return stats
+
+
+ebl_trust = EblTrust()
+
+
+def get_stats() -> dict:
+    return ebl_trust.get_stats()
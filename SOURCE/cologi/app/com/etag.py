@@ -0,0 +1,64 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import hashlib
+from flask import make_response, request
+from com.codec import dumps_json
+
+
+def make_etag(data) -> str:
+    """データの内容から求めるETag"""
+    return '"' + hashlib.sha256(dumps_json(data)).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag) -> bool:
+    """If-None-MatchのいずれかのETagと一致するか（弱いETagも同じとみなす）"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(
+        value.strip().removeprefix("W/") == etag for value in if_none_match.split(",")
+    )
+
+
+def request_if_none_match():
+    """呼出し元から受け取ったIf-None-Match"""
+    return request.headers.get("If-None-Match")
+
+
+def conditional_headers(headers=None) -> dict:
+    """呼出し元のIf-None-Matchを呼出し先に引き継ぐヘッダ"""
+    headers = dict(headers or {})
+    if_none_match = request_if_none_match()
+    if if_none_match:
+        headers["If-None-Match"] = if_none_match
+    return headers
+
+
+def etag_headers(response) -> dict:
+    """呼出し先のETagを呼出し元に返すヘッダ"""
+    etag = response.headers.get("ETag")
+    return {"ETag": etag} if etag else {}
+
+
+def not_modified(etag):
+    """304 Not Modified（本文なし）"""
+    response = make_response("", 304)
+    if etag:
+        response.headers["ETag"] = etag
+    return response
@@ -0,0 +1,114 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import logging
+from flask import Response, request, stream_with_context
+from com.http_client import http_client
+from com.codec import dumps_json, loads_json
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# 一覧検索のストリーミング（Accept: application/x-ndjson の場合）
+# 一覧の要素を1行ずつ返し、最後の行にページ情報・結果(result, error_msg)を返す
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_ndjson() -> bool:
+    """呼出し元がNDJSONでの応答を求めているか"""
+    return (
+        request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+        == NDJSON_MIMETYPE
+    )
+
+
+def ndjson_response(lines, status=200, headers=None):
+    """行(bytes)のジェネレータを逐次返すレスポンス"""
+    response = Response(
+        stream_with_context(lines), status=status, mimetype=NDJSON_MIMETYPE
+    )
+    response.headers.extend(headers or {})
+    # nginxでバッファリングせずに逐次転送する
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def iter_ndjson(items, envelope):
+    """itemsの要素を1行ずつ出力し、最後にenvelope()の結果を1行出力する
+
+    途中でエラーになった場合は最後の行をresult=Falseとする。
+    """
+    try:
+        for item in items:
+            yield dumps_json(item) + b"\n"
+        tail = envelope()
+    except Exception as e:
+        logger.error(e, exc_info=True, stack_info=False)
+        tail = {"result": False, "error_msg": "error"}
+    yield dumps_json(tail) + b"\n"
+
+
+def split_groups(groups, key):
+    """事業者毎の明細のリスト({key: [明細]})を明細1件毎に分ける"""
+    for group in groups:
+        if not isinstance(group, dict) or key not in group:
+            yield group
+            continue
+        for item in group.get(key) or []:
+            yield group | {key: [item]}
+
+
+def stream_list(url, params, headers, list_key, **kwargs):
+    """呼出し先の一覧検索をNDJSONで要求し、本文を読み込まずに行毎に中継する
+
+    呼出し先がNDJSONに対応していない(JSONを返す)場合は一覧を行に分けて返す。
+    """
+    headers = dict(headers or {})
+    headers["Accept"] = NDJSON_MIMETYPE
+    try:
+        response = http_client.get(
+            url, params=params, headers=headers, stream=True, **kwargs
+        )
+    except Exception as e:
+        logger.error(e, exc_info=True, stack_info=False)
+        return ndjson_response(
+            iter([dumps_json({"result": False, "error_msg": "error"}) + b"\n"]), 500
+        )
+    if response.headers.get("Content-Type", "").startswith(NDJSON_MIMETYPE):
+        return ndjson_response(_relay(response), response.status_code)
+    try:
+        data = loads_json(response.content)
+    except ValueError as e:
+        logger.error(e, exc_info=True, stack_info=False)
+        data = {"result": False, "error_msg": "error"}
+    finally:
+        response.close()
+    if not isinstance(data, dict):
+        data = {"result": False, "error_msg": "error"}
+    envelope = {key: value for key, value in data.items() if key != list_key}
+    return ndjson_response(
+        iter_ndjson(data.get(list_key) or [], lambda: envelope), response.status_code
+    )
+
+
+def _relay(response):
+    try:
+        for line in response.iter_lines():
+            if line:
+                yield line + b"\n"
+    finally:
+        response.close()
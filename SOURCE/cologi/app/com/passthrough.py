@@ -0,0 +1,218 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import re
+import sys
+import logging
+import threading
+from flask import current_app
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com.codec import dumps_json, loads_json
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+_WHITESPACE = b" \t\r\n"
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|-?[0-9][0-9.eE+-]*|true|false|null')
+_SCALAR_CHARS = frozenset(b"0123456789.eE+-truefalsn")
+_CLOSING = {ord("["): ord("]"), ord("{"): ord("}")}
+_NOT_BRACKET = bytes(c for c in range(256) if c not in b"[]{}")
+
+_lock = threading.Lock()
+_stats = {"spliced": 0, "fallback": 0}
+
+
+def scan_members(body):
+    """JSONの最上位のオブジェクトのメンバー毎に値の位置(開始, 終了)を返す
+
+    本文全体は走査せず、先頭と末尾からそれぞれ値が配列・オブジェクトの
+    メンバーの手前まで読む。コネクタの応答は値が配列・オブジェクトの
+    メンバーが1つ（中継する一覧・明細）のため、その間をそのメンバーの値とする。
+    その間に他のメンバーが含まれる場合（値が配列・オブジェクトのメンバーが
+    複数ある場合）や、オブジェクトでない場合、解析できない場合はNoneを返す。
+    """
+    start = _skip(body, 0)
+    end = len(body.rstrip(_WHITESPACE))
+    if start >= end or body[start] != ord("{") or body[end - 1] != ord("}"):
+        return None
+    members = {}
+    pos = _skip(body, start + 1)
+    if pos == end - 1:
+        return members
+    # 先頭から読む
+    while True:
+        key = _STRING.match(body, pos)
+        if key is None:
+            return None
+        pos = _skip(body, key.end())
+        if pos >= end or body[pos] != ord(":"):
+            return None
+        pos = _skip(body, pos + 1)
+        if pos < end and body[pos] in _CLOSING:
+            container = (loads_json(key.group()), pos)
+            break
+        value = _SCALAR.match(body, pos)
+        if value is None:
+            return None
+        members[loads_json(key.group())] = (value.start(), value.end())
+        pos = _skip(body, value.end())
+        if pos == end - 1:
+            return members
+        if body[pos] != ord(","):
+            return None
+        pos = _skip(body, pos + 1)
+    # 末尾から読む
+    tail = []
+    pos = _skip_back(body, end - 1)
+    while True:
+        if pos <= container[1]:
+            return None
+        if body[pos - 1] in _CLOSING.values():
+            break
+        value = _scalar_back(body, pos)
+        if value is None:
+            return None
+        member = (value, pos)
+        pos = _skip_back(body, value)
+        if body[pos - 1] != ord(":"):
+            return None
+        pos = _skip_back(body, pos - 1)
+        key = _string_back(body, pos)
+        if key is None:
+            return None
+        tail.append((loads_json(body[key:pos]), member))
+        pos = _skip_back(body, key)
+        if body[pos - 1] != ord(","):
+            return None
+        pos = _skip_back(body, pos - 1)
+    if not _encloses(body, container[1], pos):
+        return None
+    members[container[0]] = (container[1], pos)
+    members.update(reversed(tail))
+    return members
+
+
+def _encloses(body, start, end):
+    """startの括弧がend-1の括弧で閉じるか（文字列の中の括弧は除いて対応を見る）"""
+    brackets = _STRING.sub(b"", body[start:end]).translate(None, _NOT_BRACKET)
+    closing = []
+    for index, char in enumerate(brackets):
+        if char in _CLOSING:
+            closing.append(_CLOSING[char])
+        elif not closing or closing.pop() != char:
+            return False
+        elif not closing and index != len(brackets) - 1:
+            # 途中で閉じた場合は後ろに別のメンバーがある
+            return False
+    return not closing
+
+
+def _skip(body, pos):
+    while pos < len(body) and body[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _skip_back(body, pos):
+    while pos > 0 and body[pos - 1] in _WHITESPACE:
+        pos -= 1
+    return pos
+
+
+def _string_back(body, end):
+    """endの直前で終わる文字列の開始位置"""
+    if end < 2 or body[end - 1] != ord('"'):
+        return None
+    pos = end - 1
+    while True:
+        pos = body.rfind(b'"', 0, pos)
+        if pos < 0:
+            return None
+        escapes = 0
+        while body[pos - 1 - escapes] == ord("\\"):
+            escapes += 1
+        if escapes % 2 == 0:
+            return pos
+
+
+def _scalar_back(body, end):
+    """endの直前で終わる値(文字列・数値・真偽値・null)の開始位置"""
+    if body[end - 1] == ord('"'):
+        pos = _string_back(body, end)
+    else:
+        pos = end
+        while pos > 0 and body[pos - 1] in _SCALAR_CHARS:
+            pos -= 1
+    if pos is None or _SCALAR.fullmatch(body, pos, end) is None:
+        return None
+    return pos
+
+
+def splice(body, key, default, fields=(), extra=None):
+    """コネクタの応答のkeyの値をそのまま使い、外側のメンバーを組み替えたJSONを返す
+
+    fieldsの値もコネクタの応答からそのまま使い、extraの値を付け加える。
+    応答を解析できない場合やfieldsのいずれかが無い場合はNoneを返す。
+    """
+    members = scan_members(body)
+    if members is None:
+        return None
+    view = memoryview(body)
+    parts = [b"{", dumps_json(key), b":"]
+    if key in members:
+        parts.append(view[slice(*members[key])])
+    else:
+        parts.append(dumps_json(default))
+    for field in fields:
+        if field not in members:
+            return None
+        parts += [b",", dumps_json(field), b":", view[slice(*members[field])]]
+    for name, value in (extra or {}).items():
+        parts += [b",", dumps_json(name), b":", dumps_json(value)]
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+def passthrough_response(response, key, default, fields=(), headers=None):
+    """コネクタの応答の本文をデコードせずに{key, fields, result, error_msg}で返す
+
+    使えない場合（無効にしている場合やコネクタがエラーを返した場合、応答を
+    解析できない場合）はNoneを返すため、呼出し元は従来通りデコードして応答を組み立てる。
+    """
+    if not Config.WEB_API_PASSTHROUGH:
+        return None
+    body = None
+    if response.status_code == 200:
+        body = splice(
+            response.content, key, default, fields, {"result": True, "error_msg": ""}
+        )
+    with _lock:
+        _stats["fallback" if body is None else "spliced"] += 1
+    if body is None:
+        logger.debug(f"コネクタの応答を中継できないためデコードします: {key}")
+        return None
+    ret = current_app.response_class(body, 200, mimetype="application/json")
+    ret.headers.extend(headers or {})
+    return ret
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats)
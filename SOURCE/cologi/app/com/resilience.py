@@ -0,0 +1,252 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import sys
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# 呼出し先の判定に使う設定（アプリにより存在しないものもある）
+# 設定に無いホストは他社のコネクタ等とみなし、ホスト毎に管理する
+DEPENDENCY_ENDPOINTS = {
+    "connector": ("CONNECTOR_PRIVATE_ENDPOINT", "CONNECTOR_PRIVATE_SOCKET_ENDPOINT"),
+    "mh_mng": ("MH_MNG_ENDPOINT",),
+    "trust": ("TRUST_MNG_ENDPOINT",),
+    "backend": ("BACKEND_ENDPOINT",),
+    "shipper_backend": ("SHIPPER_BACKEND_ENDPOINT",),
+    "carrier_backend": ("CARRIER_BACKEND_ENDPOINT",),
+}
+
+# 呼出し先の障害とみなし、リトライ対象とするステータス（一時的なエラー）
+RETRY_STATUS = (502, 503, 504)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """サーキットブレーカーが開いているため呼び出さなかった"""
+
+
+class CircuitBreaker:
+    """呼出し先毎のサーキットブレーカー
+
+    連続してfailure_threshold回失敗すると開き、recovery_timeout秒の間は
+    呼び出さずに即時にCircuitOpenErrorとする。経過後は1件だけ試行(half_open)し、
+    成功すれば閉じ、失敗すれば再度開く。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold, recovery_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._trial = False
+        return self._state
+
+    def before_call(self):
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return
+            self._rejected += 1
+        raise CircuitOpenError(f"{self.name} は停止中のため呼び出しません")
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"サーキットブレーカー {self.name}: closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"サーキットブレーカー {self.name}: open (失敗 {self._failures}回)"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "failures": self._failures,
+                "rejected": self._rejected,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def dependency_of(url, headers=None):
+    """URLから呼出し先の名前を求める
+
+    コネクタ経由の呼出しは転送先(X-ENDPOINT)毎に分けて、
+    1社の障害で他社への呼出しまで止めないようにする。
+    """
+    parsed = urlsplit(url)
+    for name, attrs in DEPENDENCY_ENDPOINTS.items():
+        for attr in attrs:
+            endpoint = getattr(Config, attr, None)
+            if endpoint is None:
+                continue
+            endpoint = urlsplit(endpoint)
+            if endpoint.scheme == parsed.scheme and endpoint.netloc == parsed.netloc:
+                forward = (headers or {}).get("X-ENDPOINT")
+                if name == "connector" and forward:
+                    return f"{name}:{urlsplit(forward).netloc}"
+                return name
+    return f"remote:{parsed.netloc}"
+
+
+def policy_of(dependency):
+    """呼出し先のタイムアウト(接続, 読込み)と期限(秒)"""
+    policies = Config.HTTP_POLICIES
+    name = dependency.split(":")[0]
+    return policies.get(name, policies["default"])
+
+
+def breaker_of(dependency):
+    breaker = _breakers.get(dependency)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(dependency)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    dependency,
+                    Config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                    Config.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+                )
+                _breakers[dependency] = breaker
+    return breaker
+
+
+def call(method, url, send, deadline=None, **kwargs):
+    """タイムアウト・サーキットブレーカー・リトライを適用して呼び出す
+
+    sendは実際にリクエストを送る関数(method, url, **kwargs)。
+    リトライは冪等なGETのみで、期限内に収まる場合に限る。
+    deadlineを指定した場合は呼出し先の期限より短ければそれを期限(秒)とする。
+    """
+    dependency = dependency_of(url, kwargs.get("headers"))
+    policy = policy_of(dependency)
+    breaker = breaker_of(dependency)
+    connect_timeout, read_timeout = policy["timeout"]
+    if deadline is None or deadline > policy["deadline"]:
+        deadline = policy["deadline"]
+    deadline = time.monotonic() + deadline
+    retries = Config.HTTP_GET_RETRIES if method.upper() == "GET" else 0
+    timeout = kwargs.pop("timeout", None)
+    attempt = 0
+    while True:
+        breaker.before_call()
+        remaining = deadline - time.monotonic()
+        if timeout is None:
+            attempt_timeout = (connect_timeout, max(min(read_timeout, remaining), 0.1))
+        else:
+            attempt_timeout = timeout
+        try:
+            response = send(method, url, timeout=attempt_timeout, **kwargs)
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ) as e:
+            breaker.record_failure()
+            if not _can_retry(attempt, retries, deadline):
+                raise
+            logger.warning(f"{method} {url} リトライ({attempt + 1}): {e}")
+        except BaseException:
+            # 応答の読込み中のエラー等もリトライはしないが失敗として記録する
+            # （記録しないとhalf-openの試行中のままになり、以降の呼出しを全て拒否する）
+            breaker.record_failure()
+            raise
+        else:
+            # アプリのエラー(500等)は障害とみなさない
+            if response.status_code in RETRY_STATUS:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRY_STATUS or not _can_retry(
+                attempt, retries, deadline
+            ):
+                return response
+            logger.warning(
+                f"{method} {url} リトライ({attempt + 1}): HTTP {response.status_code}"
+            )
+            response.close()
+        time.sleep(Config.HTTP_RETRY_BACKOFF * (2**attempt))
+        attempt += 1
+
+
+def _can_retry(attempt, retries, deadline):
+    if attempt >= retries:
+        return False
+    wait = Config.HTTP_RETRY_BACKOFF * (2**attempt)
+    return time.monotonic() + wait < deadline
+
+
+def get_stats() -> dict:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    stats = {}
+    for dependency, breaker in breakers.items():
+        stats[dependency] = breaker.get_stats()
+        policy = policy_of(dependency)
+        stats[dependency]["timeout"] = list(policy["timeout"])
+        stats[dependency]["deadline"] = policy["deadline"]
+    return stats
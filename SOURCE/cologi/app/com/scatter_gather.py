@@ -0,0 +1,208 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+import os
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.config import Config
+from com.company_info import COMPANY_INFOS, get_cids_by_role, get_endpoint_from_cid
+from com.http_client import http_client
+from com.codec import decode_json, dumps_json
+from com.etag import etag_matches, make_etag, not_modified, request_if_none_match
+from com.ndjson import iter_ndjson, ndjson_response, split_groups, wants_ndjson
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# キャリアの並列呼出し用（プロセスで共有し同時に呼び出すキャリア数を制限する）
+_executor = ThreadPoolExecutor(
+    max_workers=Config.SCATTER_GATHER_MAX_WORKERS, thread_name_prefix="scatter_gather"
+)
+
+_lock = threading.Lock()
+_stats = {"searches": 0, "ok": 0, "timeout": 0, "error": 0}
+
+
+class DeadlineExceeded(Exception):
+    """呼出しを始める前に期限を過ぎた"""
+
+
+def get_carriers():
+    """検索対象の全キャリアの(事業者ID, エンドポイント)のリスト"""
+    return [(cid, get_endpoint_from_cid(cid)) for cid in get_cids_by_role("carrier")]
+
+
+def deadline_of(cid):
+    """キャリア毎の期限(秒)（COMPANY_INFOSのdeadlineで個別に指定できる）"""
+    return COMPANY_INFOS.get(cid, {}).get("deadline", Config.SCATTER_GATHER_DEADLINE)
+
+
+def scatter(carriers, func):
+    """func(cid, endpoint, 残り時間(秒))を全キャリアについて並列に呼び出す
+
+    各キャリアの期限は呼出しを受け付けた時点から数え、同時に呼び出す数の上限で
+    待たされた時間も含む。期限までに返らなかったものは待たずにtimeoutとする。
+    戻り値はcarriersと同じ順番の(事業者ID, 状態, 結果)のリスト
+    （状態は ok / timeout / error、ok以外の結果はNone）
+    """
+    start = time.monotonic()
+    futures = [
+        (
+            cid,
+            _executor.submit(_run, func, cid, endpoint, start + deadline_of(cid)),
+        )
+        for cid, endpoint in carriers
+    ]
+    results = []
+    for cid, future in futures:
+        remaining = start + deadline_of(cid) - time.monotonic()
+        try:
+            results.append((cid, "ok", future.result(timeout=max(remaining, 0))))
+        except (FutureTimeoutError, DeadlineExceeded):
+            # 未着手の場合は取り消す（実行中の呼出しは期限で終わる）
+            future.cancel()
+            logger.warning(f"キャリアの検索が期限内に終わりませんでした: {cid}")
+            results.append((cid, "timeout", None))
+        except Exception as e:
+            logger.error(f"キャリアの検索に失敗しました: {cid} {e}", exc_info=True)
+            results.append((cid, "error", None))
+    with _lock:
+        _stats["searches"] += 1
+        for _, status, _ in results:
+            _stats[status] += 1
+    return results
+
+
+def _run(func, cid, endpoint, expires):
+    remaining = expires - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded(cid)
+    return func(cid, endpoint, remaining)
+
+
+def gather_list(url, params, list_key, item_key=None, sort_key=None, **kwargs):
+    """全キャリアのコネクタで一覧を検索し、結合した応答を返す
+
+    list_keyは応答の一覧のキー、item_keyは一覧が事業者毎の明細のリスト
+    ({item_key: [明細]}のリスト)の場合の明細のキー。
+    明細は重複を除いてsort_key(明細)の順に並べ（同じ場合はキャリアの順）、
+    o/nは結合後の明細に適用する。応答のcarriersにキャリア毎の状態を返し、
+    一部のキャリアが失敗・期限切れの場合も返ったキャリアの結果を返す。
+    """
+    if "cursor" in params:
+        raise ValueError("cursorは事業者(cid)を指定した検索でのみ利用できます。")
+    offset = int(params.get("o", 0))
+    num = int(params["n"]) if "n" in params else None
+    if offset < 0 or (num is not None and num < 0):
+        raise ValueError("o/nが不正です。")
+    carrier_params = {k: v for k, v in params.items() if k not in ("o", "n")}
+    if num is not None:
+        # 結合後に切り出すため各キャリアからは先頭からoffset+num件を取得する
+        carrier_params["n"] = offset + num
+
+    def search(cid, endpoint, remaining):
+        # リトライも含めてキャリアの期限内に終わらせる
+        response = http_client.get(
+            url,
+            params=carrier_params,
+            headers={"X-ENDPOINT": endpoint},
+            deadline=remaining,
+            **kwargs,
+        )
+        if response.status_code != 200:
+            raise ValueError(f"HTTP {response.status_code}")
+        return decode_json(response)
+
+    results = scatter(get_carriers(), search)
+    entries = []
+    seen = set()
+    total = 0
+    carriers = []
+    for cid, status, data in results:
+        items = []
+        if status == "ok":
+            groups = data.get(list_key) or []
+            if item_key is None:
+                items = [(None, item) for item in groups]
+            else:
+                items = [
+                    ((cid, index, group), item)
+                    for index, group in enumerate(groups)
+                    for item in group.get(item_key) or []
+                ]
+            total += data.get("total_num", len(items))
+        carriers.append({"cid": cid, "status": status, "num": len(items)})
+        for group, item in items:
+            key = dumps_json(item)
+            if key in seen:
+                total -= 1
+                continue
+            seen.add(key)
+            entries.append((group, item))
+    if sort_key is not None:
+        entries.sort(key=lambda entry: sort_key(entry[1]))
+    end = None if num is None else offset + num
+    entries = entries[offset:end]
+    merged = (
+        [item for _, item in entries]
+        if item_key is None
+        else _regroup(entries, item_key)
+    )
+    result = any(status == "ok" for _, status, _ in results)
+    ret = {
+        list_key: merged,
+        "total_num": max(total, 0),
+        "offset": offset,
+        "num": len(entries),
+        "next_cursor": None,
+        "carriers": carriers,
+        "result": result,
+        "error_msg": "" if result else "error",
+    }
+    status = 200 if result else 500
+    if wants_ndjson():
+        lines = merged if item_key is None else split_groups(merged, item_key)
+        envelope = {k: v for k, v in ret.items() if k != list_key}
+        return ndjson_response(iter_ndjson(lines, lambda: envelope), status)
+    etag = make_etag(ret)
+    if status == 200 and etag_matches(request_if_none_match(), etag):
+        return not_modified(etag)
+    return ret, status, {"ETag": etag} if status == 200 else {}
+
+
+def _regroup(entries, item_key):
+    # 同じ事業者の明細が続く場合は1つにまとめる
+    groups = []
+    last = None
+    for (cid, index, group), item in entries:
+        if last != (cid, index):
+            groups.append(group | {item_key: []})
+            last = (cid, index)
+        groups[-1][item_key].append(item)
+    return groups
+
+
+def get_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    stats["max_workers"] = Config.SCATTER_GATHER_MAX_WORKERS
+    stats["deadline"] = Config.SCATTER_GATHER_DEADLINE
+    return stats
@@ -16,11 +16,76 @@
 
 import sys
 import os
+import copy
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from urllib.parse import urljoin
-import requests
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from app.config import Config
+from com.http_client import http_client
+from com.codec import decode_json
+
+logger = logging.getLogger("app.flask")
+logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
+
+# MH管理APIの並列呼出し用（プロセスで共有し同時実行数を制限する）
+_executor = ThreadPoolExecutor(
+    max_workers=Config.MH_MNG_MAX_WORKERS, thread_name_prefix="mh_mng"
+)
+
+# 1つの輸送指示IDに紐づく計画一式
+# キー: (api, is_departure_mh, is_vanning)
+PLAN_SET_KEYS = {
+    "dep_devanning_plan": ("devanning_plan", 1, 0),
+    "dep_vanning_plan": ("vanning_plan", 1, 1),
+    "arv_devanning_plan": ("devanning_plan", 0, 0),
+    "arv_vanning_plan": ("vanning_plan", 0, 1),
+}
+
+# MH管理側に一括APIが無い場合のステータス（404は応答がAPIのJSONでない場合のみ）
+PLAN_SET_UNSUPPORTED_STATUS = (405, 501)
+
+# 一括APIが無いと判定した時刻（None:有る・未確認）
+# 無い場合はプロセス内で記憶し、MH_MNG_PLAN_SET_RETRY秒までは個別APIを使う
+_plan_set_unsupported_at = None
+
+
+def _use_plan_set():
+    if not Config.MH_MNG_USE_PLAN_SET:
+        return False
+    unsupported_at = _plan_set_unsupported_at
+    return (
+        unsupported_at is None
+        or time.monotonic() - unsupported_at >= Config.MH_MNG_PLAN_SET_RETRY
+    )
+
+
+def _plan_set_unsupported(response):
+    """一括APIの応答ではなく、個別APIで呼び出し直すか"""
+    global _plan_set_unsupported_at
+    if response.status_code in PLAN_SET_UNSUPPORTED_STATUS or (
+        response.status_code == 404 and not _is_api_response(response)
+    ):
+        if _plan_set_unsupported_at is None:
+            logger.info("MH管理の一括APIが利用できないため個別APIを使用します")
+        _plan_set_unsupported_at = time.monotonic()
+        return True
+    _plan_set_unsupported_at = None
+    if response.status_code == 404:
+        # 計画が見つからない等（一括APIは有るため記憶せず、この呼出しのみ個別APIを使う）
+        logger.debug("MH管理の一括APIが404を返したため個別APIを使用します")
+        return True
+    return False
+
+
+def _is_api_response(response):
+    # ルートが無い場合の404は本文が空かHTML
+    try:
+        return isinstance(decode_json(response), dict)
+    except ValueError:
+        return False
 
 
 class Vanning:
@@ -34,28 +99,54 @@ class Vanning:
             "trsp_instruction_id": trsp_instruction_id,
             "is_vanning": is_vanning,
         }
-        response = requests.get(url, params=params, verify=False)
-        response.encoding = response.apparent_encoding
-        data = response.json()
+        response = http_client.get(url, params=params, verify=False)
+        data = decode_json(response)
         plan = None
         if data["result"] is True:
             plan = data["plan"]
         return plan
 
+    def search_plans(self, trsp_instruction_id, conditions):
+        """計画を並列に検索する
+
+        conditionsは(is_departure_mh, is_vanning)のリスト。
+        戻り値はconditionsと同じ順番の計画のリスト（無い場合はNone）
+        """
+        futures = [
+            _executor.submit(
+                self.search_plan, is_departure_mh, trsp_instruction_id, is_vanning
+            )
+            for is_departure_mh, is_vanning in conditions
+        ]
+        return [future.result() for future in futures]
+
     def get_plan(self, api, mh, trsp_instruction_id):
+        plan, _ = self._get_plan(api, mh, trsp_instruction_id)
+        return plan
+
+    def get_plans(self, keys):
+        """計画を並列に取得する
+
+        keysは(api, mh, trsp_instruction_id)のリスト。
+        戻り値はkeysと同じ順番の(計画, 登録済みか)のリスト
+        """
+        futures = [_executor.submit(self._get_plan, *key) for key in keys]
+        return [future.result() for future in futures]
+
+    def _get_plan(self, api, mh, trsp_instruction_id):
         url = urljoin(
             Config.MH_MNG_ENDPOINT,
             f"{api}/{mh}/{trsp_instruction_id}",
         )
-        response = requests.get(url, verify=False)
-        response.encoding = response.apparent_encoding
-        data = response.json()
+        response = http_client.get(url, verify=False)
+        data = decode_json(response)
         plan = None
         if data["result"] is True:
             if api == "devanning_plan":
                 plan = data["devanning_plan"]
             elif api == "vanning_plan":
                 plan = data["vanning_plan"]
+        found = plan is not None
         if plan is None:
             plan = {
                 "mh": mh,
@@ -72,28 +163,175 @@ class Vanning:
                 "is_bl_need": 0,
                 "is_departure_mh": 0,
             }
-        return plan
+        return plan, found
 
     def save_plan(self, api, mh, trsp_instruction_id, plan):
         url = urljoin(
             Config.MH_MNG_ENDPOINT,
             f"{api}/{mh}/{trsp_instruction_id}",
         )
-        response = requests.post(url, verify=False, json=plan)
+        response = http_client.post(url, verify=False, json=plan)
         if response.status_code != 200:
             raise ValueError(f"{api}/{mh}/{trsp_instruction_id} 更新エラー")
-        response.encoding = response.apparent_encoding
-        data = response.json()
+        data = decode_json(response)
         if data["result"] is False:
             raise ValueError(f"{api}/{mh}/{trsp_instruction_id} 更新失敗")
         return data
 
+    def save_plans(self, saves, originals=None):
+        """計画を並列に保存する
+
+        savesは(api, mh, trsp_instruction_id, plan)のリスト。
+        originalsにはsavesと同じ順番で更新前の計画（未登録の場合はNone）を渡す。
+        1件でも保存に失敗した場合は、保存できた計画をoriginalsの内容に戻して
+        （未登録だったものは削除して）から最初のエラーを送出する。
+        originalsを渡さない場合は戻さない。
+        """
+        futures = [_executor.submit(self.save_plan, *save) for save in saves]
+        wait(futures)
+        errors = [future.exception() for future in futures]
+        failed = [error for error in errors if error is not None]
+        if len(failed) == 0:
+            return [future.result() for future in futures]
+        if originals is not None:
+            self._restore_plans(
+                [
+                    (save, original)
+                    for save, original, error in zip(saves, originals, errors)
+                    if error is None
+                ]
+            )
+        raise failed[0]
+
+    def _restore_plans(self, targets):
+        # 補償処理：保存済みの計画を元に戻す（失敗はログのみ）
+        futures = []
+        for (api, mh, trsp_instruction_id, _), original in targets:
+            if original is None:
+                futures.append(
+                    _executor.submit(self.delete_plan, api, mh, trsp_instruction_id)
+                )
+            else:
+                futures.append(
+                    _executor.submit(
+                        self.save_plan, api, mh, trsp_instruction_id, original
+                    )
+                )
+        for ((api, mh, trsp_instruction_id, _), _), future in zip(targets, futures):
+            try:
+                if future.result() is False:
+                    raise ValueError("削除エラー")
+            except Exception as e:
+                logger.error(
+                    f"{api}/{mh}/{trsp_instruction_id} 計画の復元に失敗: {e}"
+                )
+
+    def snapshot_plans(self, plans, found_list=None):
+        """補償処理用に更新前の計画を複製する"""
+        if found_list is None:
+            found_list = [True] * len(plans)
+        return [
+            copy.deepcopy(plan) if found else None
+            for plan, found in zip(plans, found_list)
+        ]
+
+    def get_plan_set(self, trsp_instruction_id):
+        """輸送指示IDの計画一式（発着MHのバンニング・デバンニング計画）を取得する"""
+        return self.get_plan_sets([trsp_instruction_id])[trsp_instruction_id]
+
+    def get_plan_sets(self, trsp_instruction_ids):
+        """複数の輸送指示IDの計画一式を1回の呼出しで取得する
+
+        戻り値は{trsp_instruction_id: {PLAN_SET_KEYSのキー: 計画（無い場合はNone）}}
+        MH管理側に一括APIが無い場合は個別APIを並列に呼び出す。
+        """
+        trsp_instruction_ids = list(trsp_instruction_ids)
+        if _use_plan_set():
+            url = urljoin(Config.MH_MNG_ENDPOINT, "plan_set/search")
+            response = http_client.post(
+                url,
+                verify=False,
+                json={"trsp_instruction_id_list": trsp_instruction_ids},
+            )
+            if not _plan_set_unsupported(response):
+                if response.status_code != 200:
+                    raise ValueError("plan_set 取得エラー")
+                data = decode_json(response)
+                if data["result"] is False:
+                    raise ValueError("plan_set 取得失敗")
+                plan_sets = data["plan_sets"]
+                return {
+                    trsp_instruction_id: {
+                        key: plan_sets.get(trsp_instruction_id, {}).get(key)
+                        for key in PLAN_SET_KEYS
+                    }
+                    for trsp_instruction_id in trsp_instruction_ids
+                }
+        # 個別APIを並列に呼び出す
+        futures = {
+            trsp_instruction_id: [
+                _executor.submit(
+                    self.search_plan, is_departure_mh, trsp_instruction_id, is_vanning
+                )
+                for _, is_departure_mh, is_vanning in PLAN_SET_KEYS.values()
+            ]
+            for trsp_instruction_id in trsp_instruction_ids
+        }
+        return {
+            trsp_instruction_id: dict(
+                zip(PLAN_SET_KEYS, [future.result() for future in plan_futures])
+            )
+            for trsp_instruction_id, plan_futures in futures.items()
+        }
+
+    def save_plan_set(self, trsp_instruction_id, plan_set, original=None):
+        """輸送指示IDの計画一式を保存する（plan_setに含まれる計画のみ）"""
+        return self.save_plan_sets(
+            {trsp_instruction_id: plan_set},
+            None if original is None else {trsp_instruction_id: original},
+        )
+
+    def save_plan_sets(self, plan_sets, originals=None):
+        """複数の輸送指示IDの計画一式を1回の呼出しで保存する
+
+        plan_setsは{trsp_instruction_id: {PLAN_SET_KEYSのキー: 計画}}。
+        一括APIではMH管理側で一式まとめて更新される。
+        個別APIで保存する場合はsave_plansと同様に、失敗時はoriginals
+        （plan_setsと同じ形式、未登録の計画はNone）の内容に戻す。
+        """
+        if _use_plan_set():
+            url = urljoin(Config.MH_MNG_ENDPOINT, "plan_set")
+            response = http_client.post(
+                url, verify=False, json={"plan_sets": plan_sets}
+            )
+            if not _plan_set_unsupported(response):
+                if response.status_code != 200:
+                    raise ValueError("plan_set 更新エラー")
+                data = decode_json(response)
+                if data["result"] is False:
+                    raise ValueError("plan_set 更新失敗")
+                return data
+        # 個別APIを並列に呼び出す
+        saves = []
+        save_originals = []
+        for trsp_instruction_id, plan_set in plan_sets.items():
+            for key, plan in plan_set.items():
+                api = PLAN_SET_KEYS[key][0]
+                saves.append((api, plan["mh"], trsp_instruction_id, plan))
+                if originals is not None:
+                    save_originals.append(
+                        originals.get(trsp_instruction_id, {}).get(key)
+                    )
+        return self.save_plans(
+            saves, save_originals if originals is not None else None
+        )
+
     def delete_plan(self, api, mh, trsp_instruction_id):
         url = urljoin(
             Config.MH_MNG_ENDPOINT,
             f"{api}/{mh}/{trsp_instruction_id}",
         )
-        response = requests.delete(url, verify=False)
+        response = http_client.delete(url, verify=False)
         if response.status_code != 200:
             return False
         else:
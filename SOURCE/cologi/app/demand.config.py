@@ -36,8 +36,80 @@ class Config:
     BACKEND_ENDPOINT = "https://XXXXXXXXXX/api/v1/" # supply
     LOGFILE_NAME = "/log/debug.log"
     CONNECTOR_PRIVATE_ENDPOINT = "https://co_logi_connector/private/api/"
+    # 同一ホストに配置した場合のコネクタのソケット（無い場合や None の場合は上記を使う）
+    CONNECTOR_PRIVATE_SOCKET = "/sock/connector.sock"
+    CONNECTOR_PRIVATE_SOCKET_ENDPOINT = "http://co_logi_connector.sock/private/api/"
+    CONNECTOR_PRIVATE_SOCKET_RETRY = 30  # ソケットに接続できなかった場合にHTTPSで呼び出す秒数
     MH_MNG_ENDPOINT = "http://XXXXXXXXXXX/mhapi/v1/"
     TRUST_MNG_ENDPOINT = "http://XXXXXXXXXXXXX/api/"
 
+    # 外部API呼出し用のコネクションプール
+    HTTP_POOL_CONNECTIONS = 10  # プールを保持するホスト数
+    HTTP_POOL_MAXSIZE = 100  # ホスト毎の最大コネクション数(uwsgiのthreadsに合わせる)
+    HTTP_POOL_BLOCK = False  # プールが枯渇した場合に空きを待つか
+    # /statsを参照できる呼出し元のアドレス
+    STATS_ALLOWED_ADDRS = ["127.0.0.1", "::1"]
+    # MH管理APIの並列呼出し数
+    MH_MNG_MAX_WORKERS = 8
+    # MH管理の一括API(plan_set)を使うか（無い場合は自動で個別APIに切り替える）
+    MH_MNG_USE_PLAN_SET = True
+    MH_MNG_PLAN_SET_RETRY = 600  # 一括APIが無いと判定した後に再び確認するまでの秒数
+
+    # 外部API呼出しのタイムアウト(接続, 読込み)と1回の呼出しの期限(リトライ含む)(秒)
+    HTTP_POLICIES = {
+        "default": {"timeout": (3.05, 30), "deadline": 40},
+        "connector": {"timeout": (3.05, 60), "deadline": 90},  # コネクタの先の呼出しを含む
+        "mh_mng": {"timeout": (3.05, 10), "deadline": 20},
+        "trust": {"timeout": (3.05, 30), "deadline": 40},
+        "backend": {"timeout": (3.05, 30), "deadline": 40},
+    }
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # 連続で失敗したら呼出しを止める回数
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT = 30  # 止めてから呼出しを試行するまでの秒数
+    HTTP_GET_RETRIES = 2  # GETのリトライ回数
+    HTTP_RETRY_BACKOFF = 0.2  # リトライ間隔(秒、リトライ毎に倍にする)
+
+    # 同じ検索の同時呼出しを1回にまとめる(single flight)
+    SINGLE_FLIGHT_REDIS_URL = None  # 設定するとプロセス間でもまとめる 例:"redis://redis:6379/2"
+    SINGLE_FLIGHT_LOCK_TIMEOUT = 60  # 他のプロセスの結果を待つ最大秒数
+    SINGLE_FLIGHT_RESULT_TTL = 5  # 他のプロセスに渡す結果の保持秒数
+    SINGLE_FLIGHT_POLL_INTERVAL = 0.05  # 他のプロセスの結果を確認する間隔(秒)
+
+    # コネクタの応答を中継する際に本文をデコードせずに外側の項目だけを組み替える
+    WEB_API_PASSTHROUGH = True
+
+    # cidを指定しない一覧検索で全キャリアのコネクタを並列に検索する
+    SCATTER_GATHER_MAX_WORKERS = 8  # 同時に呼び出すキャリア数の上限（プロセス全体）
+    SCATTER_GATHER_DEADLINE = 10  # キャリア毎の期限(秒)（COMPANY_INFOSのdeadlineで個別に指定可）
+
+    # 事業者情報(COMPANY_INFOS)をDBのcid_mappingから読み込む
+    COMPANY_REGISTRY_DB = True  # Falseの場合はcom/company_info.pyの初期値を使う
+    COMPANY_REGISTRY_TTL = 300  # 読み込んだ事業者情報を使う最大秒数
+    # 変更を全プロセスにすぐ反映するためのRedis(pub/sub)。Noneの場合はTTLまで反映されない
+    COMPANY_REGISTRY_REDIS_URL = "redis://redis:6379"
+
+    # B/Lファイル(EBL_DIR)の読み込み結果を保持する件数(LRU)。ファイルが変わったら読み直す
+    EBL_CACHE_SIZE = 1024
+
+    # 保存したB/Lを索引付きのeblテーブルにも反映し、事業者や作成日時で検索できるようにする
+    # テーブルは flask ebl-store init で作成し、既存のB/Lファイルは flask ebl-store import で反映する
+    EBL_DB_STORE = True
+
+    # B/Lの変更(bl/register, bl/approve, bl/transfer, bl/used)を追記専用の履歴(ジャーナル)に残す
+    EBL_JOURNAL_ENABLED = True
+    EBL_JOURNAL_DIR = None  # Noneの場合はEBL_DIR/journal（コアとコネクタで共有する）
+    EBL_JOURNAL_SEGMENT_SIZE = 64 * 1024 * 1024  # セグメントファイルの最大サイズ(バイト)
+    EBL_JOURNAL_FSYNC_DELAY = 0.002  # 同時の追記をまとめてfsyncするために待つ秒数
+    EBL_JOURNAL_COMPACT_SEGMENTS = 16  # セグメント数が超えたら圧縮する。Noneの場合は flask ebl-journal compact のみ
+    EBL_JOURNAL_RETENTION_DAYS = 365  # 使用済みのB/Lの履歴を圧縮で削除するまでの日数
+
+    # B/Lゲートチェック(bl_check)のトラスト基盤の呼出し
+    EBL_TRUST_MAX_WORKERS = 8  # 同時に呼び出す数の上限（プロセス全体）
+    EBL_TRUST_CACHE_SIZE = 4096  # 電子署名・B/Lの検証結果を保持する数
+    EBL_TRUST_DETAIL_TTL = 3  # bl/detail(所有者・使用済み)の結果を使う秒数。0の場合は保持しない
+
+    # B/Lの一括チェック・一括取得(bl_check/batch, batch_search)
+    EBL_BATCH_MAX_WORKERS = 8  # 同時に処理する件数の上限（プロセス全体）
+    EBL_BATCH_MAX_ITEMS = 50  # 1回に指定できる件数
+
 
 ConfigIns = Config()
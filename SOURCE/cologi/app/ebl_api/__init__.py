@@ -19,6 +19,7 @@ from flask_restx import Api
 import os
 import logging
 from app.config import ConfigIns
+from com.codec import output_json
 
 
 ebl_api_blueprint = Blueprint("ebl_api", __name__)
@@ -30,6 +31,7 @@ ebl_api = Api(
     description="EBL APIs with multiple resources for scheduling cargo",
     doc="/swagger/",
 )
+ebl_api.representation("application/json")(output_json)
 
 from .ebill_api import ebill_api_ns
 
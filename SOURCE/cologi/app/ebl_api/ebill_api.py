@@ -18,25 +18,77 @@ from flask_restx import Namespace, Resource, fields
 import sys
 import os
 import logging
-import json
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from flask import request
-import requests
-from urllib.parse import urljoin
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from com.helper import create_restx_model_usingSchema, create_response_model
-from model.ebl_model import EblJson
+from model.ebl_model import EblJson, EBLSchema
 from com.company_info import (
     get_recipient_tractor,
     get_address_from_cid,
 )
 from app.config import Config
+from com.ebl_repository import ebl_repository, version_of
+from com.ebl_store import ebl_store
+from com.ebl_journal import ebl_journal
+from com.ebl_trust import ebl_trust
 
 logger = logging.getLogger("app.flask")
 logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG")])
 
+# 一括チェック・一括取得の並列処理用（プロセスで共有し同時に処理する件数を制限する）
+# トラスト基盤の呼出しはebl_trustの中で別に制限する（同じプールで待ち合わせない）
+_executor = ThreadPoolExecutor(
+    max_workers=Config.EBL_BATCH_MAX_WORKERS, thread_name_prefix="ebl_batch"
+)
+
 ebill_api_ns = Namespace("/ebl/v1", description="EBL 関連API")
 parser = ebill_api_ns.parser()
+list_parser = ebill_api_ns.parser()
+list_parser.add_argument(
+    "cid",
+    type=str,
+    help="事業者ID（発行者・荷受け人・現在の所有者のいずれか）",
+    required=False,
+    location="args",
+)
+list_parser.add_argument(
+    "bl_cid", type=str, help="B/L発行者の事業者ID", required=False, location="args"
+)
+list_parser.add_argument(
+    "recipient_cid",
+    type=str,
+    help="荷受け人の事業者ID",
+    required=False,
+    location="args",
+)
+list_parser.add_argument(
+    "current_owner",
+    type=str,
+    help="B/Lの現在の所有者の事業者ID",
+    required=False,
+    location="args",
+)
+list_parser.add_argument(
+    "created_from",
+    type=str,
+    help="作成日(から) YYYYMMDD",
+    required=False,
+    location="args",
+)
+list_parser.add_argument(
+    "created_to",
+    type=str,
+    help="作成日(まで) YYYYMMDD",
+    required=False,
+    location="args",
+)
+list_parser.add_argument(
+    "o", type=int, help="オフセット", default=0, required=False, location="args"
+)
+list_parser.add_argument("n", type=int, help="取得数", required=False, location="args")
 
 
 @ebill_api_ns.route("/<string:trsp_instruction_id>/<string:tractor_giai>")
@@ -47,12 +99,13 @@ class EBillSearchApi(Resource):
     @ebill_api_ns.response(400, "HTTP400エラー")
     @ebill_api_ns.response(500, "HTTP500エラー")
     def get(self, trsp_instruction_id, tractor_giai):
+        return self.search(trsp_instruction_id, tractor_giai)
+
+    @staticmethod
+    def search(trsp_instruction_id, tractor_giai):
         try:
-            file_path = os.path.join(
-                os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-            )
             ebl = EblJson()
-            bl_id = int(ebl.load_file(file_path))
+            bl_id = int(ebl.load(trsp_instruction_id))
             if bl_id == -1:
                 raise ValueError(
                     f"trsp_instruction_id:{trsp_instruction_id}のB/Lは発行されてません"
@@ -102,6 +155,10 @@ class EBillCheckApi(Resource):
     @ebill_api_ns.response(400, "HTTP400エラー")
     @ebill_api_ns.response(500, "HTTP500エラー")
     def post(self):
+        return self.check(request.get_json(force=True, silent=True))
+
+    @staticmethod
+    def check(data):
         try:
             file_path = os.path.join(os.environ.get("EBL_DIR"), "EBL_NO_CHECK")
             is_ebl_no_check = os.path.isfile(file_path)
@@ -111,7 +168,6 @@ class EBillCheckApi(Resource):
             else:
                 logger.debug("******* EBL CHECK *******")
             # B/L チェックを行う
-            data = request.get_json(force=True)
             logger.debug(f"B/Lトラストチェック data={data}")
             if "recipient_cid" in data:
                 recipient_cid = data["recipient_cid"]
@@ -139,86 +195,21 @@ class EBillCheckApi(Resource):
                 raise ValueError("bl missing")
             ebl = EblJson()
             ebl.load_json(bl)
-            file_path = os.path.join(
-                os.environ.get("EBL_DIR"), f"{trsp_instruction_id}.json"
-            )
-            if os.path.isfile(file_path) is False:
-                raise ValueError(f"B/L {file_path}が見つかりません")
-            with open(file_path, "r", encoding="utf-8") as f:
-                bl_file = json.load(f)
+            bl_file = ebl_repository.load(trsp_instruction_id)
+            if bl_file is None:
+                raise ValueError(
+                    f"B/L {ebl_repository.path(trsp_instruction_id)}が見つかりません"
+                )
             logger.debug(f"B/L 現在の所有者: {bl_file['current_owner']}/ チェックする所有者: {recipient_cid}")
             if tractor_giai != ebl.get_recipient_tractor():
                 raise ValueError(f"トラクターのGIAIが一致してない ebl: {ebl.get_recipient_tractor()}")
-            # 電子署名
-            url = urljoin(
-                Config.TRUST_MNG_ENDPOINT,
-                "sign/verify",
-            )
-            data = {
-                "cid": recipient_cid,
-                "signature": bl,
-            }
             logger.debug(f"bl_no      : {bl_no}")
-            logger.debug(f"電子署名検証： {url}")
-            logger.debug(f"           ： {data}")
-            response = requests.post(
-                url,
-                json=data,
-                verify=False,
-            )
-            if response.status_code != 200:
-                logger.debug(response)
-                raise ValueError("電子署名検証失敗")
-            response.encoding = response.apparent_encoding
-            data = response.json()
-            logger.debug(f"電子署名 response:{data}")
-            if data["status"] != "success" or data["isValid"] is False:
-                logger.debug(f"電子署名検証エラー:{data}")
-                return {"result": False, "err_msg": "SIGN_ERROR"}, 200
-            # B/L 検証
-            url = urljoin(
-                Config.TRUST_MNG_ENDPOINT,
-                "bl/verify",
-            )
-            data = {
-                "cid": bl_cid,
-                "bl_id": int(bl_no),
-                "signed_bl": bl,
-            }
-            logger.debug(f"B/L 情報検証： {url}")
-            logger.debug(f"           ： {data}")
-            response = requests.post(
-                url,
-                json=data,
-                verify=False,
-            )
-            if response.status_code != 200:
-                logger.debug(response)
-                raise ValueError("B/L 情報検証失敗")
-            response.encoding = response.apparent_encoding
-            data = response.json()
-            logger.debug(f"B/L 情報検証 response:{data}")
-            if data["status"] != "success" or data["result"] is False:
-                logger.debug(f"B/L 情報検証エラー:{data}")
-                return {"result": False, "err_msg": "INVALID_BL"}, 200
-            # B/L 詳細
-            url = urljoin(
-                Config.TRUST_MNG_ENDPOINT,
-                "bl/detail",
-            )
-            logger.debug(f"B/L 情報詳細： {url}")
-            logger.debug(f"           ： bl_id = {bl_no}")
-            response = requests.get(
-                url,
-                params={"bl_id": int(bl_no)},
-                verify=False,
-            )
-            if response.status_code != 200:
-                logger.debug(response)
-                raise ValueError("B/L 情報詳細失敗")
-            response.encoding = response.apparent_encoding
-            data = response.json()
-            logger.debug(f"B/L 情報詳細： {data}")
+            # 電子署名とB/Lの検証（並列に呼び出し、同じB/Lの結果は保持したものを使う）
+            err_msg = ebl_trust.verify(recipient_cid, bl_cid, bl_no, bl)
+            if err_msg is not None:
+                return {"result": False, "err_msg": err_msg}, 200
+            # B/L 詳細（所有者・使用済みは変わるため短時間だけ保持したものを使う）
+            data = ebl_trust.detail(bl_no, version_of(bl_file))
             owner = data["owner"]
             recipient_address = get_address_from_cid(recipient_cid)
             if recipient_address != owner:
@@ -241,3 +232,203 @@ class EBillCheckApi(Resource):
         except Exception as e:
             logger.error(e, exc_info=True, stack_info=True)
             return {"result": False, "err_msg": "PARAM_ERROR"}, 400
+
+
+@ebill_api_ns.route("/bl_check/batch")
+class EBillCheckBatchApi(Resource):
+
+    @ebill_api_ns.doc(
+        description=(
+            "B/Lトラスト一括チェックAPI<br/>"
+            "- MH（バーコードアプリ）用のAPI<br/>"
+            "- items(B/LトラストチェックAPIと同じ項目のリスト)を並列にチェックし、"
+            "同じ順番で結果を返す"
+        )
+    )
+    @ebill_api_ns.response(200, "Success")
+    @ebill_api_ns.response(400, "HTTP400エラー")
+    @ebill_api_ns.response(500, "HTTP500エラー")
+    def post(self):
+        try:
+            items = _batch_items(request.get_json(force=True, silent=True))
+            logger.debug(f"B/Lトラスト一括チェック {len(items)}件")
+            results = []
+            for item, (ret, status) in zip(
+                items, _run_batch(EBillCheckApi.check, [(item,) for item in items])
+            ):
+                results.append(
+                    {
+                        "trsp_instruction_id": item.get("trsp_instruction_id", ""),
+                        "tractor_giai": item.get("tractor_giai", ""),
+                        "status": status,
+                        **ret,
+                    }
+                )
+            return {"results": results, "result": True, "err_msg": ""}, 200
+        except ValueError as e:
+            logger.error(e, exc_info=True, stack_info=True)
+            return {"results": [], "result": False, "err_msg": "PARAM_ERROR"}, 400
+
+
+@ebill_api_ns.route("/batch_search")
+class EBillSearchBatchApi(Resource):
+
+    @ebill_api_ns.doc(
+        description=(
+            "B/L一括取得API<br/>"
+            "- MH（バーコードアプリ）用のAPI<br/>"
+            "- items(trsp_instruction_id, tractor_giaiのリスト)のB/Lを並列に取得し、"
+            "同じ順番で結果を返す"
+        )
+    )
+    @ebill_api_ns.response(200, "Success")
+    @ebill_api_ns.response(400, "HTTP400エラー")
+    @ebill_api_ns.response(500, "HTTP500エラー")
+    def post(self):
+        try:
+            items = _batch_items(request.get_json(force=True, silent=True))
+            logger.debug(f"B/L一括取得 {len(items)}件")
+            args = [
+                (item.get("trsp_instruction_id", ""), item.get("tractor_giai", ""))
+                for item in items
+            ]
+            results = [
+                {"status": status, **ret}
+                for ret, status in _run_batch(EBillSearchApi.search, args)
+            ]
+            return {"results": results, "result": True, "err_msg": ""}, 200
+        except ValueError as e:
+            logger.error(e, exc_info=True, stack_info=True)
+            return {"results": [], "result": False, "err_msg": str(e)}, 400
+
+
+@ebill_api_ns.route("/list")
+class EBillListApi(Resource):
+    ebl_data_model = create_restx_model_usingSchema(
+        "EblDataModel",
+        ebill_api_ns,
+        EBLSchema,
+        exclude_fields=["trailer_giai_list"],
+    )
+    get_list_response_model = create_response_model(
+        "EblListResponseModel",
+        ebill_api_ns,
+        "ebl_list",
+        ebl_data_model,
+        list_type=True,
+    )
+
+    @ebill_api_ns.doc(
+        description=(
+            "B/L検索API<br/>"
+            "- eblテーブル(EBL_DB_STORE)から事業者・作成日で検索する<br/>"
+            "- 作成日時の新しい順に返す"
+        )
+    )
+    @ebill_api_ns.expect(list_parser)
+    @ebill_api_ns.response(200, "Success", get_list_response_model)
+    @ebill_api_ns.response(400, "HTTP400エラー")
+    @ebill_api_ns.response(500, "HTTP500エラー")
+    def get(self):
+        try:
+            args = list_parser.parse_args()
+            logger.debug(f"B/L検索 args={args}")
+            offset = args["o"] or 0
+            total_num, ebl_list = ebl_store.search(
+                cid=args["cid"],
+                bl_cid=args["bl_cid"],
+                recipient_cid=args["recipient_cid"],
+                current_owner=args["current_owner"],
+                created_from=_to_date(args["created_from"]),
+                created_to=_to_date(args["created_to"]),
+                offset=offset,
+                num=args["n"],
+            )
+            ret = {
+                "ebl_list": EBLSchema(many=True).dump(ebl_list),
+                "total_num": total_num,
+                "offset": offset,
+                "num": len(ebl_list),
+                "next_cursor": None,
+                "result": True,
+                "error_msg": "",
+            }
+            status = 200
+        except ValueError as e:
+            logger.error(e, exc_info=True, stack_info=True)
+            ret = {
+                "ebl_list": [],
+                "total_num": 0,
+                "offset": 0,
+                "num": 0,
+                "result": False,
+                "error_msg": str(e.args[0]),
+            }
+            status = 400
+        except Exception as e:
+            logger.error(e, exc_info=True, stack_info=True)
+            ret = {
+                "ebl_list": [],
+                "total_num": 0,
+                "offset": 0,
+                "num": 0,
+                "result": False,
+                "error_msg": "error",
+            }
+            status = 500
+        logger.debug(f"B/L検索 End status ={status} ")
+        return ret, status
+
+
+@ebill_api_ns.route("/history/<string:trsp_instruction_id>")
+@ebill_api_ns.param("trsp_instruction_id", "運送依頼番号")
+class EBillHistoryApi(Resource):
+
+    @ebill_api_ns.doc(
+        description=(
+            "B/L履歴取得API<br/>"
+            "- B/Lの発行・受領・移転・使用済みの履歴を新しい順に返す"
+            "(EBL_JOURNAL_ENABLED)"
+        )
+    )
+    @ebill_api_ns.response(200, "Success")
+    @ebill_api_ns.response(500, "HTTP500エラー")
+    def get(self, trsp_instruction_id):
+        try:
+            history = [
+                {key: value for key, value in record.items() if key != "signed_bl"}
+                for record in ebl_journal.history(trsp_instruction_id)
+            ]
+            ret = {"history": history, "result": True, "err_msg": ""}
+            status = 200
+        except Exception as e:
+            logger.error(e, exc_info=True, stack_info=True)
+            ret = {"history": [], "result": False, "err_msg": "error"}
+            status = 500
+        return ret, status
+
+
+def _batch_items(data):
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or len(items) == 0:
+        raise ValueError("itemsがありません")
+    if len(items) > Config.EBL_BATCH_MAX_ITEMS:
+        raise ValueError(f"itemsは{Config.EBL_BATCH_MAX_ITEMS}件までです")
+    if not all(isinstance(item, dict) for item in items):
+        raise ValueError("itemsが不正です")
+    return items
+
+
+def _run_batch(func, args_list):
+    # 各項目はfuncの中でエラーを(結果, ステータス)にするため、ここでは例外にならない
+    futures = [_executor.submit(func, *args) for args in args_list]
+    return [future.result() for future in futures]
+
+
+def _to_date(value):
+    if value is None or value == "":
+        return None
+    try:
+        return datetime.strptime(value, "%Y%m%d").date()
+    except ValueError:
+        raise ValueError(f"日付(YYYYMMDD)が不正です: {value}")
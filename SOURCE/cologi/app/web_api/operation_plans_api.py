@@ -18,7 +18,6 @@ from flask_restx import Namespace, Resource, fields
 import sys
 import os
 from flask import request
-import requests
 from urllib.parse import urljoin
 import logging
 import json
@@ -38,7 +37,6 @@ from model.model_3012_operation.trsp_plan_line_item_model import TrspPlanLineIte
 from model.model_3012_operation.trsp_plan_model import TrspPlanSchema
 from model.model_3012_operation.msg_info_model import MsgInfoSchema
 from model.ebl_model import EblJson
-from app.config import Config
 from com.company_info import (
     get_endpoint_from_cid,
     get_address_from_cid,
@@ -46,6 +44,9 @@ from com.company_info import (
     COMPANY_INFOS,
 )
 from com.vanning import Vanning
+from com.http_client import http_client
+from com.connector import get_connector_endpoint
+from com.codec import decode_json
 
 
 operation_plans_api_ns = Namespace("/webapi/v1/operation_plans", description="運行計画")
@@ -77,20 +78,20 @@ def update_devanning_vanning_plan(
 ):
     # 前の情報があれば取得、無ければ初期データ取得
     vanning = Vanning()
-    ## 出発MH
-    dep_devanning_plan = vanning.get_plan(
-        "devanning_plan", departure_mh, trsp_instruction_id
-    )
-    dep_vanning_plan = vanning.get_plan(
-        "vanning_plan", departure_mh, trsp_instruction_id
-    )
-    ## 到着MH
-    arv_devanning_plan = vanning.get_plan(
-        "devanning_plan", arrival_mh, trsp_instruction_id
-    )
-    arv_vanning_plan = vanning.get_plan(
-        "vanning_plan", arrival_mh, trsp_instruction_id
-    )
+    # 4つの計画は独立しているので並列に取得する
+    keys = [
+        ## 出発MH
+        ("devanning_plan", departure_mh, trsp_instruction_id),
+        ("vanning_plan", departure_mh, trsp_instruction_id),
+        ## 到着MH
+        ("devanning_plan", arrival_mh, trsp_instruction_id),
+        ("vanning_plan", arrival_mh, trsp_instruction_id),
+    ]
+    results = vanning.get_plans(keys)
+    plans = [plan for plan, _ in results]
+    # 保存失敗時に元に戻すための更新前データ（未登録のものはNone）
+    originals = vanning.snapshot_plans(plans, [found for _, found in results])
+    dep_devanning_plan, dep_vanning_plan, arv_devanning_plan, arv_vanning_plan = plans
     # 必要なデータの更新
     ## 出発MH
     ### 時間の算出
@@ -151,20 +152,13 @@ def update_devanning_vanning_plan(
         "%Y-%m-%dT%H:%M:%S"
     )
     arv_devanning_plan["tractor_giai"] = tractor_giai
-    # 更新したデータを保存
-    ## 出発MH
-    vanning.save_plan(
-        "devanning_plan", departure_mh, trsp_instruction_id, dep_devanning_plan
-    )
-    vanning.save_plan(
-        "vanning_plan", departure_mh, trsp_instruction_id, dep_vanning_plan
-    )
-    ## 到着MH
-    vanning.save_plan(
-        "devanning_plan", arrival_mh, trsp_instruction_id, arv_devanning_plan
-    )
-    vanning.save_plan(
-        "vanning_plan", arrival_mh, trsp_instruction_id, arv_vanning_plan
+    # 更新したデータを並列に保存（失敗時は保存済みのものを元に戻す）
+    vanning.save_plans(
+        [
+            (api, mh, trsp_instruction_id, plan)
+            for (api, mh, _), plan in zip(keys, plans)
+        ],
+        originals,
     )
 
 
@@ -515,14 +509,14 @@ class OperationPlanNotifyApi(Resource):
         logger.debug(f"API-043 運行実施確認通知 data:{data}")
         if cid is not None:
             url = urljoin(
-                Config.CONNECTOR_PRIVATE_ENDPOINT,
+                get_connector_endpoint(),
                 f"operation_plans/{operation_id}/notify",
             )
             endpoint = get_endpoint_from_cid(cid)
             logger.debug(f"API-043 運行実施確認通知 CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
             try:
-                response = requests.post(
+                response = http_client.post(
                     url,
                     json=data,
                     params=query_params,
@@ -533,8 +527,7 @@ class OperationPlanNotifyApi(Resource):
                 logger.debug(f"API-043 運行実施確認通知 Response Code: {response.status_code}")
                 if response.status_code != 200:
                     raise ValueError("BACKEND ERROR")
-                response.encoding = response.apparent_encoding
-                operation_plan_data = response.json()
+                operation_plan_data = decode_json(response)
                 ret = {
                     "result": True,
                     "error_msg": "",
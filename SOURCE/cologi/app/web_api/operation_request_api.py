@@ -18,7 +18,6 @@ from flask_restx import Namespace, Resource, fields
 import sys
 import os
 from flask import request
-import requests
 from urllib.parse import urljoin
 import json
 import logging
@@ -32,12 +31,30 @@ from com.helper import (
     create_restx_model_usingSchema,
     create_response_model,
     create_query_parser,
+    page_fields,
+    PAGE_FIELDS,
 )
 from model.operation_request_model import OperationRequestSchema
 from model.model_3012_operation.trsp_plan_line_item_model import TrspPlanLineItemSchema
-from app.config import Config
-from com.company_info import COMPANY_INFOS, get_endpoint_from_cid
+from com.company_info import (
+    COMPANY_INFOS,
+    get_cids_by_role,
+    get_endpoint_from_cid,
+)
 from com.vanning import Vanning
+from com.http_client import http_client
+from com.connector import get_connector_endpoint
+from com.single_flight import flight_key, get_single_flight
+from com.etag import (
+    conditional_headers,
+    etag_headers,
+    not_modified,
+    request_if_none_match,
+)
+from com.codec import decode_json
+from com.passthrough import passthrough_response
+from com.ndjson import stream_list, wants_ndjson
+from com.scatter_gather import gather_list, get_carriers
 
 
 operation_request_api_ns = Namespace(
@@ -52,6 +69,13 @@ parser.add_argument(
 parser.add_argument(
     "n", type=int, help="取得数", default=100, required=False, location="args"
 )
+parser.add_argument(
+    "cursor",
+    type=str,
+    help="次のページのカーソル(応答のnext_cursor)",
+    required=False,
+    location="args",
+)
 id_parser = operation_request_api_ns.parser()
 id_parser.add_argument(
     "cid", type=str, help="事業者ID", required=False, location="args"
@@ -60,6 +84,15 @@ id_parser.add_argument(
 query_parser = create_query_parser(operation_request_api_ns)
 
 
+def service_start(item):
+    # 複数キャリアの明細は便の運行開始日時の順に並べる
+    trsp_srvc = item.get("trsp_srvc") or {}
+    return (
+        trsp_srvc.get("service_strt_date") or "",
+        trsp_srvc.get("service_strt_time") or "",
+    )
+
+
 @operation_request_api_ns.route("/")
 class OperationRequestListApi(Resource):
     get_list_data_model = create_restx_model_usingSchema(
@@ -86,7 +119,14 @@ class OperationRequestListApi(Resource):
         description=(
             "API-030 キャリア向け運行依頼検索・取得<br/>"
             "- サプライ・サイドからのみ利用可<br/>"
-            "- cid（事業者）を指定しない場合には全事業者の検索を実施する"
+            "- cid（事業者）を指定しない場合には全事業者の検索を実施する<br/>"
+            "- n（取得数）またはcursor（前のページのnext_cursor）を指定した場合は"
+            "明細をページ単位で返す<br/>"
+            "- Accept: application/x-ndjson の場合は明細を1行ずつ返し、"
+            "最後の行にページ情報を返す<br/>"
+            "- cidを指定せずキャリアが複数の場合は全キャリアを並列に検索して"
+            "便の運行開始日時の順に結合し、carriersにキャリア毎の状態"
+            "(ok/timeout/error)を返す（cursorは利用できない）"
         )
     )
     @operation_request_api_ns.response(200, "Success", get_list_response_model)
@@ -102,7 +142,7 @@ class OperationRequestListApi(Resource):
             cid = None
         logger.debug(f"API-030 キャリア向け運行依頼検索・取得 CID:{cid}")
         if cid is not None:
-            url = urljoin(Config.CONNECTOR_PRIVATE_ENDPOINT, "operation_request")
+            url = urljoin(get_connector_endpoint(), "operation_request")
             endpoint = get_endpoint_from_cid(cid)
             if endpoint is None:
                 ret = {
@@ -117,23 +157,50 @@ class OperationRequestListApi(Resource):
             logger.debug(
                 f"API-030 キャリア向け運行依頼検索・取得 CONNECT cid:{url} / {endpoint}"
             )
-            headers = {"X-ENDPOINT": endpoint}
-            try:
-                response = requests.get(
+            if wants_ndjson():
+                # コネクタの応答を読み込まずに中継する
+                return stream_list(
                     url,
-                    params=query_params,
+                    query_params,
+                    {"X-ENDPOINT": endpoint},
+                    "operation_request_list",
                     verify=False,
                     proxies={"no_proxy": "co_logi_connector"},
-                    headers=headers,
+                )
+            headers = conditional_headers({"X-ENDPOINT": endpoint})
+            response_headers = {}
+            try:
+                # 同じ検索が同時に来た場合はコネクタの呼出しを1回にまとめる
+                response = get_single_flight("operation_request").do(
+                    flight_key(
+                        "operation_request",
+                        query_params,
+                        endpoint,
+                        request_if_none_match(),
+                    ),
+                    lambda: http_client.get(
+                        url,
+                        params=query_params,
+                        verify=False,
+                        proxies={"no_proxy": "co_logi_connector"},
+                        headers=headers,
+                    ),
                 )
                 logger.debug(f"Response Code: {response.status_code}")
-                response.encoding = response.apparent_encoding
-                operation_request_list = response.json()
+                if response.status_code == 304:
+                    return not_modified(response.headers.get("ETag"))
+                response_headers = etag_headers(response)
+                # 一覧はデコードせずにそのまま中継する
+                ret = passthrough_response(
+                    response, "operation_request_list", [], PAGE_FIELDS, response_headers
+                )
+                if ret is not None:
+                    return ret
+                data = decode_json(response)
+                operation_request_list = data.get("operation_request_list", [])
                 ret = {
                     "operation_request_list": operation_request_list,
-                    "total_num": len(operation_request_list),
-                    "offset": 0,
-                    "num": len(operation_request_list),
+                    **page_fields(data, operation_request_list),
                     "result": True,
                     "error_msg": "",
                 }
@@ -149,30 +216,78 @@ class OperationRequestListApi(Resource):
                     "error_msg": "error",
                 }
                 status = 500
-            return ret, status
+            return ret, status, response_headers
         else:
+            if len(get_carriers()) > 1:
+                # 全キャリアのコネクタを並列に検索して結合する
+                try:
+                    return gather_list(
+                        urljoin(get_connector_endpoint(), "operation_request"),
+                        query_params,
+                        "operation_request_list",
+                        "trsp_plan_line_item",
+                        sort_key=service_start,
+                        verify=False,
+                        proxies={"no_proxy": "co_logi_connector"},
+                    )
+                except ValueError as e:
+                    ret = {
+                        "operation_request_list": [],
+                        "total_num": 0,
+                        "offset": 0,
+                        "num": 0,
+                        "result": False,
+                        "error_msg": str(e.args[0]),
+                    }
+                    return ret, 400
             operation_request_list = []
+            data = {}
             endpoint = ""
-            for cid in COMPANY_INFOS:
-                company = COMPANY_INFOS[cid]
-                if company["role"] == "carrier":
-                    endpoint = get_endpoint_from_cid(cid)
-                    break
-            url = urljoin(Config.CONNECTOR_PRIVATE_ENDPOINT, "operation_request")
+            carriers = get_cids_by_role("carrier")
+            if len(carriers) > 0:
+                endpoint = get_endpoint_from_cid(carriers[0])
+            url = urljoin(get_connector_endpoint(), "operation_request")
             logger.debug(
                 f"API-030 キャリア向け運行依頼検索・取得 CONNECT carrier:{url} / endpoint = {endpoint}"
             )
-            headers = {"X-ENDPOINT": endpoint}
-            try:
-                response = requests.get(
+            if wants_ndjson():
+                return stream_list(
                     url,
-                    params=query_params,
+                    query_params,
+                    {"X-ENDPOINT": endpoint},
+                    "operation_request_list",
                     verify=False,
                     proxies={"no_proxy": "co_logi_connector"},
-                    headers=headers,
                 )
-                response.encoding = response.apparent_encoding
-                data = response.json()
+            headers = conditional_headers({"X-ENDPOINT": endpoint})
+            response_headers = {}
+            try:
+                # 同じ検索が同時に来た場合はコネクタの呼出しを1回にまとめる
+                response = get_single_flight("operation_request").do(
+                    flight_key(
+                        "operation_request",
+                        query_params,
+                        endpoint,
+                        request_if_none_match(),
+                    ),
+                    lambda: http_client.get(
+                        url,
+                        params=query_params,
+                        verify=False,
+                        proxies={"no_proxy": "co_logi_connector"},
+                        headers=headers,
+                    ),
+                )
+                if response.status_code == 304:
+                    return not_modified(response.headers.get("ETag"))
+                response_headers = etag_headers(response)
+                # 一覧はデコードせずにそのまま中継する
+                ret = passthrough_response(
+                    response, "operation_request_list", [], PAGE_FIELDS, response_headers
+                )
+                if ret is not None:
+                    return ret
+                data = decode_json(response)
                 operation_request_list = data.get("operation_request_list", [])
                 status = 200
             except Exception as e:
@@ -180,13 +295,11 @@ class OperationRequestListApi(Resource):
                 status = 500
             ret = {
                 "operation_request_list": operation_request_list,
-                "total_num": len(operation_request_list),
-                "offset": 0,
-                "num": len(operation_request_list),
+                **page_fields(data, operation_request_list),
                 "result": True,
                 "error_msg": "",
             }
-            return ret, status
+            return ret, status, response_headers
 
 
 @operation_request_api_ns.route("/propose")
@@ -289,7 +402,7 @@ class OperationRequestProposeListApi(Resource):
         logger.debug(f"API-031 キャリア向け運行申し込み登録 CID:{cid}")
         data = request.get_json()
         logger.debug(f"API-031 キャリア向け運行申し込み登録 {data}")
-        url = urljoin(Config.CONNECTOR_PRIVATE_ENDPOINT, "operation_request/propose")
+        url = urljoin(get_connector_endpoint(), "operation_request/propose")
         endpoint = get_endpoint_from_cid(cid)
         if endpoint is None:
             ret = {
@@ -300,7 +413,7 @@ class OperationRequestProposeListApi(Resource):
         logger.debug(f"CONNECT cid:{url} / {endpoint}")
         headers = {"X-ENDPOINT": endpoint}
         try:
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -309,8 +422,10 @@ class OperationRequestProposeListApi(Resource):
                 headers=headers,
             )
             logger.debug(f"Response Code: {response.status_code}")
-            response.encoding = response.apparent_encoding
-            operation_request_data = response.json()
+            ret = passthrough_response(response, "operation_request", [])
+            if ret is not None:
+                return ret
+            operation_request_data = decode_json(response)
             ret = {
                 "operation_request": operation_request_data.get(
                     "operation_request", []
@@ -432,7 +547,7 @@ class OperationRequestProposeApi(Resource):
             }
             return ret, 400
         url = urljoin(
-            Config.CONNECTOR_PRIVATE_ENDPOINT,
+            get_connector_endpoint(),
             f"operation_request/{operation_id}/propose/{propose_id}",
         )
         endpoint = get_endpoint_from_cid(from_cid)
@@ -441,7 +556,7 @@ class OperationRequestProposeApi(Resource):
         )
         headers = {"X-ENDPOINT": endpoint}
         try:
-            response = requests.put(
+            response = http_client.put(
                 url,
                 json=data,
                 params=query_params,
@@ -450,8 +565,10 @@ class OperationRequestProposeApi(Resource):
                 headers=headers,
             )
             logger.debug(f"Response Code: {response.status_code}")
-            response.encoding = response.apparent_encoding
-            operation_request_data = response.json()
+            ret = passthrough_response(response, "operation_request", [])
+            if ret is not None:
+                return ret
+            operation_request_data = decode_json(response)
             ret = {
                 "operation_request": operation_request_data.get(
                     "operation_request", []
@@ -552,7 +669,7 @@ class OperationRequestReplyApi(Resource):
             }
             return ret, 400
         url = urljoin(
-            Config.CONNECTOR_PRIVATE_ENDPOINT,
+            get_connector_endpoint(),
             f"operation_request/{operation_id}/propose/{propose_id}/reply",
         )
         endpoint = get_endpoint_from_cid(from_cid)
@@ -561,7 +678,7 @@ class OperationRequestReplyApi(Resource):
         )
         headers = {"X-ENDPOINT": endpoint}
         try:
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -573,8 +690,7 @@ class OperationRequestReplyApi(Resource):
                 f"API-033 キャリア向け運行申し込み更新（諾否回答） Response Code: {response.status_code}"
             )
             try:
-                response.encoding = response.apparent_encoding
-                data = response.json()
+                data = decode_json(response)
             except Exception:
                 data = {"error_msg": "Backend error"}
             if response.status_code != 200:
@@ -721,13 +837,13 @@ class OperationRequestHandoverInfoApi(Resource):
             trsp_srvc = data["trsp_srvc"]
             logger.debug(f"API-034 キャリア向け運行依頼情報連絡 data={data}")
             url = urljoin(
-                Config.CONNECTOR_PRIVATE_ENDPOINT,
+                get_connector_endpoint(),
                 f"operation_request/{operation_id}/propose/{propose_id}/handover_info",
             )
             endpoint = get_endpoint_from_cid(to_cid)
             logger.debug(f"API-034 キャリア向け運行依頼情報連絡 CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -738,8 +854,7 @@ class OperationRequestHandoverInfoApi(Resource):
             if response.status_code != 200:
                 raise ValueError("Backend Error")
             logger.debug(f"API-034 キャリア向け運行依頼情報連絡 Response Code: {response.status_code}")
-            response.encoding = response.apparent_encoding
-            operation_request_data = response.json()
+            operation_request_data = decode_json(response)
             if operation_request_data["result"] is False:
                 raise ValueError("Backend Response Error")
             # 呼出しに成功したのでMHの計画を更新する。
@@ -870,13 +985,13 @@ class OperationRequestNotifyApi(Resource):
             if from_cid is None:
                 raise ValueError("Need from_cid")
             url = urljoin(
-                Config.CONNECTOR_PRIVATE_ENDPOINT,
+                get_connector_endpoint(),
                 f"operation_request/{operation_id}/propose/{propose_id}/notify",
             )
             endpoint = get_endpoint_from_cid(from_cid)
             logger.debug(f"API-035 キャリア向け運行実施確認通知 CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -885,8 +1000,7 @@ class OperationRequestNotifyApi(Resource):
                 headers=headers,
             )
             logger.debug(f"API-035 キャリア向け運行実施確認通知 Response Code: {response.status_code}")
-            response.encoding = response.apparent_encoding
-            operation_request_data = response.json()
+            operation_request_data = decode_json(response)
             ret = {
                 "result": True,
                 "error_msg": "",
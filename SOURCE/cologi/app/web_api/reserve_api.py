@@ -29,8 +29,11 @@ logger.setLevel(logging.getLevelNamesMapping()[os.environ.get("LOGLEVEL", "DEBUG
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from com.helper import create_restx_model_usingSchema, create_response_model
 from model.reserve_model import ReserveSchema
-from app.config import Config
 from com.company_info import COMPANY_INFOS, get_endpoint_from_cid
+from com.http_client import http_client
+from com.connector import get_connector_endpoint
+from com.codec import decode_json
+from com.passthrough import passthrough_response
 
 
 reserve_api_ns = Namespace(
@@ -127,11 +130,11 @@ class ReserveListApi(Resource):
         try:
             if carrier_cid is None or shipper_cid is None:
                 raise ValueError("carrier_cid/shipper_cid ared required")
-            url = urljoin(Config.CONNECTOR_PRIVATE_ENDPOINT, "reserve")
+            url = urljoin(get_connector_endpoint(), "reserve")
             endpoint = get_endpoint_from_cid(carrier_cid)
             logger.debug(f"API-021 荷主向け運行申し込み登録 CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -140,8 +143,10 @@ class ReserveListApi(Resource):
                 headers=headers,
             )
             logger.debug(f"Response Code: {response.status_code}")
-            response.encoding = response.apparent_encoding
-            reserve_data = response.json()
+            ret = passthrough_response(response, "reserve", [])
+            if ret is not None:
+                return ret
+            reserve_data = decode_json(response)
             ret = {
                 "reserve": reserve_data.get("reserve", []),
                 "result": True,
@@ -230,13 +235,13 @@ class ReserveNotifyApi(Resource):
             if shipper_cid is None or carrier_cid is None:
                 raise ValueError("shipper_cid/carrier_cidare required")
             url = urljoin(
-                Config.CONNECTOR_PRIVATE_ENDPOINT,
+                get_connector_endpoint(),
                 f"reserve/{operation_id}/propose/{propose_id}/reply",
             )
             endpoint = get_endpoint_from_cid(shipper_cid)
             logger.debug(f"CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -245,8 +250,10 @@ class ReserveNotifyApi(Resource):
                 headers=headers,
             )
             logger.debug(f"Response Code: {response.status_code}")
-            response.encoding = response.apparent_encoding
-            reserve_data = response.json()
+            ret = passthrough_response(response, "reserve", [])
+            if ret is not None:
+                return ret
+            reserve_data = decode_json(response)
             ret = {
                 "result": True,
                 "error_msg": "",
@@ -465,14 +472,14 @@ class ReserveRequestNotifyApi(Resource):
         logger.debug(f"API-026 荷主向け再提案情報登録通知 data={data}")
         if cid is not None:
             url = urljoin(
-                Config.CONNECTOR_PRIVATE_ENDPOINT,
+                get_connector_endpoint(),
                 f"reserve/{operation_id}/propose/{propose_id}/notify",
             )
             endpoint = get_endpoint_from_cid(cid)
             logger.debug(f"CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
             try:
-                response = requests.post(
+                response = http_client.post(
                     url,
                     json=data,
                     params=query_params,
@@ -481,8 +488,10 @@ class ReserveRequestNotifyApi(Resource):
                     headers=headers,
                 )
                 logger.debug(f"Response Code: {response.status_code}")
-                response.encoding = response.apparent_encoding
-                reserve_data = response.json()
+                ret = passthrough_response(response, "reserve", [])
+                if ret is not None:
+                    return ret
+                reserve_data = decode_json(response)
                 logger.debug(f"CONNECTOR RESPONSE:{json.dumps(reserve_data, indent=4)}")
                 ret = {
                     "reserve": reserve_data.get("reserve", []),
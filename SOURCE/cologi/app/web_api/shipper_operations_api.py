@@ -18,7 +18,6 @@ from flask_restx import Namespace, Resource, fields
 import sys
 import os
 from flask import request
-import requests
 from urllib.parse import urljoin
 import json
 import logging
@@ -31,11 +30,19 @@ from com.helper import (
     create_restx_model_usingSchema,
     create_response_model,
     create_query_parser,
+    page_fields,
+    PAGE_FIELDS,
 )
 from model.model_5001.trsp_ability_line_item_model import TrspAbilityLineItemSchema
 from model.model_5001.msg_info_model import MsgInfoSchema
-from app.config import Config
-from com.company_info import COMPANY_INFOS, get_endpoint_from_cid
+from com.company_info import get_cids_by_role, get_endpoint_from_cid
+from com.http_client import http_client
+from com.connector import get_connector_endpoint
+from com.codec import decode_json
+from com.passthrough import passthrough_response
+from com.etag import conditional_headers, etag_headers, not_modified
+from com.ndjson import stream_list, wants_ndjson
+from com.scatter_gather import gather_list, get_carriers
 
 shipper_operations_api_ns = Namespace(
     "/webapi/v1/shipper_operations", description="ダイヤ（荷主向け運行案内）"
@@ -49,9 +56,28 @@ parser.add_argument(
 parser.add_argument(
     "n", type=int, help="取得数", default=1, required=False, location="args"
 )
+parser.add_argument(
+    "cursor",
+    type=str,
+    help="次のページのカーソル(応答のnext_cursor)",
+    required=False,
+    location="args",
+)
 query_parser = create_query_parser(shipper_operations_api_ns)
 
 
+def service_start(item):
+    # 複数キャリアの運行案件は便の運行開始日時の順に並べる
+    starts = [
+        (
+            car_info.get("service_strt_date") or "",
+            car_info.get("service_strt_time") or "",
+        )
+        for car_info in item.get("car_info") or []
+    ]
+    return min(starts, default=("", ""))
+
+
 @shipper_operations_api_ns.route("/")
 class ShipperOperationsApi(Resource):
     get_trsp_list_data_model = create_restx_model_usingSchema(
@@ -83,7 +109,14 @@ class ShipperOperationsApi(Resource):
         description=(
             "API-020 荷主向け運行案件検索・取得<br/>"
             "- デマンド・サイドからのみ利用可<br/>"
-            "- cid（事業者）を指定しない場合には全事業者の検索を実施する"
+            "- cid（事業者）を指定しない場合には全事業者の検索を実施する<br/>"
+            "- n（取得数）またはcursor（前のページのnext_cursor）を指定した場合は"
+            "ページ単位で返す<br/>"
+            "- Accept: application/x-ndjson の場合は1件ずつ1行で返し、"
+            "最後の行にページ情報を返す<br/>"
+            "- cidを指定せずキャリアが複数の場合は全キャリアを並列に検索して"
+            "便の運行開始日時の順に結合し、carriersにキャリア毎の状態"
+            "(ok/timeout/error)を返す（cursorは利用できない）"
         )
     )
     @shipper_operations_api_ns.response(400, "HTTP400エラー")
@@ -98,12 +131,23 @@ class ShipperOperationsApi(Resource):
             cid = None
         logger.debug(f"CID:{cid}")
         if cid is not None:
-            url = urljoin(Config.CONNECTOR_PRIVATE_ENDPOINT, "shipper_operations")
+            url = urljoin(get_connector_endpoint(), "shipper_operations")
             endpoint = get_endpoint_from_cid(cid)
             logger.debug(f"API-020 荷主向け運行案件検索・取得 CONNECT cid:{url} / {endpoint}")
-            headers = {"X-ENDPOINT": endpoint}
+            if wants_ndjson():
+                # コネクタの応答を読み込まずに中継する
+                return stream_list(
+                    url,
+                    query_params,
+                    {"X-ENDPOINT": endpoint},
+                    "shipper_operations_list",
+                    verify=False,
+                    proxies={"no_proxy": "co_logi_connector"},
+                )
+            headers = conditional_headers({"X-ENDPOINT": endpoint})
+            response_headers = {}
             try:
-                response = requests.get(
+                response = http_client.get(
                     url,
                     params=query_params,
                     verify=False,
@@ -111,15 +155,20 @@ class ShipperOperationsApi(Resource):
                     headers=headers,
                 )
                 logger.debug(f"Response Code: {response.status_code}")
-                response.encoding = response.apparent_encoding
-                shipper_operations_list = response.json()
+                if response.status_code == 304:
+                    return not_modified(response.headers.get("ETag"))
+                response_headers = etag_headers(response)
+                # 一覧はデコードせずにそのまま中継する
+                ret = passthrough_response(
+                    response, "shipper_operations_list", [], PAGE_FIELDS, response_headers
+                )
+                if ret is not None:
+                    return ret
+                data = decode_json(response)
+                shipper_operations_list = data.get("shipper_operations_list", [])
                 ret = {
-                    "shipper_operations_list": shipper_operations_list.get(
-                        "shipper_operations_list", []
-                    ),
-                    "total_num": len(shipper_operations_list),
-                    "offset": 0,
-                    "num": len(shipper_operations_list),
+                    "shipper_operations_list": shipper_operations_list,
+                    **page_fields(data, shipper_operations_list),
                     "result": True,
                     "error_msg": "",
                 }
@@ -138,34 +187,69 @@ class ShipperOperationsApi(Resource):
             logger.debug(
                 f"API-020 荷主向け運行案件検索・取得 END status = {status}"
             )
-            return ret, status
+            return ret, status, response_headers
         else:
+            if len(get_carriers()) > 1:
+                # 全キャリアのコネクタを並列に検索して結合する
+                try:
+                    return gather_list(
+                        urljoin(get_connector_endpoint(), "shipper_operations"),
+                        query_params,
+                        "shipper_operations_list",
+                        sort_key=service_start,
+                        verify=False,
+                        proxies={"no_proxy": "co_logi_connector"},
+                    )
+                except ValueError as e:
+                    ret = {
+                        "shipper_operations_list": [],
+                        "total_num": 0,
+                        "offset": 0,
+                        "num": 0,
+                        "result": False,
+                        "error_msg": str(e.args[0]),
+                    }
+                    return ret, 400
             shipper_operations_list = []
             endpoint = ""
-            for cid in COMPANY_INFOS:
-                company = COMPANY_INFOS[cid]
-                if company["role"] == "carrier":
-                    endpoint = get_endpoint_from_cid(cid)
-                    break
-            url = urljoin(Config.CONNECTOR_PRIVATE_ENDPOINT, "shipper_operations")
+            carriers = get_cids_by_role("carrier")
+            if len(carriers) > 0:
+                endpoint = get_endpoint_from_cid(carriers[0])
+            url = urljoin(get_connector_endpoint(), "shipper_operations")
             logger.debug(f"CONNECT carrier:{url} / endpoint = {endpoint}")
-            headers = {"X-ENDPOINT": endpoint}
+            if wants_ndjson():
+                return stream_list(
+                    url,
+                    query_params,
+                    {"X-ENDPOINT": endpoint},
+                    "shipper_operations_list",
+                    verify=False,
+                    proxies={"no_proxy": "co_logi_connector"},
+                )
+            headers = conditional_headers({"X-ENDPOINT": endpoint})
+            response_headers = {}
             try:
-                response = requests.get(
+                response = http_client.get(
                     url,
                     params=query_params,
                     verify=False,
                     proxies={"no_proxy": "co_logi_connector"},
                     headers=headers,
                 )
-                response.encoding = response.apparent_encoding
-                data = response.json()
+                if response.status_code == 304:
+                    return not_modified(response.headers.get("ETag"))
+                response_headers = etag_headers(response)
+                # 一覧はデコードせずにそのまま中継する
+                ret = passthrough_response(
+                    response, "shipper_operations_list", [], PAGE_FIELDS, response_headers
+                )
+                if ret is not None:
+                    return ret
+                data = decode_json(response)
                 shipper_operations_list = data.get("shipper_operations_list", [])
                 ret = {
                     "shipper_operations_list": shipper_operations_list,
-                    "total_num": len(shipper_operations_list),
-                    "offset": 0,
-                    "num": len(shipper_operations_list),
+                    **page_fields(data, shipper_operations_list),
                     "result": True,
                     "error_msg": "",
                 }
@@ -185,4 +269,4 @@ class ShipperOperationsApi(Resource):
                 f"API-020 荷主向け運行案件検索・取得 END status = {status}"
             )
 
-            return ret, status
+            return ret, status, response_headers
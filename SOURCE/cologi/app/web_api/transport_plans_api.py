@@ -35,9 +35,11 @@ from com.helper import (
 from model.transportation_plan_model import TransportationPlanSchema
 from model.model_3012_transport.trsp_plan_line_item_model import TrspPlanLineItemSchema
 from model.model_3012_transport.msg_info_model import MsgInfoSchema
-from app.config import Config
 from com.company_info import get_endpoint_from_cid
 from com.vanning import Vanning
+from com.http_client import http_client
+from com.connector import get_connector_endpoint
+from com.codec import decode_json
 
 
 transport_plans_api_ns = Namespace("/webapi/v1/transport_plans", description="輸送計画")
@@ -229,20 +231,14 @@ class TransportPlanApi(Resource):
     ):
         # 前の情報があれば取得、無ければ初期データ取得
         vanning = Vanning()
+        # 発着MHの計画一式をまとめて取得する
+        plan_set = vanning.get_plan_set(trsp_instruction_id)
         ## 出発MH
-        dep_devanning_plan = vanning.search_plan(
-            is_departure_mh=1, trsp_instruction_id=trsp_instruction_id, is_vanning=0
-        )
-        dep_vanning_plan = vanning.search_plan(
-            is_departure_mh=1, trsp_instruction_id=trsp_instruction_id, is_vanning=1
-        )
+        dep_devanning_plan = plan_set["dep_devanning_plan"]
+        dep_vanning_plan = plan_set["dep_vanning_plan"]
         ## 到着MH
-        arv_devanning_plan = vanning.search_plan(
-            is_departure_mh=0, trsp_instruction_id=trsp_instruction_id, is_vanning=0
-        )
-        arv_vanning_plan = vanning.search_plan(
-            is_departure_mh=0, trsp_instruction_id=trsp_instruction_id, is_vanning=1
-        )
+        arv_devanning_plan = plan_set["arv_devanning_plan"]
+        arv_vanning_plan = plan_set["arv_vanning_plan"]
         if (
             dep_devanning_plan is None
             or dep_vanning_plan is None
@@ -252,6 +248,10 @@ class TransportPlanApi(Resource):
             raise ValueError(
                 f"バンニング・デバンニング計画が登録されてません trsp_instruction_id={trsp_instruction_id}"
             )
+        # 保存失敗時に元に戻すための更新前データ
+        original_plan_set = dict(
+            zip(plan_set.keys(), vanning.snapshot_plans(list(plan_set.values())))
+        )
         # 必要なデータの更新
         if is_shipper is False:
             # 荷受け人
@@ -313,36 +313,18 @@ class TransportPlanApi(Resource):
             arv_vanning_plan["trailer_giai_list"] = trailer_giai_list
             arv_devanning_plan["trailer_giai_list"] = trailer_giai_list
 
-        # 更新したデータを保存
+        # 更新したデータをまとめて保存
+        save_plan_set = {}
         if is_shipper is True:
             # 荷主
             ## 出発MH
-            vanning.save_plan(
-                "devanning_plan",
-                dep_devanning_plan["mh"],
-                trsp_instruction_id,
-                dep_devanning_plan,
-            )
-            vanning.save_plan(
-                "vanning_plan",
-                dep_vanning_plan["mh"],
-                trsp_instruction_id,
-                dep_vanning_plan,
-            )
+            save_plan_set["dep_devanning_plan"] = dep_devanning_plan
+            save_plan_set["dep_vanning_plan"] = dep_vanning_plan
             ## 到着MH
-            vanning.save_plan(
-                "devanning_plan",
-                arv_devanning_plan["mh"],
-                trsp_instruction_id,
-                arv_devanning_plan,
-            )
+            save_plan_set["arv_devanning_plan"] = arv_devanning_plan
 
-        vanning.save_plan(
-            "vanning_plan",
-            arv_vanning_plan["mh"],
-            trsp_instruction_id,
-            arv_vanning_plan,
-        )
+        save_plan_set["arv_vanning_plan"] = arv_vanning_plan
+        vanning.save_plan_set(trsp_instruction_id, save_plan_set, original_plan_set)
 
     @transport_plans_api_ns.doc(
         description=(
@@ -429,13 +411,13 @@ class TransportPlanNotifyApi(Resource):
             if carrier_cid is None or shipper_cid is None:
                 raise ValueError("carrier_cid/shipper_cid is required")
             url = urljoin(
-                Config.CONNECTOR_PRIVATE_ENDPOINT,
+                get_connector_endpoint(),
                 f"transport_plans/{trsp_instruction_id}/notify",
             )
             endpoint = get_endpoint_from_cid(carrier_cid)
             logger.debug(f"API-052 輸送実施（確認）通知 CONNECT cid:{url} / {endpoint}")
             headers = {"X-ENDPOINT": endpoint}
-            response = requests.post(
+            response = http_client.post(
                 url,
                 json=data,
                 params=query_params,
@@ -448,8 +430,7 @@ class TransportPlanNotifyApi(Resource):
             )
             if response.status_code != 200:
                 raise ValueError("BACKEND ERROR")
-            response.encoding = response.apparent_encoding
-            transport_plans_data = response.json()
+            transport_plans_data = decode_json(response)
             transport_plans_data = transport_plans_data.get("transport_plans_data", {})
             ret = {
                 "transport_plans": transport_plans_data,
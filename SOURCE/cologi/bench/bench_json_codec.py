@@ -0,0 +1,183 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""JSONのデコード・エンコード処理の効果測定
+
+運行依頼一覧（TrspPlanLineItemのリスト）相当のデータで以下を比較する。
+
+- デコード: apparent_encoding + response.json() と com.codec.decode_json
+- エンコード: flask-restx既定(json.dumps) と com.codec.dumps_json
+
+    python bench_json_codec.py --items 1000 --repeat 20
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from com.codec import decode_json, dumps_json, orjson
+
+
+def make_line_item(i):
+    return {
+        "trsp_isr": {
+            "trsp_instruction_id": f"{i:020d}",
+            "trsp_instruction_date_subm_dttm": "20250301",
+        },
+        "trsp_srvc": {
+            "service_no": f"{i:08d}",
+            "service_name": "東京-大阪 定期便",
+            "service_strt_date": "20250301",
+            "service_strt_time": "0900",
+            "service_end_date": "20250301",
+            "service_end_time": "1800",
+            "freight_rate": 120000,
+            "trsp_means_typ_cd": "01",
+        },
+        "trsp_vehicle_trms": {
+            "car_cls_of_size_cd": "1",
+            "car_cls_of_shp_cd": "1",
+            "car_cls_of_tlg_lftr_exst_cd": "0",
+            "car_cls_of_wing_body_exst_cd": "1",
+            "car_cls_of_rfg_exst_cd": "0",
+            "trms_of_lwr_tmp_meas": -20,
+            "trms_of_upp_tmp_meas": 10,
+            "car_cls_of_crn_exst_cd": "0",
+        },
+        "cns": {
+            "istd_totl_pcks_quan": 24,
+            "num_unt_cd": "CT",
+            "istd_totl_weig_meas": 1200.5,
+            "weig_unt_cd": "KGM",
+            "istd_totl_vol_meas": 8.4,
+            "vol_unt_cd": "MTQ",
+            "istd_totl_untl_quan": 24,
+        },
+        "cns_line_item": {
+            "item_name_txt": "冷凍食品（業務用）",
+            "gods_idcs_in_ots_pcke_name_txt": "段ボール",
+            "num_of_istd_untl_quan": 24,
+            "num_of_istd_quan": 24,
+        },
+        "cnsg_prty": {
+            "cnsg_prty_name_txt": "株式会社サンプル物流",
+            "cnsg_sct_sped_org_name_txt": "東京物流センター",
+            "cnsg_tel_cmm_cmp_num_txt": "03-0000-0000",
+            "cnsg_pstl_adrs_line_one_txt": "東京都江東区有明1丁目1番1号",
+            "cnsg_pstc_cd": "1350063",
+        },
+        "cnee_prty": {
+            "cnee_prty_name_txt": "株式会社サンプル商事",
+            "cnee_sct_name_txt": "大阪倉庫",
+            "cnee_prim_cnt_pers_name_txt": "山田 太郎",
+            "cnee_tel_cmm_cmp_num_txt": "06-0000-0000",
+            "cnee_pstl_adrs_line_one_txt": "大阪府大阪市住之江区南港北1丁目1番1号",
+            "cnee_pstc_cd": "5590034",
+        },
+        "road_carr": {
+            "trsp_cli_prty_name_txt": "サンプル運送株式会社",
+            "road_carr_depa_sped_org_name_txt": "東京営業所",
+            "trsp_cli_tel_cmm_cmp_num_txt": "03-1111-1111",
+            "road_carr_arr_sped_org_name_txt": "大阪営業所",
+        },
+        "ship_from_prty": {
+            "ship_from_prty_name_txt": "東京物流センター",
+            "ship_from_pstl_adrs_line_one_txt": "東京都江東区有明1丁目1番1号",
+            "ship_from_pstc_cd": "1350063",
+            "jpn_uplc_cd": "13108",
+        },
+        "ship_to_prty": {
+            "ship_to_prty_name_txt": "大阪倉庫",
+            "ship_to_pstl_adrs_line_one_txt": "大阪府大阪市住之江区南港北1丁目1番1号",
+            "ship_to_pstc_cd": "5590034",
+            "jpn_uplc_cd": "27125",
+        },
+    }
+
+
+def make_response(content):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def decode_legacy(content):
+    response = make_response(content)
+    response.encoding = response.apparent_encoding
+    return response.json()
+
+
+def decode_codec(content):
+    return decode_json(make_response(content))
+
+
+def encode_legacy(data):
+    # flask-restxの既定(output_json)と同じ
+    return (json.dumps(data) + "\n").encode("utf-8")
+
+
+def encode_codec(data):
+    return dumps_json(data)
+
+
+def measure(name, func, arg, repeat):
+    # 生成したオブジェクトのGCが計測に混ざらないようにする
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    elapsed = (time.perf_counter() - start) / repeat
+    gc.enable()
+    print(f"{name:<28} {elapsed * 1000:10.2f} ms/回")
+    return elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--items", type=int, default=1000, help="明細数")
+    arg_parser.add_argument("--repeat", type=int, default=20, help="繰り返し回数")
+    args = arg_parser.parse_args()
+
+    data = {
+        "operation_request": [make_line_item(i) for i in range(args.items)],
+        "result": True,
+        "error_msg": "",
+    }
+    content = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    assert decode_legacy(content) == decode_codec(content)
+    print(
+        f"明細 {args.items}件 / {len(content) / 1024:.0f}KB / "
+        f"orjson {'あり' if orjson is not None else 'なし'}"
+    )
+
+    legacy = measure("デコード apparent_encoding", decode_legacy, content, args.repeat)
+    codec = measure("デコード decode_json", decode_codec, content, args.repeat)
+    print(f"  -> {legacy / codec:.1f}倍")
+    legacy = measure("エンコード json.dumps", encode_legacy, data, args.repeat)
+    codec = measure("エンコード dumps_json", encode_codec, data, args.repeat)
+    print(f"  -> {legacy / codec:.1f}倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""MH計画の一括取得・保存(plan_set)の効果測定
+
+mh_mng_stub.pyの代替サーバを起動し、輸送指示ID毎に計画一式(4件)を
+取得・保存する処理を以下の方法で比較する。
+
+- 個別(逐次): search_plan/save_planを順番に呼び出す（従来の処理）
+- 個別(並列): 一括APIが無い場合のフォールバック
+- 一括: plan_set APIで複数の輸送指示IDをまとめて呼び出す
+
+    python bench_plan_set.py --ids 20 --latency 30
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+sys.path.append(os.path.join(BENCH_DIR, ".."))
+sys.path.append(APP_DIR)
+
+if importlib.util.find_spec("app.config") is None:
+    # ローカル実行時は配置前の設定ファイルを読み込む
+    spec = importlib.util.spec_from_file_location(
+        "app.config", os.path.join(APP_DIR, "demand.config.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app.config"] = module
+    spec.loader.exec_module(module)
+
+from app.config import Config
+import com.vanning as vanning_module
+from com.vanning import Vanning
+from mh_mng_stub import StubHandler, create_server, PREFIX
+
+
+def make_plan(mh, trsp_instruction_id, is_departure_mh):
+    return {
+        "mh": mh,
+        "mh_space_list": [],
+        "shipper_cid": "490000001",
+        "recipient_cid": "490000002",
+        "carrier_cid": "490000003",
+        "trsp_instruction_id": trsp_instruction_id,
+        "tractor_giai": "",
+        "trailer_giai_list": [],
+        "req_from_time": "",
+        "req_to_time": "",
+        "status": 1,
+        "is_bl_need": 0,
+        "is_departure_mh": is_departure_mh,
+    }
+
+
+def make_plan_set(trsp_instruction_id):
+    return {
+        "dep_devanning_plan": make_plan("4900000000001", trsp_instruction_id, 1),
+        "dep_vanning_plan": make_plan("4900000000001", trsp_instruction_id, 1),
+        "arv_devanning_plan": make_plan("4900000000002", trsp_instruction_id, 0),
+        "arv_vanning_plan": make_plan("4900000000002", trsp_instruction_id, 0),
+    }
+
+
+def run_sequential(vanning, trsp_instruction_ids):
+    for trsp_instruction_id in trsp_instruction_ids:
+        plan_set = {}
+        for key, (api, is_departure_mh, is_vanning) in vanning_module.PLAN_SET_KEYS.items():
+            plan_set[key] = vanning.search_plan(
+                is_departure_mh, trsp_instruction_id, is_vanning
+            )
+        for key, plan in plan_set.items():
+            api = vanning_module.PLAN_SET_KEYS[key][0]
+            vanning.save_plan(api, plan["mh"], trsp_instruction_id, plan)
+
+
+def run_plan_set(vanning, trsp_instruction_ids):
+    plan_sets = vanning.get_plan_sets(trsp_instruction_ids)
+    vanning.save_plan_sets(plan_sets, plan_sets)
+
+
+def measure(name, func, vanning, trsp_instruction_ids):
+    StubHandler.count = 0
+    start = time.perf_counter()
+    func(vanning, trsp_instruction_ids)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {elapsed * 1000:10.1f} ms  API呼出し {StubHandler.count:5d} 回")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--ids", type=int, default=20, help="輸送指示IDの数")
+    arg_parser.add_argument("--latency", type=float, default=30, help="応答遅延(ms)")
+    args = arg_parser.parse_args()
+
+    server = create_server(0, args.latency)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Config.MH_MNG_ENDPOINT = f"http://127.0.0.1:{port}{PREFIX}"
+    Config.MH_MNG_USE_PLAN_SET = True
+
+    vanning = Vanning()
+    trsp_instruction_ids = [f"TI{i:08d}" for i in range(args.ids)]
+    vanning.save_plan_sets(
+        {
+            trsp_instruction_id: make_plan_set(trsp_instruction_id)
+            for trsp_instruction_id in trsp_instruction_ids
+        }
+    )
+    print(f"輸送指示ID {args.ids}件 / 応答遅延 {args.latency}ms")
+
+    measure("個別(逐次)", run_sequential, vanning, trsp_instruction_ids)
+
+    # 一括API無し（自動で個別APIに切り替わる）
+    StubHandler.plan_set = False
+    vanning_module._plan_set_unsupported_at = None
+    measure("個別(並列)", run_plan_set, vanning, trsp_instruction_ids)
+
+    StubHandler.plan_set = True
+    vanning_module._plan_set_unsupported_at = None
+    measure("一括", run_plan_set, vanning, trsp_instruction_ids)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
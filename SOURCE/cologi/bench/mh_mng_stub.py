@@ -0,0 +1,183 @@
+# Copyright 2025 Intent Exchange, Inc.
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+# and associated documentation files (the “Software”), to deal in the Software without
+# restriction, including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+"""MH管理APIのローカル代替サーバ（計測用）
+
+com/vanning.pyが使うAPIのみをメモリ上のデータで実装する。
+実際のMH管理APIとの往復を模擬するため、応答毎に遅延(--latency)を入れる。
+
+    python mh_mng_stub.py --port 18080 --latency 30
+    python mh_mng_stub.py --port 18080 --no-plan-set  # 一括API無し
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+PREFIX = "/mhapi/v1/"
+
+# 一括APIのキー: (api, is_departure_mh)
+PLAN_SET_KEYS = {
+    "dep_devanning_plan": ("devanning_plan", 1),
+    "dep_vanning_plan": ("vanning_plan", 1),
+    "arv_devanning_plan": ("devanning_plan", 0),
+    "arv_vanning_plan": ("vanning_plan", 0),
+}
+
+
+class PlanStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (api, is_departure_mh, trsp_instruction_id) -> plan
+        self.plans = {}
+
+    def _key(self, api, plan, trsp_instruction_id):
+        return (api, int(plan.get("is_departure_mh", 0)), trsp_instruction_id)
+
+    def search(self, api, is_departure_mh, trsp_instruction_id):
+        with self.lock:
+            return self.plans.get((api, is_departure_mh, trsp_instruction_id))
+
+    def get(self, api, mh, trsp_instruction_id):
+        with self.lock:
+            for (p_api, _, p_id), plan in self.plans.items():
+                if p_api == api and p_id == trsp_instruction_id and plan["mh"] == mh:
+                    return plan
+        return None
+
+    def save(self, api, trsp_instruction_id, plan):
+        with self.lock:
+            self.plans[self._key(api, plan, trsp_instruction_id)] = plan
+
+    def delete(self, api, mh, trsp_instruction_id):
+        with self.lock:
+            for key, plan in list(self.plans.items()):
+                if key[0] == api and key[2] == trsp_instruction_id and plan["mh"] == mh:
+                    del self.plans[key]
+                    return True
+        return False
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    store = PlanStore()
+    latency = 0.0
+    plan_set = True
+    count = 0
+    count_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        with StubHandler.count_lock:
+            StubHandler.count += 1
+        time.sleep(self.latency)
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length))
+
+    def _path(self):
+        parsed = urlsplit(self.path)
+        if not parsed.path.startswith(PREFIX):
+            return None, {}
+        return parsed.path[len(PREFIX):], parse_qs(parsed.query)
+
+    def do_GET(self):
+        path, query = self._path()
+        if path == "plan_search":
+            plan = self.store.search(
+                "vanning_plan" if query["is_vanning"][0] == "1" else "devanning_plan",
+                int(query["is_departure_mh"][0]),
+                query["trsp_instruction_id"][0],
+            )
+            self._send(200, {"result": plan is not None, "plan": plan})
+            return
+        match = re.fullmatch(r"(vanning_plan|devanning_plan)/([^/]+)/([^/]+)", path or "")
+        if match is None:
+            self._send(404, {"result": False})
+            return
+        api, mh, trsp_instruction_id = match.groups()
+        plan = self.store.get(api, mh, trsp_instruction_id)
+        self._send(200, {"result": plan is not None, api: plan})
+
+    def do_POST(self):
+        path, _ = self._path()
+        body = self._body()
+        if path in ("plan_set", "plan_set/search"):
+            if not self.plan_set:
+                # 一括APIのルートが無い場合と同じく本文の無い404を返す
+                self._send(404, None)
+            elif path == "plan_set/search":
+                plan_sets = {}
+                for trsp_instruction_id in body["trsp_instruction_id_list"]:
+                    plan_sets[trsp_instruction_id] = {
+                        key: self.store.search(api, is_departure_mh, trsp_instruction_id)
+                        for key, (api, is_departure_mh) in PLAN_SET_KEYS.items()
+                    }
+                self._send(200, {"result": True, "plan_sets": plan_sets})
+            else:
+                for trsp_instruction_id, plan_set in body["plan_sets"].items():
+                    for key, plan in plan_set.items():
+                        self.store.save(PLAN_SET_KEYS[key][0], trsp_instruction_id, plan)
+                self._send(200, {"result": True})
+            return
+        match = re.fullmatch(r"(vanning_plan|devanning_plan)/([^/]+)/([^/]+)", path or "")
+        if match is None:
+            self._send(404, {"result": False})
+            return
+        api, _, trsp_instruction_id = match.groups()
+        self.store.save(api, trsp_instruction_id, body)
+        self._send(200, {"result": True})
+
+    def do_DELETE(self):
+        path, _ = self._path()
+        match = re.fullmatch(r"(vanning_plan|devanning_plan)/([^/]+)/([^/]+)", path or "")
+        if match is None:
+            self._send(404, {"result": False})
+            return
+        result = self.store.delete(*match.groups())
+        self._send(200 if result else 404, {"result": result})
+
+
+def create_server(port=0, latency_ms=0, plan_set=True):
+    StubHandler.latency = latency_ms / 1000
+    StubHandler.plan_set = plan_set
+    return ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--port", type=int, default=18080)
+    arg_parser.add_argument("--latency", type=float, default=30, help="応答遅延(ms)")
+    arg_parser.add_argument("--no-plan-set", action="store_true", help="一括API無し")
+    args = arg_parser.parse_args()
+    server = create_server(args.port, args.latency, not args.no_plan_set)
+    print(f"MH管理API(代替) http://127.0.0.1:{args.port}{PREFIX}")
+    server.serve_forever()